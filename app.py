@@ -1,11 +1,15 @@
 import streamlit as st
-from datetime import date, timedelta, datetime
+import secrets
+from datetime import date
 from utils.database import (
-    get_settings, get_event_types, get_event_type_by_slug,
-    get_available_slots, is_date_available, create_booking,
-    get_event_type_dates
+    get_settings, get_event_types,
+    get_booking_window, create_booking, get_event_type_dates,
+    hold_slot, release_hold, HOLD_TTL_SECONDS, SlotUnavailableError
 )
+from utils.async_database import load_snapshot, QueryTimeoutError
+from utils.prefetch import prefetch_availability, get_prefetched_snapshot
 from utils.logo import get_logo
+from utils.instrumentation import start_rerun
 
 # ============================================
 # CONFIGURATION
@@ -18,6 +22,9 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
+# Attribuer les requêtes de ce rerun à la page (page Diagnostics)
+start_rerun("Réservation")
+
 # ============================================
 # STYLES CSS
 # ============================================
@@ -102,12 +109,30 @@ def show_event_types():
             if st.button("Réserver", key=f"book_{event['id']}", use_container_width=True):
                 st.session_state.selected_event = event
                 st.session_state.booking_step = "date"
+                # Charger ses disponibilités pendant que la page suivante s'affiche
+                prefetch_availability(event)
                 st.rerun()
 
+def get_snapshot(event_id, start, end):
+    """Snapshot de disponibilité (préchargé si possible) ; arrête la page si la base ne répond pas"""
+    snapshot = get_prefetched_snapshot(event_id, start, end)
+    if snapshot is not None:
+        return snapshot
+    try:
+        return load_snapshot(event_id, start, end)
+    except QueryTimeoutError:
+        st.error("❌ Les disponibilités n'ont pas pu être chargées. Veuillez réessayer.")
+        st.stop()
+
 def show_date_selection():
     """Affiche la sélection de date"""
     event = st.session_state.selected_event
 
+    # L'invité revient choisir un créneau : libérer celui qu'il bloquait
+    if st.session_state.pop("slot_hold", None):
+        release_hold(st.session_state.hold_token)
+        st.session_state.pop("availability_prefetch", None)
+
     # Header avec retour
     col1, col2 = st.columns([1, 4])
     with col1:
@@ -138,6 +163,15 @@ def show_date_selection():
             st.warning("😔 Aucune date disponible pour cet événement.")
             return
 
+        # Une seule fenêtre pour toutes les dates : ne garder que celles avec des créneaux libres
+        snapshot = get_snapshot(event["id"], future_dates[0], future_dates[-1])
+        bookable_days = snapshot.get_bookable_days()
+        future_dates = [d for d in future_dates if d in bookable_days]
+
+        if not future_dates:
+            st.warning("😔 Toutes les dates de cet événement sont complètes.")
+            return
+
         # Afficher les dates sous forme de boutons
         st.markdown("Dates disponibles :")
         cols = st.columns(3)
@@ -154,34 +188,28 @@ def show_date_selection():
                     st.rerun()
 
         selected_date = st.session_state.get("picked_date")
-        if selected_date is None:
+        if selected_date not in bookable_days:
             return
 
     else:
-        # Mode classique : date picker libre avec disponibilités générales
-        min_notice = event.get("min_notice_hours", 24)
-        max_days = event.get("max_days_ahead", 60)
+        # Mode classique : seuls les jours ayant encore des créneaux libres sont proposés
+        min_date, max_date = get_booking_window(event)
+        snapshot = get_snapshot(event["id"], min_date, max_date)
+        bookable_days = snapshot.get_bookable_days()
 
-        min_date = date.today() + timedelta(days=1)
-        if min_notice > 24:
-            min_date = date.today() + timedelta(hours=min_notice)
-        max_date = date.today() + timedelta(days=max_days)
+        if not bookable_days:
+            st.warning("😔 Aucune date disponible pour cet événement.")
+            return
 
-        selected_date = st.date_input(
+        selected_date = st.selectbox(
             "Date du rendez-vous",
-            min_value=min_date,
-            max_value=max_date,
-            value=min_date,
-            format="DD/MM/YYYY"
+            options=list(bookable_days),
+            format_func=lambda d: f"{d.strftime('%A %d/%m/%Y')} ({bookable_days[d]} créneau(x) libre(s))",
+            key=f"date_select_{event['id']}"
         )
 
-    # Vérifier la disponibilité
-    if not is_date_available(selected_date, event_type=event):
-        st.warning("⚠️ Cette date n'est pas disponible. Veuillez en choisir une autre.")
-        return
-
-    # Récupérer les créneaux disponibles
-    slots = get_available_slots(selected_date, event["id"])
+    # Récupérer les créneaux disponibles (déjà chargés avec la fenêtre)
+    slots = snapshot.get_available_slots(selected_date)
 
     if not slots:
         st.warning("😔 Aucun créneau disponible pour cette date.")
@@ -190,11 +218,26 @@ def show_date_selection():
     st.divider()
     st.subheader("⏰ Choisissez un horaire")
 
+    reason = st.session_state.pop("slot_taken_on_pick", None)
+    if reason == "slot_held":
+        st.warning("😔 Ce créneau est en cours de réservation par un autre invité. Choisissez-en un autre.")
+    elif reason:
+        st.warning("😔 Ce créneau vient d'être réservé. Choisissez-en un autre.")
+
     # Afficher les créneaux en grille
     cols = st.columns(4)
     for i, slot in enumerate(slots):
         with cols[i % 4]:
             if st.button(slot["start"], key=f"slot_{slot['start']}", use_container_width=True):
+                try:
+                    st.session_state.slot_hold = hold_slot(
+                        event["id"], selected_date, slot["start"], slot["end"], st.session_state.hold_token
+                    )
+                except SlotUnavailableError as e:
+                    # Créneau pris ou bloqué depuis l'affichage : recharger les disponibilités
+                    st.session_state.pop("availability_prefetch", None)
+                    st.session_state.slot_taken_on_pick = e.reason
+                    st.rerun()
                 st.session_state.selected_date = selected_date
                 st.session_state.selected_slot = slot
                 st.session_state.booking_step = "form"
@@ -211,6 +254,7 @@ def show_booking_form():
     with col1:
         if st.button("← Retour"):
             st.session_state.booking_step = "date"
+            st.session_state.pop("slot_unavailable", None)
             st.rerun()
     with col2:
         st.markdown(f"### {event['name']}")
@@ -225,6 +269,9 @@ def show_booking_form():
     - ⏱️ **Durée :** {event['duration']} minutes
     """)
 
+    if st.session_state.get("slot_hold"):
+        st.caption(f"🔒 Ce créneau vous est réservé pendant {HOLD_TTL_SECONDS // 60} minutes.")
+
     st.divider()
     st.subheader("📝 Vos informations")
 
@@ -258,18 +305,42 @@ def show_booking_form():
                     "guest_email": guest_email,
                     "guest_phone": guest_phone or "",
                     "guest_notes": guest_notes or "",
-                    "status": "pending" if event.get("requires_approval") else "confirmed"
+                    "status": "pending" if event.get("requires_approval") else "confirmed",
+                    "hold_token": st.session_state.hold_token
                 }
 
-                booking = create_booking(booking_data)
+                try:
+                    booking = create_booking(booking_data)
+                except SlotUnavailableError as e:
+                    booking = None
+                    st.session_state.slot_unavailable = e.reason
+
+                # Les disponibilités préchargées ne reflètent plus cette tentative
+                st.session_state.pop("availability_prefetch", None)
 
                 if booking:
+                    # book_slot a libéré le blocage en même temps
+                    st.session_state.pop("slot_hold", None)
                     st.session_state.booking_result = booking
                     st.session_state.booking_step = "success"
                     st.rerun()
-                else:
+                elif "slot_unavailable" not in st.session_state:
                     st.error("❌ Une erreur est survenue. Veuillez réessayer.")
 
+    # Créneau pris entre-temps : proposer d'en choisir un autre sans perdre la saisie
+    reason = st.session_state.get("slot_unavailable")
+    if reason:
+        if reason == "day_full":
+            st.warning("😔 Cette journée est désormais complète pour ce rendez-vous.")
+        elif reason == "slot_held":
+            st.warning("😔 Ce créneau est en cours de réservation par un autre invité.")
+        else:
+            st.warning("😔 Ce créneau vient d'être réservé par quelqu'un d'autre.")
+        if st.button("📅 Choisir un autre créneau", use_container_width=True):
+            del st.session_state["slot_unavailable"]
+            st.session_state.booking_step = "date"
+            st.rerun()
+
 def show_success():
     """Affiche la confirmation de réservation"""
     booking = st.session_state.booking_result
@@ -306,7 +377,8 @@ def show_success():
 
     if st.button("📅 Prendre un autre rendez-vous", use_container_width=True):
         # Reset session
-        for key in ["selected_event", "selected_date", "selected_slot", "booking_result", "booking_step", "picked_date"]:
+        for key in ["selected_event", "selected_date", "selected_slot", "booking_result", "booking_step", "picked_date",
+                    "availability_prefetch", "slot_hold"]:
             if key in st.session_state:
                 del st.session_state[key]
         st.rerun()
@@ -319,6 +391,9 @@ def main():
     # Initialiser le step si nécessaire
     if "booking_step" not in st.session_state:
         st.session_state.booking_step = "event"
+    # Jeton identifiant les créneaux bloqués par cette session
+    if "hold_token" not in st.session_state:
+        st.session_state.hold_token = secrets.token_urlsafe(16)
 
     # Router
     step = st.session_state.booking_step
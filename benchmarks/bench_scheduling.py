@@ -0,0 +1,339 @@
+"""Benchmarks des chemins critiques de réservation.
+
+Génère des jeux de données synthétiques dans le backend local (APEL_BACKEND=local),
+de 1 000 à 1 000 000 de réservations, avec de nombreux types d'événements et plusieurs
+années d'exceptions, puis mesure pour chaque fonction le temps d'exécution et le
+nombre d'allers-retours vers la base par appel. Les résultats sont enregistrés en JSON
+dans benchmarks/results/ pour comparer les versions entre elles.
+
+Usage :
+    python benchmarks/bench_scheduling.py
+    python benchmarks/bench_scheduling.py --sizes 1000,10000,100000,1000000
+    python benchmarks/bench_scheduling.py --compare benchmarks/results/baseline.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.environ["APEL_BACKEND"] = "local"
+os.environ.setdefault("APEL_DIAGNOSTICS", "0")  # mesurer les chemins critiques, pas le journal des requêtes
+os.environ.setdefault("APEL_SWEEPER", "0")  # ne pas modifier les jeux de données pendant la mesure
+
+from streamlit.logger import set_log_level  # noqa: E402
+
+from utils import database as db  # noqa: E402
+
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+EVENT_TYPES = 20
+OVERRIDE_YEARS = 3
+DURATIONS = [15, 30, 45, 60]
+HOURS = range(8, 18)  # une réservation par heure et par type, sans chevauchement
+STATUSES = ["confirmed"] * 8 + ["pending", "cancelled"]
+REGRESSION_THRESHOLD = 1.25
+CONCURRENT_BOOKINGS = 50
+
+# Imports à froid (nouvel interpréteur) : cadre seul, page publique, pages d'administration
+IMPORT_PATHS = {
+    "streamlit": ["streamlit"],
+    "public": ["streamlit", "utils.database", "utils.async_database", "utils.prefetch", "utils.logo"],
+    "admin": ["streamlit", "utils.database", "utils.async_database", "utils.auth", "utils.export"],
+}
+HEAVY_MODULES = ["pandas", "numpy", "pyarrow"]
+IMPORT_RUNS = 5
+
+# ============================================
+# JEUX DE DONNÉES
+# ============================================
+
+def seed_dataset(client, size: int):
+    """Remplit la base avec `size` réservations, les plus récentes juste avant la fin de la fenêtre"""
+    today = date.today()
+    client.bulk_load("event_types", [
+        {
+            "name": f"Type {i}",
+            "slug": f"type-{i}",
+            "duration": DURATIONS[i % len(DURATIONS)],
+            "buffer_before": 5 * (i % 3),
+            "buffer_after": 5 * (i % 2),
+            "max_bookings_per_day": 8 if i % 5 == 0 else None,
+            "min_notice_hours": 24,
+            "max_days_ahead": 60,
+        }
+        for i in range(EVENT_TYPES)
+    ])
+    event_types = client.table("event_types").select("id, duration").order("id").execute().data
+
+    # Un jour fermé par semaine et des horaires réduits un jour sur deux semaines, sur plusieurs années
+    overrides = []
+    for week in range(-52 * OVERRIDE_YEARS, 52):
+        day = today + timedelta(weeks=week, days=week % 5)
+        if week % 2:
+            overrides.append({
+                "date": day.isoformat(), "is_available": False,
+                "start_time": None, "end_time": None, "reason": "Fermé",
+            })
+        else:
+            overrides.append({
+                "date": day.isoformat(), "is_available": True,
+                "start_time": "10:00", "end_time": "16:00", "reason": "Horaires réduits",
+            })
+    client.bulk_load("date_overrides", overrides)
+
+    per_day = len(event_types) * len(HOURS)
+    last_day = today + timedelta(days=60)
+    bookings = []
+    for i in range(size):
+        event = event_types[i % len(event_types)]
+        slot = i // len(event_types)
+        day = last_day - timedelta(days=i // per_day)
+        hour = HOURS[slot % len(HOURS)]
+        end = hour * 60 + event["duration"]
+        bookings.append({
+            "event_type_id": event["id"],
+            "date": day.isoformat(),
+            "start_time": f"{hour:02d}:00",
+            "end_time": db.minutes_to_time(end),
+            "guest_name": f"Invité {i}",
+            "guest_email": f"guest{i}@example.com",
+            "status": STATUSES[i % len(STATUSES)],
+            "cancel_token": f"tok{i:08d}",
+        })
+    client.bulk_load("bookings", bookings)
+    return event_types
+
+def open_client(path: str):
+    """Nouveau client local sur `path`, caches applicatifs vidés"""
+    os.environ["APEL_LOCAL_DB"] = path
+    db.get_supabase.clear()
+    db.invalidate_cache()
+    return db.get_supabase()
+
+# ============================================
+# MESURES
+# ============================================
+
+def measure(client, func, repeat: int, cold: bool = False):
+    """Temps (ms) et allers-retours par appel ; `cold` vide le cache avant chaque appel"""
+    timings = []
+    round_trips = 0
+    for _ in range(repeat):
+        if cold:
+            db.invalidate_cache()
+        before = client.round_trips
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+        round_trips += client.round_trips - before
+    timings.sort()
+    return {
+        "median_ms": round(statistics.median(timings), 4),
+        "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 4),
+        "round_trips": round(round_trips / repeat, 2),
+    }
+
+def target_date():
+    """Premier jour ouvré à au moins une semaine, sans exception"""
+    overrides = {o["date"] for o in db.get_date_overrides()}
+    day = date.today() + timedelta(days=7)
+    while day.weekday() >= 5 or day.isoformat() in overrides:
+        day += timedelta(days=1)
+    return day
+
+def run_cases(client, event_types, repeat: int):
+    """Mesure chaque fonction à froid (cache vidé) et à chaud"""
+    day = target_date()
+    event = db.get_event_type_by_id(event_types[1]["id"])
+    min_date, max_date = db.get_booking_window(event)
+    first_page, cursor = db.get_bookings_page()
+
+    cases = {
+        "generate_time_slots": (lambda: db.generate_time_slots("08:00", "18:00", 15), repeat * 50, False),
+        "get_available_slots.cold": (lambda: db.get_available_slots(day, event["id"]), repeat, True),
+        "get_available_slots.warm": (lambda: db.get_available_slots(day, event["id"]), repeat, False),
+        "get_bookable_days.cold": (lambda: db.get_bookable_days(event["id"], min_date, max_date), repeat, True),
+        "is_date_available.cold": (lambda: db.is_date_available(day, event), repeat, True),
+        "is_date_available.warm": (lambda: db.is_date_available(day, event), repeat, False),
+        "get_bookings.first_page": (lambda: db.get_bookings(limit=db.BOOKINGS_PAGE_SIZE), repeat, False),
+        "get_bookings.next_page": (lambda: db.get_bookings_page(after=cursor), repeat, False),
+        "get_bookings.search": (lambda: db.get_bookings(search="guest12", limit=db.BOOKINGS_PAGE_SIZE), repeat, False),
+        "get_stats.cold": (db.get_stats, repeat, True),
+    }
+    return {name: measure(client, func, n, cold) for name, (func, n, cold) in cases.items()}
+
+def run_concurrency(event_types):
+    """Réservations simultanées d'un même créneau : une seule doit aboutir"""
+    day = date.today() + timedelta(days=90)
+    data = {
+        "event_type_id": event_types[1]["id"],
+        "date": day.isoformat(),
+        "start_time": "10:00",
+        "end_time": "10:30",
+        "guest_name": "Course",
+        "guest_email": "race@example.com",
+        "status": "confirmed",
+    }
+
+    def attempt(i):
+        try:
+            db.create_booking({**data, "guest_email": f"race{i}@example.com"})
+            return "booked"
+        except db.SlotUnavailableError as e:
+            return e.reason
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=CONCURRENT_BOOKINGS) as pool:
+        outcomes = list(pool.map(attempt, range(CONCURRENT_BOOKINGS)))
+    return {
+        "attempts": CONCURRENT_BOOKINGS,
+        "booked": outcomes.count("booked"),
+        "slot_taken": outcomes.count("slot_taken"),
+        "wall_ms": round((time.perf_counter() - start) * 1000, 2),
+        "ok": outcomes.count("booked") == 1,
+    }
+
+def run_size(size: int, repeat: int, workdir: str):
+    """Jeu de données de `size` réservations : remplissage, mesures et test de concurrence"""
+    client = open_client(os.path.join(workdir, f"bench_{size}.db"))
+    start = time.perf_counter()
+    event_types = seed_dataset(client, size)
+    seed_seconds = time.perf_counter() - start
+    return {
+        "seed_seconds": round(seed_seconds, 2),
+        "cases": run_cases(client, event_types, repeat),
+        "concurrency": run_concurrency(event_types),
+    }
+
+def measure_imports(runs: int = IMPORT_RUNS):
+    """Durée d'import de chaque chemin dans un interpréteur neuf, et modules lourds chargés"""
+    results = {}
+    for name, modules in IMPORT_PATHS.items():
+        code = (
+            "import json, sys, time\n"
+            "start = time.perf_counter()\n"
+            + "".join(f"import {module}\n" for module in modules)
+            + "elapsed = (time.perf_counter() - start) * 1000\n"
+            f"print(json.dumps([elapsed, [m for m in {HEAVY_MODULES!r} if m in sys.modules]]))\n"
+        )
+        timings = []
+        for _ in range(runs):
+            output = subprocess.run(
+                [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True
+            ).stdout
+            elapsed, heavy = json.loads(output.strip().splitlines()[-1])
+            timings.append(elapsed)
+        results[name] = {"median_ms": round(statistics.median(timings), 1), "heavy_modules": heavy}
+    return results
+
+# ============================================
+# RÉSULTATS
+# ============================================
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def compare(current: dict, baseline: dict, threshold: float):
+    """Liste les mesures plus lentes (ou plus bavardes) que la référence au-delà du seuil"""
+    regressions = []
+    for name, stats in current.get("imports", {}).items():
+        before = baseline.get("imports", {}).get(name)
+        if not before:
+            continue
+        ratio = stats["median_ms"] / before["median_ms"] if before["median_ms"] else 1.0
+        added = sorted(set(stats["heavy_modules"]) - set(before["heavy_modules"]))
+        if ratio > threshold or added:
+            regressions.append(
+                f"{'import':>9} {name:<28} {before['median_ms']:.1f} -> {stats['median_ms']:.1f} ms "
+                f"(x{ratio:.2f})" + (f", nouveaux modules lourds : {', '.join(added)}" if added else "")
+            )
+    for size, result in current["sizes"].items():
+        previous = baseline.get("sizes", {}).get(size)
+        if not previous:
+            continue
+        for name, stats in result["cases"].items():
+            before = previous["cases"].get(name)
+            if not before:
+                continue
+            ratio = stats["median_ms"] / before["median_ms"] if before["median_ms"] else 1.0
+            if ratio > threshold or stats["round_trips"] > before["round_trips"]:
+                regressions.append(
+                    f"{size:>9} {name:<28} {before['median_ms']:.3f} -> {stats['median_ms']:.3f} ms "
+                    f"(x{ratio:.2f}), allers-retours {before['round_trips']} -> {stats['round_trips']}"
+                )
+    return regressions
+
+def print_report(report: dict):
+    print("== imports à froid")
+    for name, stats in report["imports"].items():
+        print(f"{name:<28} {stats['median_ms']:>10.1f} ms  modules lourds : {', '.join(stats['heavy_modules']) or '-'}")
+    for size, result in report["sizes"].items():
+        print(f"\n== {int(size):,} réservations (remplissage {result['seed_seconds']} s)")
+        print(f"{'fonction':<28} {'médiane ms':>12} {'p95 ms':>10} {'allers-retours':>15}")
+        for name, stats in result["cases"].items():
+            print(f"{name:<28} {stats['median_ms']:>12.3f} {stats['p95_ms']:>10.3f} {stats['round_trips']:>15}")
+        race = result["concurrency"]
+        print(f"concurrence : {race['booked']}/{race['attempts']} réservée(s), "
+              f"{race['slot_taken']} refusée(s) en {race['wall_ms']} ms -> {'OK' if race['ok'] else 'ÉCHEC'}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="tailles des jeux de données (nombre de réservations), séparées par des virgules")
+    parser.add_argument("--repeat", type=int, default=20, help="nombre d'appels par mesure")
+    parser.add_argument("--label", default=None, help="nom du fichier de résultats (révision git par défaut)")
+    parser.add_argument("--compare", default=None, help="fichier de résultats de référence")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="ratio de médiane au-delà duquel une mesure est signalée")
+    args = parser.parse_args()
+
+    set_log_level("error")
+    revision = git_revision()
+    report = {
+        "label": args.label or revision,
+        "revision": revision,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "imports": measure_imports(),
+        "sizes": {},
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in (int(s) for s in args.sizes.split(",")):
+            report["sizes"][str(size)] = run_size(size, args.repeat, workdir)
+        db.get_supabase.clear()
+
+    print_report(report)
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    output = RESULTS_DIR / f"{report['label']}.json"
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+    print(f"\nRésultats enregistrés dans {output.relative_to(ROOT)}")
+
+    failed = any(not r["concurrency"]["ok"] for r in report["sizes"].values())
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        regressions = compare(report, baseline, args.threshold)
+        print(f"\nComparaison avec {baseline.get('label')} : "
+              f"{len(regressions)} régression(s)" + "".join(f"\n  {r}" for r in regressions))
+        failed = failed or bool(regressions)
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
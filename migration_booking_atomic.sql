@@ -0,0 +1,66 @@
+-- =============================================
+-- MIGRATION: Réservation atomique (pas de double réservation)
+-- =============================================
+-- Exécutez ce script dans l'éditeur SQL de Supabase
+-- (Dashboard > SQL Editor > New Query)
+-- Cette migration NE supprime PAS les données existantes.
+-- Si des réservations actives se chevauchent déjà, la contrainte ne pourra pas
+-- être créée : annulez les doublons avant de lancer le script.
+
+-- 1. Deux réservations actives ne peuvent pas se chevaucher, quel que soit leur type
+-- d'événement : tous les types partagent le même agenda (comme AvailabilitySnapshot).
+ALTER TABLE bookings DROP CONSTRAINT IF EXISTS bookings_no_overlap;
+ALTER TABLE bookings ADD CONSTRAINT bookings_no_overlap
+    EXCLUDE USING gist (
+        tsrange(date + start_time, date + end_time) WITH &&
+    ) WHERE (status IN ('confirmed', 'pending'));
+
+-- 2. Fonction de réservation appelée par l'application (RPC)
+-- Le verrou transactionnel sérialise les réservations d'un même jour, tous types
+-- d'événements confondus, ce qui rend le contrôle de max_bookings_per_day sûr.
+-- Les buffers sont contrôlés par la version de migration_slot_holds.sql.
+-- Erreurs : 23P01 (créneau déjà pris), AP001 (journée complète).
+CREATE OR REPLACE FUNCTION book_slot(p_booking JSONB)
+RETURNS bookings
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_event_type_id BIGINT := (p_booking->>'event_type_id')::BIGINT;
+    v_date DATE := (p_booking->>'date')::DATE;
+    v_max INTEGER;
+    v_count INTEGER;
+    v_booking bookings;
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('apel_day'), (v_date - DATE '2000-01-01'));
+
+    SELECT max_bookings_per_day INTO v_max FROM event_types WHERE id = v_event_type_id;
+    IF v_max IS NOT NULL THEN
+        SELECT count(*) INTO v_count
+        FROM bookings
+        WHERE event_type_id = v_event_type_id
+          AND date = v_date
+          AND status IN ('confirmed', 'pending');
+        IF v_count >= v_max THEN
+            RAISE EXCEPTION 'day_full' USING ERRCODE = 'AP001';
+        END IF;
+    END IF;
+
+    INSERT INTO bookings (
+        event_type_id, date, start_time, end_time,
+        guest_name, guest_email, guest_phone, guest_notes, status
+    ) VALUES (
+        v_event_type_id,
+        v_date,
+        (p_booking->>'start_time')::TIME,
+        (p_booking->>'end_time')::TIME,
+        p_booking->>'guest_name',
+        p_booking->>'guest_email',
+        COALESCE(p_booking->>'guest_phone', ''),
+        COALESCE(p_booking->>'guest_notes', ''),
+        COALESCE(p_booking->>'status', 'confirmed')
+    )
+    RETURNING * INTO v_booking;
+
+    RETURN v_booking;
+END;
+$$;
@@ -0,0 +1,15 @@
+-- =============================================
+-- MIGRATION: Index pour la liste paginée des réservations
+-- =============================================
+-- Exécutez ce script dans l'éditeur SQL de Supabase
+-- (Dashboard > SQL Editor > New Query)
+-- Cette migration NE supprime PAS les données existantes.
+
+-- 1. Pagination par clé (date, start_time, id), du plus récent au plus ancien
+CREATE INDEX IF NOT EXISTS idx_bookings_keyset ON bookings(date DESC, start_time DESC, id DESC);
+
+-- 2. Recherche "contient" (ILIKE '%...%') sur nom, email et téléphone
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS idx_bookings_guest_name_trgm ON bookings USING gin (guest_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_bookings_guest_email_trgm ON bookings USING gin (guest_email gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_bookings_guest_phone_trgm ON bookings USING gin (guest_phone gin_trgm_ops);
@@ -0,0 +1,43 @@
+-- =============================================
+-- MIGRATION: Clôture automatique des réservations passées
+-- =============================================
+-- Exécutez ce script dans l'éditeur SQL de Supabase
+-- (Dashboard > SQL Editor > New Query)
+-- Cette migration NE supprime PAS les données existantes.
+-- L'application passe périodiquement en 'completed' les réservations confirmées
+-- dont l'horaire est terminé (utils/sweeper.py).
+
+-- 1. Index partiel : seules les réservations encore confirmées sont parcourues
+CREATE INDEX IF NOT EXISTS idx_bookings_confirmed_date ON bookings(date, id) WHERE status = 'confirmed';
+
+-- 2. Clôture d'un lot de réservations terminées ; retourne le nombre de lignes modifiées.
+-- Un seul lot à la fois : si le verrou est déjà pris, retourne NULL sans rien faire.
+-- Le verrou est libéré à la fin de la transaction, donc après chaque lot (et non après
+-- tout le passage) : d'autres réplicas peuvent intercaler leurs lots, ce qui est sans
+-- risque puisque seules les réservations encore confirmées sont reprises.
+-- p_today et p_now sont la date et l'heure côté application (le fuseau de la base peut différer).
+CREATE OR REPLACE FUNCTION complete_past_bookings(p_today DATE, p_now TIME, p_batch_size INTEGER DEFAULT 500)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_count INTEGER;
+BEGIN
+    IF NOT pg_try_advisory_xact_lock(hashtext('complete_past_bookings')) THEN
+        RETURN NULL;
+    END IF;
+
+    UPDATE bookings SET status = 'completed'
+    WHERE id IN (
+        SELECT id FROM bookings
+        WHERE status = 'confirmed'
+          AND (date < p_today OR (date = p_today AND end_time <= p_now))
+        ORDER BY date, id
+        LIMIT p_batch_size
+        FOR UPDATE SKIP LOCKED
+    );
+    GET DIAGNOSTICS v_count = ROW_COUNT;
+
+    RETURN v_count;
+END;
+$$;
@@ -0,0 +1,195 @@
+-- =============================================
+-- MIGRATION: Blocage temporaire des créneaux
+-- =============================================
+-- Exécutez ce script dans l'éditeur SQL de Supabase
+-- (Dashboard > SQL Editor > New Query)
+-- Cette migration NE supprime PAS les données existantes.
+-- Quand un invité choisit un créneau, celui-ci lui est réservé quelques minutes
+-- le temps de remplir le formulaire : les autres invités ne le voient plus.
+
+-- 1. Table des blocages (un par invité, identifié par son jeton de session)
+CREATE TABLE IF NOT EXISTS slot_holds (
+    id BIGSERIAL PRIMARY KEY,
+    event_type_id BIGINT NOT NULL REFERENCES event_types(id) ON DELETE CASCADE,
+    date DATE NOT NULL,
+    start_time TIME NOT NULL,
+    end_time TIME NOT NULL,
+    hold_token TEXT NOT NULL UNIQUE,
+    expires_at TIMESTAMPTZ NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_slot_holds_date ON slot_holds(date, expires_at);
+
+ALTER TABLE slot_holds ENABLE ROW LEVEL SECURITY;
+DROP POLICY IF EXISTS "Public read slot_holds" ON slot_holds;
+CREATE POLICY "Public read slot_holds" ON slot_holds FOR SELECT USING (true);
+-- Les jetons ne sont pas lisibles : seul leur détenteur peut libérer son blocage
+REVOKE SELECT ON slot_holds FROM anon, authenticated;
+GRANT SELECT (id, event_type_id, date, start_time, end_time, expires_at) ON slot_holds TO anon, authenticated;
+-- Pas de policy d'écriture : les blocages ne changent que par les fonctions ci-dessous
+
+-- 2. Conflit d'un créneau avec les réservations actives et les blocages du jour, TOUS
+-- types d'événements confondus et buffers compris (même règle que AvailabilitySnapshot) :
+-- 'slot_taken', 'slot_held' ou NULL. Appelée sous le verrou du jour par les fonctions suivantes.
+CREATE OR REPLACE FUNCTION slot_conflict(
+    p_event_type_id BIGINT, p_date DATE, p_start_time TIME, p_end_time TIME, p_hold_token TEXT
+)
+RETURNS TEXT
+LANGUAGE sql
+STABLE
+SET search_path = public
+AS $$
+    WITH slot AS (
+        SELECT p_date + p_start_time AS s,
+               p_date + p_end_time AS e,
+               make_interval(mins => COALESCE(buffer_before, 0)) AS b,
+               make_interval(mins => COALESCE(buffer_after, 0)) AS a
+        FROM event_types WHERE id = p_event_type_id
+    ),
+    busy AS (
+        SELECT 'slot_taken' AS reason, date + start_time AS s, date + end_time AS e, event_type_id
+        FROM bookings
+        WHERE date = p_date AND status IN ('confirmed', 'pending')
+        UNION ALL
+        SELECT 'slot_held', date + start_time, date + end_time, event_type_id
+        FROM slot_holds
+        WHERE date = p_date AND expires_at > NOW() AND hold_token <> COALESCE(p_hold_token, '')
+    )
+    SELECT busy.reason
+    FROM slot, busy
+    JOIN event_types et ON et.id = busy.event_type_id
+    WHERE (busy.s < slot.e + slot.a AND busy.e > slot.s - slot.b)
+       OR (busy.s - make_interval(mins => COALESCE(et.buffer_before, 0)) < slot.e
+           AND busy.e + make_interval(mins => COALESCE(et.buffer_after, 0)) > slot.s)
+    ORDER BY busy.reason = 'slot_taken' DESC
+    LIMIT 1;
+$$;
+
+-- 3. Poser le blocage d'un invité (remplace son blocage précédent)
+-- Même verrou du jour que book_slot. Erreurs : 23P01 (créneau réservé), AP002 (créneau bloqué).
+CREATE OR REPLACE FUNCTION hold_slot(
+    p_event_type_id BIGINT, p_date DATE, p_start_time TIME, p_end_time TIME,
+    p_hold_token TEXT, p_ttl_seconds INTEGER DEFAULT 600
+)
+RETURNS slot_holds
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_hold slot_holds;
+    v_conflict TEXT;
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('apel_day'), (p_date - DATE '2000-01-01'));
+
+    DELETE FROM slot_holds
+    WHERE hold_token = p_hold_token
+       OR (date = p_date AND expires_at <= NOW());
+
+    v_conflict := slot_conflict(p_event_type_id, p_date, p_start_time, p_end_time, p_hold_token);
+    IF v_conflict = 'slot_taken' THEN
+        RAISE EXCEPTION 'slot_taken' USING ERRCODE = '23P01';
+    ELSIF v_conflict = 'slot_held' THEN
+        RAISE EXCEPTION 'slot_held' USING ERRCODE = 'AP002';
+    END IF;
+
+    INSERT INTO slot_holds (event_type_id, date, start_time, end_time, hold_token, expires_at)
+    VALUES (
+        p_event_type_id, p_date, p_start_time, p_end_time, p_hold_token,
+        NOW() + make_interval(secs => LEAST(GREATEST(p_ttl_seconds, 30), 1800))
+    )
+    RETURNING * INTO v_hold;
+
+    RETURN v_hold;
+END;
+$$;
+
+-- 4. Libérer le blocage d'un invité (retourne la ligne supprimée, s'il y en avait une)
+CREATE OR REPLACE FUNCTION release_hold(p_hold_token TEXT)
+RETURNS SETOF slot_holds
+LANGUAGE sql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+    DELETE FROM slot_holds WHERE hold_token = p_hold_token RETURNING *;
+$$;
+
+-- 5. book_slot refuse un créneau occupé ou bloqué par un autre invité (buffers compris)
+-- et libère le blocage de l'invité
+-- Erreurs : 23P01 (créneau déjà pris), AP001 (journée complète), AP002 (créneau bloqué).
+-- SECURITY DEFINER : le contrôle des blocages lit hold_token, non lisible par anon.
+-- extensions dans search_path : le trigger du jeton d'annulation appelle gen_random_bytes.
+CREATE OR REPLACE FUNCTION book_slot(p_booking JSONB)
+RETURNS bookings
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public, extensions
+AS $$
+DECLARE
+    v_event_type_id BIGINT := (p_booking->>'event_type_id')::BIGINT;
+    v_date DATE := (p_booking->>'date')::DATE;
+    v_start_time TIME := (p_booking->>'start_time')::TIME;
+    v_end_time TIME := (p_booking->>'end_time')::TIME;
+    v_hold_token TEXT := COALESCE(p_booking->>'hold_token', '');
+    v_max INTEGER;
+    v_count INTEGER;
+    v_booking bookings;
+    v_conflict TEXT;
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('apel_day'), (v_date - DATE '2000-01-01'));
+
+    SELECT max_bookings_per_day INTO v_max FROM event_types WHERE id = v_event_type_id;
+    IF v_max IS NOT NULL THEN
+        SELECT count(*) INTO v_count
+        FROM bookings
+        WHERE event_type_id = v_event_type_id
+          AND date = v_date
+          AND status IN ('confirmed', 'pending');
+        IF v_count >= v_max THEN
+            RAISE EXCEPTION 'day_full' USING ERRCODE = 'AP001';
+        END IF;
+    END IF;
+
+    v_conflict := slot_conflict(v_event_type_id, v_date, v_start_time, v_end_time, v_hold_token);
+    IF v_conflict = 'slot_taken' THEN
+        RAISE EXCEPTION 'slot_taken' USING ERRCODE = '23P01';
+    ELSIF v_conflict = 'slot_held' THEN
+        RAISE EXCEPTION 'slot_held' USING ERRCODE = 'AP002';
+    END IF;
+
+    INSERT INTO bookings (
+        event_type_id, date, start_time, end_time,
+        guest_name, guest_email, guest_phone, guest_notes, status
+    ) VALUES (
+        v_event_type_id,
+        v_date,
+        v_start_time,
+        v_end_time,
+        p_booking->>'guest_name',
+        p_booking->>'guest_email',
+        COALESCE(p_booking->>'guest_phone', ''),
+        COALESCE(p_booking->>'guest_notes', ''),
+        COALESCE(p_booking->>'status', 'confirmed')
+    )
+    RETURNING * INTO v_booking;
+
+    PERFORM release_hold(v_hold_token);
+
+    RETURN v_booking;
+END;
+$$;
+
+-- 6. Créneaux occupés (réservations actives et blocages non expirés) lus en une seule
+-- requête par l'application ; expires_at est NULL pour une réservation.
+-- La vue s'exécute avec les droits de son propriétaire et n'expose pas hold_token.
+CREATE OR REPLACE VIEW busy_slots AS
+    SELECT date, start_time, end_time, event_type_id, NULL::TIMESTAMPTZ AS expires_at
+    FROM bookings
+    WHERE status IN ('confirmed', 'pending')
+    UNION ALL
+    SELECT date, start_time, end_time, event_type_id, expires_at
+    FROM slot_holds
+    WHERE expires_at > NOW();
+
+GRANT SELECT ON busy_slots TO anon, authenticated;
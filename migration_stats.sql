@@ -0,0 +1,23 @@
+-- =============================================
+-- MIGRATION: Statistiques du dashboard en une requête
+-- =============================================
+-- Exécutez ce script dans l'éditeur SQL de Supabase
+-- (Dashboard > SQL Editor > New Query)
+-- Cette migration NE supprime PAS les données existantes.
+
+-- Tous les compteurs du dashboard en un seul parcours de bookings.
+-- p_today est la date du jour côté application (le fuseau de la base peut différer).
+CREATE OR REPLACE FUNCTION get_booking_stats(p_today DATE)
+RETURNS JSON
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT json_build_object(
+        'total', count(*),
+        'confirmed', count(*) FILTER (WHERE status = 'confirmed'),
+        'upcoming', count(*) FILTER (WHERE status = 'confirmed' AND date >= p_today),
+        'cancelled', count(*) FILTER (WHERE status = 'cancelled'),
+        'event_types', (SELECT count(*) FROM event_types WHERE is_active)
+    )
+    FROM bookings;
+$$;
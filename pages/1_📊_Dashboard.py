@@ -1,8 +1,8 @@
 import streamlit as st
-from datetime import date, timedelta
 from utils.auth import require_auth, logout
-from utils.database import get_stats, get_bookings, get_settings
+from utils.async_database import get_dashboard_data, QueryTimeoutError
 from utils.logo import get_logo
+from utils.instrumentation import start_rerun
 
 st.set_page_config(
     page_title="Dashboard - Apel Calendar",
@@ -10,6 +10,8 @@ st.set_page_config(
     layout="wide"
 )
 
+start_rerun("Dashboard")
+
 # Protection par mot de passe
 require_auth()
 
@@ -23,8 +25,12 @@ with col2:
 
 st.divider()
 
-# Statistiques
-stats = get_stats()
+# Statistiques, prochains rendez-vous et paramètres (lus en parallèle)
+try:
+    stats, upcoming_bookings, settings = get_dashboard_data(upcoming_limit=10)
+except QueryTimeoutError:
+    st.error("❌ Les données n'ont pas pu être chargées. Veuillez recharger la page.")
+    st.stop()
 
 col1, col2, col3, col4, col5 = st.columns(5)
 
@@ -44,13 +50,10 @@ st.divider()
 # Prochains rendez-vous
 st.subheader("📆 Prochains rendez-vous")
 
-upcoming_bookings = get_bookings(status="confirmed", upcoming_only=True)
-
 if not upcoming_bookings:
     st.info("Aucun rendez-vous à venir.")
 else:
-    # Limiter à 10
-    for booking in upcoming_bookings[:10]:
+    for booking in upcoming_bookings:
         event_info = booking.get("event_types", {})
         event_name = event_info.get("name", "Événement") if event_info else "Événement"
         event_color = event_info.get("color", "#3b82f6") if event_info else "#3b82f6"
@@ -78,6 +81,5 @@ else:
 
 # Lien rapide
 st.subheader("🔗 Lien de réservation")
-settings = get_settings()
 st.info("Partagez ce lien avec vos clients pour qu'ils puissent réserver :")
 st.code("https://apel-calendar.streamlit.app/")
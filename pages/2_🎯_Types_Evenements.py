@@ -2,12 +2,13 @@ import streamlit as st
 import re
 from utils.auth import require_auth, logout
 from utils.database import (
-    get_event_types, create_event_type, update_event_type, delete_event_type,
-    get_event_type_dates, add_event_type_date, delete_event_type_date,
-    delete_all_event_type_dates
+    get_event_types_with_dates, create_event_type, update_event_type, delete_event_type,
+    add_event_type_date, add_event_type_dates, delete_event_type_date,
+    delete_all_event_type_dates, get_date_overrides, generate_dates
 )
-from datetime import date, timedelta
+from datetime import date, datetime, timedelta
 from utils.logo import get_logo
+from utils.instrumentation import start_rerun
 
 st.set_page_config(
     page_title="Types d'événements - Apel Calendar",
@@ -15,6 +16,8 @@ st.set_page_config(
     layout="wide"
 )
 
+start_rerun("Types d'événements")
+
 # Protection par mot de passe
 require_auth()
 
@@ -40,6 +43,8 @@ COLORS = [
     ("#84cc16", "Lime"),
 ]
 
+DAYS = ["Lundi", "Mardi", "Mercredi", "Jeudi", "Vendredi", "Samedi", "Dimanche"]
+
 def generate_slug(name: str) -> str:
     """Génère un slug à partir du nom"""
     slug = name.lower()
@@ -53,6 +58,18 @@ def generate_slug(name: str) -> str:
     slug = slug.strip('-')
     return slug
 
+def parse_periods(text: str):
+    """Lit une période par ligne (JJ/MM/AAAA - JJ/MM/AAAA, ou une date seule)"""
+    periods = []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        bounds = [datetime.strptime(b.strip(), "%d/%m/%Y").date() for b in line.split(" - ")]
+        if len(bounds) > 2:
+            raise ValueError(line)
+        periods.append((bounds[0], bounds[-1]))
+    return periods
+
 # Bouton pour créer
 if st.button("➕ Nouveau type d'événement", type="primary"):
     st.session_state.show_create_form = True
@@ -88,6 +105,12 @@ if st.session_state.get("show_create_form", False):
                 max_days = st.number_input("Réservation max (jours)", min_value=1, value=60)
                 buffer_after = st.number_input("Buffer après (minutes)", min_value=0, value=0)
 
+            max_per_day = st.number_input(
+                "Réservations max par jour",
+                min_value=0,
+                value=0,
+                help="0 = illimité"
+            )
             requires_approval = st.checkbox("Nécessite approbation")
 
             st.markdown("**Dates de l'événement**")
@@ -122,6 +145,7 @@ if st.session_state.get("show_create_form", False):
                         "buffer_before": buffer_before,
                         "buffer_after": buffer_after,
                         "requires_approval": requires_approval,
+                        "max_bookings_per_day": max_per_day or None,
                         "use_specific_dates": use_specific_dates
                     }
                     try:
@@ -139,7 +163,8 @@ st.divider()
 # Liste des types d'événements
 st.subheader("📋 Types d'événements existants")
 
-event_types = get_event_types()
+# Une seule requête : chaque type arrive avec ses dates spécifiques
+event_types = get_event_types_with_dates()
 
 if not event_types:
     st.info("Aucun type d'événement. Créez-en un pour commencer !")
@@ -152,8 +177,7 @@ else:
                 status_badge = "✅" if event["is_active"] else "⏸️"
                 dates_badge = ""
                 if event.get("use_specific_dates"):
-                    event_dates = get_event_type_dates(event["id"])
-                    nb_dates = len(event_dates)
+                    nb_dates = len(event["event_type_dates"])
                     dates_badge = f" | 📅 {nb_dates} date(s) spécifique(s)"
                 st.markdown(f"""
                 <div style="border-left: 4px solid {event['color']}; padding-left: 16px;">
@@ -195,7 +219,7 @@ else:
             if st.session_state.get(f"manage_dates_{event['id']}", False):
                 with st.container():
                     st.markdown(f"**📅 Dates pour : {event['name']}**")
-                    event_dates = get_event_type_dates(event["id"])
+                    event_dates = event["event_type_dates"]
 
                     # Ajouter une date
                     add_col1, add_col2 = st.columns([3, 1])
@@ -217,13 +241,71 @@ else:
                                 add_event_type_date(event["id"], new_date)
                                 st.rerun()
 
+                    # Générer des dates à partir d'une règle (un seul envoi)
+                    generated = st.session_state.pop(f"generated_dates_{event['id']}", None)
+                    if generated:
+                        created, total = generated
+                        st.success(f"✅ {created} date(s) ajoutée(s)"
+                                   + (f", {total - created} déjà présente(s)." if total > created else "."))
+
+                    with st.expander("🗓️ Générer des dates"):
+                        with st.form(f"generate_dates_{event['id']}"):
+                            gen_col1, gen_col2 = st.columns(2)
+                            with gen_col1:
+                                gen_start = st.date_input(
+                                    "Du", min_value=date.today(), value=date.today() + timedelta(days=1),
+                                    format="DD/MM/YYYY"
+                                )
+                            with gen_col2:
+                                gen_end = st.date_input(
+                                    "Au", min_value=date.today(), value=date.today() + timedelta(days=90),
+                                    format="DD/MM/YYYY"
+                                )
+                            gen_weekdays = st.multiselect(
+                                "Jours de la semaine",
+                                options=list(range(7)),
+                                default=[2],
+                                format_func=lambda d: DAYS[d]
+                            )
+                            gen_excluded = st.text_area(
+                                "Périodes exclues (vacances)",
+                                placeholder="19/10/2026 - 01/11/2026\n21/12/2026 - 03/01/2027",
+                                help="Une période par ligne, ou une date seule."
+                            )
+                            gen_skip_blocked = st.checkbox(
+                                "Exclure les jours bloqués (page Disponibilités)", value=True
+                            )
+
+                            if st.form_submit_button("🗓️ Générer", use_container_width=True):
+                                try:
+                                    excluded_periods = parse_periods(gen_excluded)
+                                except ValueError:
+                                    excluded_periods = None
+                                    st.error("❌ Période invalide : utilisez le format JJ/MM/AAAA - JJ/MM/AAAA.")
+
+                                if excluded_periods is None:
+                                    pass
+                                elif gen_end < gen_start or not gen_weekdays:
+                                    st.error("❌ Choisissez une période valide et au moins un jour de la semaine.")
+                                else:
+                                    blocked = [
+                                        date.fromisoformat(o["date"]) for o in get_date_overrides()
+                                        if not o["is_available"]
+                                    ] if gen_skip_blocked else []
+                                    dates = generate_dates(gen_start, gen_end, gen_weekdays, excluded_periods, blocked)
+                                    if not dates:
+                                        st.warning("Aucune date ne correspond à cette règle.")
+                                    else:
+                                        created = add_event_type_dates(event["id"], dates)
+                                        st.session_state[f"generated_dates_{event['id']}"] = (len(created), len(dates))
+                                        st.rerun()
+
                     # Liste des dates existantes
                     if event_dates:
                         for ed in event_dates:
                             d_col1, d_col2 = st.columns([4, 1])
                             with d_col1:
-                                from datetime import datetime as dt
-                                parsed = dt.strptime(ed["date"], "%Y-%m-%d")
+                                parsed = datetime.strptime(ed["date"], "%Y-%m-%d")
                                 st.write(f"📌 {parsed.strftime('%A %d/%m/%Y')}")
                             with d_col2:
                                 if st.button("❌", key=f"del_date_{ed['id']}"):
@@ -266,6 +348,12 @@ else:
                             format_func=lambda x: next((c[1] for c in COLORS if c[0] == x), x)
                         )
                         edit_location = st.text_input("Lieu", value=event["location"] or "")
+                        edit_max_per_day = st.number_input(
+                            "Réservations max par jour",
+                            min_value=0,
+                            value=event.get("max_bookings_per_day") or 0,
+                            help="0 = illimité"
+                        )
 
                     edit_use_specific_dates = st.checkbox(
                         "Utiliser des dates spécifiques",
@@ -283,6 +371,7 @@ else:
                                 "color": edit_color,
                                 "location": edit_location,
                                 "slug": generate_slug(edit_name),
+                                "max_bookings_per_day": edit_max_per_day or None,
                                 "use_specific_dates": edit_use_specific_dates
                             }
                             update_event_type(event["id"], update_data)
@@ -1,11 +1,12 @@
 import streamlit as st
 from utils.auth import require_auth, logout
 from utils.database import (
-    get_availability, update_availability, create_availability, delete_availability,
+    get_availability, save_availability, create_availability,
     get_date_overrides, create_date_override, delete_date_override
 )
-from datetime import date, time, timedelta
+from datetime import date, datetime, time, timedelta
 from utils.logo import get_logo
+from utils.instrumentation import start_rerun
 
 st.set_page_config(
     page_title="Disponibilités - Apel Calendar",
@@ -13,6 +14,8 @@ st.set_page_config(
     layout="wide"
 )
 
+start_rerun("Disponibilités")
+
 # Protection par mot de passe
 require_auth()
 
@@ -49,21 +52,33 @@ with tab1:
             avail_by_day[day] = []
         avail_by_day[day].append(avail)
 
-    for day_index, day_name in enumerate(DAYS):
-        with st.expander(f"**{day_name}**", expanded=day_index < 5):
-            day_avails = avail_by_day.get(day_index, [])
+    def parse_time(value):
+        return datetime.strptime(str(value)[:5], "%H:%M").time()
+
+    # Les modifications restent locales au formulaire (pas de rerun par widget) ;
+    # seules les lignes modifiées sont enregistrées, en un lot, à la validation
+    # Résultat du dernier enregistrement (affiché après le rerun qui recharge les horaires)
+    saved = st.session_state.pop("availability_saved", None)
+    if saved:
+        updated, deleted = saved
+        st.success(f"✅ {updated} plage(s) modifiée(s), {deleted} supprimée(s).")
+
+    with st.form("weekly_availability"):
+        edited = []
+        for day_index, day_name in enumerate(DAYS):
+            with st.expander(f"**{day_name}**", expanded=day_index < 5):
+                day_avails = avail_by_day.get(day_index, [])
+
+                if not day_avails:
+                    st.info("Aucune disponibilité configurée pour ce jour.")
 
-            if not day_avails:
-                st.info("Aucune disponibilité configurée pour ce jour.")
-            else:
                 for avail in day_avails:
                     col1, col2, col3, col4 = st.columns([2, 2, 1, 1])
 
                     with col1:
                         start_time = st.time_input(
                             "Début",
-                            value=avail["start_time"] if isinstance(avail["start_time"], type(None)) else
-                                  __import__('datetime').datetime.strptime(str(avail["start_time"])[:5], "%H:%M").time(),
+                            value=parse_time(avail["start_time"]),
                             key=f"start_{avail['id']}",
                             step=timedelta(minutes=10)
                         )
@@ -71,8 +86,7 @@ with tab1:
                     with col2:
                         end_time = st.time_input(
                             "Fin",
-                            value=avail["end_time"] if isinstance(avail["end_time"], type(None)) else
-                                  __import__('datetime').datetime.strptime(str(avail["end_time"])[:5], "%H:%M").time(),
+                            value=parse_time(avail["end_time"]),
                             key=f"end_{avail['id']}",
                             step=timedelta(minutes=10)
                         )
@@ -85,25 +99,43 @@ with tab1:
                         )
 
                     with col4:
-                        if st.button("🗑️", key=f"del_avail_{avail['id']}"):
-                            delete_availability(avail["id"])
-                            st.rerun()
-
-                    # Sauvegarder les changements
-                    new_start = start_time.strftime("%H:%M")
-                    new_end = end_time.strftime("%H:%M")
-                    old_start = str(avail["start_time"])[:5]
-                    old_end = str(avail["end_time"])[:5]
-
-                    if new_start != old_start or new_end != old_end or is_active != avail["is_active"]:
-                        update_availability(avail["id"], {
-                            "start_time": new_start,
-                            "end_time": new_end,
-                            "is_active": is_active
-                        })
-
-            # Bouton pour ajouter un créneau
-            if st.button(f"➕ Ajouter un créneau", key=f"add_{day_index}"):
+                        to_delete = st.checkbox("🗑️", key=f"del_avail_{avail['id']}")
+
+                    edited.append((avail, start_time, end_time, is_active, to_delete))
+
+        if st.form_submit_button("💾 Enregistrer les horaires", use_container_width=True):
+            dirty_rows = []
+            deleted_ids = []
+            for avail, start_time, end_time, is_active, to_delete in edited:
+                if to_delete:
+                    deleted_ids.append(avail["id"])
+                    continue
+                new_start = start_time.strftime("%H:%M")
+                new_end = end_time.strftime("%H:%M")
+                if (new_start != str(avail["start_time"])[:5]
+                        or new_end != str(avail["end_time"])[:5]
+                        or is_active != avail["is_active"]):
+                    dirty_rows.append({
+                        "id": avail["id"],
+                        "day_of_week": avail["day_of_week"],
+                        "start_time": new_start,
+                        "end_time": new_end,
+                        "is_active": is_active
+                    })
+
+            if dirty_rows or deleted_ids:
+                save_availability(dirty_rows, deleted_ids)
+                st.session_state.availability_saved = (len(dirty_rows), len(deleted_ids))
+                st.rerun()
+            else:
+                st.info("Aucune modification à enregistrer.")
+
+    # Ajouter un créneau (hors formulaire)
+    st.caption("Ajouter une plage horaire :")
+    add_cols = st.columns(len(DAYS))
+    for day_index, day_name in enumerate(DAYS):
+        with add_cols[day_index]:
+            if st.button(f"➕ {day_name}", key=f"add_{day_index}", use_container_width=True):
                 create_availability({
                     "day_of_week": day_index,
                     "start_time": "09:00",
@@ -1,9 +1,15 @@
 import streamlit as st
-import pandas as pd
+import os
+import time
 from datetime import date
 from utils.auth import require_auth, logout
-from utils.database import get_bookings, cancel_booking, update_booking
+from utils.database import (
+    get_bookings_page, get_event_types, approve_bookings, cancel_bookings,
+    BOOKINGS_PAGE_SIZE, CACHE_TTL
+)
+from utils.export import EXPORT_FORMATS, EXPORT_MAX_DOWNLOAD_BYTES, export_bookings
 from utils.logo import get_logo
+from utils.instrumentation import start_rerun
 
 st.set_page_config(
     page_title="Réservations - Apel Calendar",
@@ -11,6 +17,8 @@ st.set_page_config(
     layout="wide"
 )
 
+start_rerun("Réservations")
+
 # Protection par mot de passe
 require_auth()
 
@@ -24,20 +32,22 @@ with col2:
 
 st.divider()
 
+STATUS_LABELS = {
+    "Tous": "📊 Tous",
+    "confirmed": "✅ Confirmés",
+    "pending": "⏳ En attente",
+    "cancelled": "❌ Annulés",
+    "completed": "✔️ Terminés"
+}
+
 # Filtres
-col1, col2, col3 = st.columns(3)
+col1, col2, col3, col4 = st.columns([3, 3, 3, 1])
 
 with col1:
     status_filter = st.selectbox(
         "Statut",
-        ["Tous", "confirmed", "pending", "cancelled", "completed"],
-        format_func=lambda x: {
-            "Tous": "📊 Tous",
-            "confirmed": "✅ Confirmés",
-            "pending": "⏳ En attente",
-            "cancelled": "❌ Annulés",
-            "completed": "✔️ Terminés"
-        }.get(x, x)
+        list(STATUS_LABELS),
+        format_func=lambda x: STATUS_LABELS.get(x, x)
     )
 
 with col2:
@@ -54,32 +64,79 @@ with col2:
 with col3:
     search = st.text_input("🔍 Rechercher", placeholder="Nom, email...")
 
-# Récupérer les réservations
-status = None if status_filter == "Tous" else status_filter
-upcoming_only = date_filter == "upcoming"
-
-bookings = get_bookings(status=status, upcoming_only=upcoming_only)
-
-# Filtrer par date passée si nécessaire
-if date_filter == "past":
-    bookings = [b for b in bookings if b["date"] < date.today().isoformat()]
+with col4:
+    st.markdown("<br>", unsafe_allow_html=True)
+    refresh = st.button("🔄 Actualiser", use_container_width=True)
 
-# Filtrer par recherche
-if search:
-    search_lower = search.lower()
-    bookings = [
-        b for b in bookings
-        if search_lower in b["guest_name"].lower()
-        or search_lower in b["guest_email"].lower()
-        or search_lower in (b.get("guest_phone") or "").lower()
-    ]
+# Récupérer les réservations (filtrées côté serveur, une page à la fois)
+status = None if status_filter == "Tous" else status_filter
+filters = (status, date_filter, search.strip())
+
+def load_first_page(page_size: int = BOOKINGS_PAGE_SIZE):
+    """Recharge les `page_size` premières lignes pour les filtres courants"""
+    rows, cursor = get_bookings_page(
+        status=status,
+        upcoming_only=date_filter == "upcoming",
+        past_only=date_filter == "past",
+        search=filters[2] or None,
+        page_size=page_size
+    )
+    st.session_state.bookings_filters = filters
+    st.session_state.bookings_rows = rows
+    st.session_state.bookings_cursor = cursor
+    st.session_state.bookings_loaded_at = time.monotonic()
+
+def patch_rows(updated_rows, notice):
+    """Applique les lignes modifiées à la liste affichée, sans la recharger"""
+    updated = {row["id"]: row for row in updated_rows}
+    shown_status = st.session_state.bookings_filters[0]
+    rows = []
+    for booking in st.session_state.bookings_rows:
+        if booking["id"] in updated:
+            booking = {**booking, **updated[booking["id"]]}
+            if shown_status and booking["status"] != shown_status:
+                continue
+        rows.append(booking)
+    st.session_state.bookings_rows = rows
+    for booking_id in updated:
+        st.session_state.pop(f"select_{booking_id}", None)
+    st.session_state.bookings_notice = notice.format(len(updated_rows))
+
+def selected_ids():
+    """Réservations cochées parmi celles affichées"""
+    return [b["id"] for b in st.session_state.bookings_rows if st.session_state.get(f"select_{b['id']}")]
+
+def select_all(booking_ids, value):
+    for booking_id in booking_ids:
+        st.session_state[f"select_{booking_id}"] = value
+
+def approve(booking_ids):
+    patch_rows(approve_bookings(booking_ids), "✅ {} réservation(s) confirmée(s)")
+
+def cancel(booking_ids, reason=""):
+    patch_rows(cancel_bookings(booking_ids, reason), "❌ {} réservation(s) annulée(s)")
+
+def cancel_selected():
+    cancel(selected_ids(), st.session_state.get("bulk_cancel_reason", ""))
+
+def confirm_cancel(booking_id):
+    cancel([booking_id], st.session_state.get(f"reason_{booking_id}", ""))
+    del st.session_state[f"confirm_cancel_{booking_id}"]
+
+if st.session_state.get("bookings_filters") != filters:
+    load_first_page()
+elif refresh or time.monotonic() - st.session_state.bookings_loaded_at > CACHE_TTL:
+    # Réservations et annulations faites ailleurs : relire autant de lignes qu'affichées
+    load_first_page(max(len(st.session_state.bookings_rows), BOOKINGS_PAGE_SIZE))
+
+bookings = st.session_state.bookings_rows
 
 st.divider()
 
 # Statistiques rapides
 col1, col2, col3 = st.columns(3)
 with col1:
-    st.metric("Total affiché", len(bookings))
+    st.metric("Total affiché", f"{len(bookings)}{'+' if st.session_state.bookings_cursor else ''}")
 with col2:
     confirmed_count = len([b for b in bookings if b["status"] == "confirmed"])
     st.metric("Confirmés", confirmed_count)
@@ -89,6 +146,37 @@ with col3:
 
 st.divider()
 
+notice = st.session_state.pop("bookings_notice", None)
+if notice:
+    st.success(notice)
+
+# Actions groupées (une seule requête par action)
+actionable = [b["id"] for b in bookings if b["status"] in ("confirmed", "pending")]
+if actionable:
+    selected = selected_ids()
+    col1, col2, col3, col4 = st.columns([2, 2, 3, 2])
+    with col1:
+        if len(selected) < len(actionable):
+            st.button("☑️ Tout sélectionner", on_click=select_all, args=(actionable, True), use_container_width=True)
+        else:
+            st.button("⬜ Tout désélectionner", on_click=select_all, args=(actionable, False), use_container_width=True)
+    with col2:
+        st.button(
+            f"✅ Approuver ({len([b for b in bookings if b['id'] in selected and b['status'] == 'pending'])})",
+            on_click=approve, args=(selected,), disabled=not selected, use_container_width=True
+        )
+    with col3:
+        st.text_input(
+            "Raison", key="bulk_cancel_reason", placeholder="Raison de l'annulation (optionnel)",
+            label_visibility="collapsed"
+        )
+    with col4:
+        st.button(
+            f"❌ Annuler ({len(selected)})",
+            on_click=cancel_selected, disabled=not selected, use_container_width=True
+        )
+    st.divider()
+
 # Liste des réservations
 if not bookings:
     st.info("Aucune réservation trouvée avec ces filtres.")
@@ -108,7 +196,11 @@ else:
         status_info = status_badges.get(booking["status"], ("❓", booking["status"], "#6b7280"))
 
         with st.container():
-            col1, col2, col3, col4 = st.columns([3, 2, 2, 2])
+            col0, col1, col2, col3, col4 = st.columns([0.3, 3, 2, 2, 2])
+
+            with col0:
+                if booking["status"] in ("confirmed", "pending"):
+                    st.checkbox("Sélectionner", key=f"select_{booking['id']}", label_visibility="collapsed")
 
             with col1:
                 st.markdown(f"""
@@ -136,13 +228,12 @@ else:
                 elif booking["status"] == "pending":
                     col_a, col_b = st.columns(2)
                     with col_a:
-                        if st.button("✅", key=f"approve_{booking['id']}"):
-                            update_booking(booking["id"], {"status": "confirmed"})
-                            st.rerun()
+                        st.button("✅", key=f"approve_{booking['id']}", on_click=approve, args=([booking["id"]],))
                     with col_b:
-                        if st.button("❌", key=f"reject_{booking['id']}"):
-                            cancel_booking(booking["id"], "Refusé par l'administrateur")
-                            st.rerun()
+                        st.button(
+                            "❌", key=f"reject_{booking['id']}",
+                            on_click=cancel, args=([booking["id"]], "Refusé par l'administrateur")
+                        )
 
             # Notes
             if booking.get("guest_notes"):
@@ -156,18 +247,17 @@ else:
             if st.session_state.get(f"confirm_cancel_{booking['id']}", False):
                 st.warning("⚠️ Êtes-vous sûr de vouloir annuler cette réservation ?")
 
-                cancel_reason = st.text_input(
+                st.text_input(
                     "Raison de l'annulation (optionnel)",
                     key=f"reason_{booking['id']}"
                 )
 
                 col_yes, col_no = st.columns(2)
                 with col_yes:
-                    if st.button("✅ Confirmer l'annulation", key=f"yes_{booking['id']}"):
-                        cancel_booking(booking["id"], cancel_reason)
-                        del st.session_state[f"confirm_cancel_{booking['id']}"]
-                        st.success("Réservation annulée")
-                        st.rerun()
+                    st.button(
+                        "✅ Confirmer l'annulation", key=f"yes_{booking['id']}",
+                        on_click=confirm_cancel, args=(booking["id"],)
+                    )
                 with col_no:
                     if st.button("❌ Retour", key=f"no_{booking['id']}"):
                         del st.session_state[f"confirm_cancel_{booking['id']}"]
@@ -175,26 +265,88 @@ else:
 
             st.divider()
 
-# Export CSV
-if bookings:
-    st.subheader("📥 Exporter")
-
-    df = pd.DataFrame([{
-        "Date": b["date"],
-        "Heure": f"{b['start_time'][:5]} - {b['end_time'][:5]}",
-        "Nom": b["guest_name"],
-        "Email": b["guest_email"],
-        "Téléphone": b.get("guest_phone", ""),
-        "Statut": b["status"],
-        "Notes": b.get("guest_notes", "")
-    } for b in bookings])
-
-    csv = df.to_csv(index=False).encode('utf-8')
-
-    st.download_button(
-        "📥 Télécharger CSV",
-        csv,
-        "reservations.csv",
-        "text/csv",
-        key="download_csv"
-    )
+    # Page suivante
+    if st.session_state.bookings_cursor:
+        if st.button("⬇️ Charger plus de réservations", use_container_width=True):
+            rows, cursor = get_bookings_page(
+                status=status,
+                upcoming_only=date_filter == "upcoming",
+                past_only=date_filter == "past",
+                search=filters[2] or None,
+                after=st.session_state.bookings_cursor
+            )
+            st.session_state.bookings_rows = bookings + rows
+            st.session_state.bookings_cursor = cursor
+            st.rerun()
+
+# Export (lu page par page côté serveur, indépendamment des lignes affichées)
+st.divider()
+st.subheader("📥 Exporter")
+
+event_types = get_event_types()
+event_names = {e["id"]: e["name"] for e in event_types}
+
+with st.form("export_form"):
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        export_range = st.date_input(
+            "Période",
+            value=(date(date.today().year, 1, 1), date.today()),
+            format="DD/MM/YYYY"
+        )
+    with col2:
+        export_event = st.selectbox(
+            "Type d'événement",
+            [None] + list(event_names),
+            format_func=lambda x: "Tous" if x is None else event_names[x]
+        )
+    with col3:
+        export_status = st.selectbox(
+            "Statut",
+            list(STATUS_LABELS),
+            format_func=lambda x: STATUS_LABELS.get(x, x)
+        )
+    with col4:
+        export_format = st.selectbox(
+            "Format",
+            list(EXPORT_FORMATS),
+            format_func=lambda x: {"csv": "CSV", "csv.gz": "CSV compressé (gzip)", "parquet": "Parquet"}[x]
+        )
+    prepare = st.form_submit_button("⚙️ Préparer l'export", use_container_width=True)
+
+if prepare:
+    export_dates = list(export_range) if isinstance(export_range, (list, tuple)) else [export_range]
+    previous = st.session_state.pop("export_file", None)
+    if previous and os.path.exists(previous[0]):
+        os.remove(previous[0])
+    with st.spinner("Export en cours..."):
+        export_path = export_bookings(
+            export_format,
+            start_date=export_dates[0] if export_dates else None,
+            end_date=export_dates[-1] if export_dates else None,
+            event_type_id=export_event,
+            status=None if export_status == "Tous" else export_status
+        )
+    st.session_state.export_file = (export_path, export_format)
+
+if "export_file" in st.session_state:
+    export_path, export_format = st.session_state.export_file
+    file_name, mime = EXPORT_FORMATS[export_format]
+    if not os.path.exists(export_path):
+        st.session_state.pop("export_file")
+    elif os.path.getsize(export_path) > EXPORT_MAX_DOWNLOAD_BYTES:
+        os.remove(export_path)
+        st.session_state.pop("export_file")
+        st.warning(
+            f"⚠️ Export trop volumineux (plus de {EXPORT_MAX_DOWNLOAD_BYTES // (1024 * 1024)} Mo) : "
+            "réduisez la période ou choisissez le CSV compressé ou Parquet."
+        )
+    else:
+        with open(export_path, "rb") as export_file:
+            st.download_button(
+                f"📥 Télécharger {file_name}",
+                export_file,
+                file_name,
+                mime,
+                key="download_export"
+            )
@@ -1,7 +1,8 @@
 import streamlit as st
-from utils.auth import require_auth, logout
-from utils.database import get_settings, update_settings, verify_admin_password, hash_password
+from utils.auth import require_auth, logout, verify_admin_password, hash_password
+from utils.database import get_settings, update_settings
 from utils.logo import get_logo
+from utils.instrumentation import start_rerun
 
 st.set_page_config(
     page_title="Paramètres - Apel Calendar",
@@ -9,6 +10,8 @@ st.set_page_config(
     layout="wide"
 )
 
+start_rerun("Paramètres")
+
 # Protection par mot de passe
 require_auth()
 
@@ -1,6 +1,7 @@
 import streamlit as st
 from utils.database import get_booking_by_token, cancel_booking_by_token
 from utils.logo import get_logo
+from utils.instrumentation import start_rerun
 
 st.set_page_config(
     page_title="Annulation - Apel Calendar",
@@ -9,6 +10,8 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
+start_rerun("Annulation")
+
 # Cacher la sidebar et le menu sur cette page publique
 st.markdown("""
 <style>
@@ -0,0 +1,208 @@
+import streamlit as st
+from utils.auth import require_auth, logout
+from utils.database import get_cache_stats, invalidate_cache
+from utils.instrumentation import (
+    ENABLED, SIZE_SAMPLE_RATE, start_rerun, get_query_log, clear_query_log,
+    summarize_reruns, summarize_functions
+)
+from utils.logo import get_logo
+from utils.sweeper import get_sweeper
+
+st.set_page_config(
+    page_title="Diagnostics - Apel Calendar",
+    page_icon=get_logo(),
+    layout="wide"
+)
+
+start_rerun("Diagnostics")
+
+# Protection par mot de passe
+require_auth()
+
+# Header
+col1, col2 = st.columns([4, 1])
+with col1:
+    st.title("🩺 Diagnostics")
+with col2:
+    if st.button("🚪 Déconnexion"):
+        logout()
+
+st.caption("Requêtes Supabase du processus en cours, toutes sessions confondues.")
+
+if not ENABLED:
+    st.warning("L'instrumentation est désactivée (APEL_DIAGNOSTICS=0).")
+
+col1, col2, _ = st.columns([1, 1, 3])
+with col1:
+    if st.button("🧹 Vider le journal", use_container_width=True):
+        clear_query_log()
+        st.rerun()
+with col2:
+    if st.button("♻️ Vider le cache", use_container_width=True):
+        invalidate_cache()
+        st.rerun()
+
+st.divider()
+
+# Cache
+st.subheader("🗄️ Cache")
+cache = get_cache_stats()
+col1, col2, col3, col4, col5 = st.columns(5)
+with col1:
+    st.metric("Taux de succès", f"{cache['hit_ratio']:.0%}")
+with col2:
+    st.metric("Hits", cache["hits"])
+with col3:
+    st.metric("Misses", cache["misses"])
+with col4:
+    st.metric("Entrées", cache["entries"])
+with col5:
+    st.metric("Évictions", cache["evictions"])
+
+bus = cache["invalidation"]
+if bus:
+    st.caption(f"Bus d'invalidation ({bus['channel']}) : {bus['published']} publiée(s), "
+               f"{bus['failed']} en échec, {bus['pending']} en attente, "
+               f"{bus['received']} reçue(s) des autres réplicas.")
+else:
+    st.caption("Pas de bus d'invalidation entre réplicas (APEL_INVALIDATION non défini).")
+
+shared = cache["shared"]
+if shared:
+    st.caption(f"Cache partagé des créneaux ({shared['store']}) : {shared['hit_ratio']:.0%} de succès "
+               f"({shared['hits']} jour(s) lus, {shared['misses']} recalculé(s)).")
+
+st.divider()
+
+# Clôture automatique des réservations passées
+st.subheader("🧹 Clôture des réservations passées")
+sweeper = get_sweeper()
+if sweeper is None:
+    st.caption("Clôture automatique désactivée (APEL_SWEEPER=0).")
+else:
+    sweep = sweeper.stats()
+    col1, col2, col3, col4, col5 = st.columns(5)
+    with col1:
+        st.metric("Passages", sweep["runs"])
+    with col2:
+        st.metric("Réservations clôturées", sweep["total_completed"])
+    with col3:
+        last = sweep["last_run"]
+        st.metric("Dernier passage", last["completed"] if last else "—")
+    with col4:
+        st.metric("Laissés à un autre réplica", sweep["skipped"])
+    with col5:
+        st.metric("Erreurs", sweep["errors"])
+    st.caption(f"Un passage toutes les {sweep['interval'] // 60} minute(s).")
+
+    if st.button("▶️ Lancer un passage maintenant"):
+        sweeper.run_once()
+        st.rerun()
+
+    if sweep["history"]:
+        st.dataframe(
+            [
+                {
+                    "Heure": run["at"][11:],
+                    "Clôturées": run["completed"],
+                    "Lots": run["batches"],
+                    "Durée (ms)": round(run["duration_ms"], 1),
+                    "Verrou pris ailleurs": "oui" if run["locked_elsewhere"] else "",
+                    "Erreur": run["error"] or "",
+                }
+                for run in reversed(sweep["history"])
+            ],
+            use_container_width=True,
+            hide_index=True
+        )
+
+records = get_query_log()
+if not records:
+    st.info("Aucune requête enregistrée pour le moment.")
+    st.stop()
+
+st.divider()
+
+# Allers-retours par rerun
+st.subheader("🔁 Allers-retours par rerun")
+reruns = summarize_reruns(records)
+pages = sorted({r["page"] for r in reruns})
+selected_pages = st.multiselect("Pages", options=pages, default=pages)
+reruns = [r for r in reruns if r["page"] in selected_pages]
+
+if reruns:
+    round_trips = [r["round_trips"] for r in reruns]
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Reruns", len(reruns))
+    with col2:
+        st.metric("Allers-retours moyens", f"{sum(round_trips) / len(reruns):.1f}")
+    with col3:
+        st.metric("Maximum", max(round_trips))
+
+    st.dataframe(
+        [
+            {
+                "Début": r["started_at"][11:],
+                "Page": r["page"],
+                "Session": r["session"],
+                "Rerun": r["rerun"],
+                "Allers-retours": r["round_trips"],
+                "Lectures en cache": r["cache_hits"],
+                "Durée (ms)": round(r["duration_ms"], 1),
+                "Lignes": r["rows"],
+            }
+            for r in reversed(reruns[-200:])
+        ],
+        use_container_width=True,
+        hide_index=True
+    )
+
+st.divider()
+
+def kilobytes(size):
+    """Taille en Ko, vide si elle n'a pas été mesurée (hors échantillon)"""
+    return None if size is None else round(size / 1024, 1)
+
+# Par fonction
+st.subheader("📈 Par fonction")
+st.caption(f"Taille des réponses mesurée sur {SIZE_SAMPLE_RATE:.0%} des appels (APEL_QUERY_SIZE_SAMPLE).")
+st.dataframe(
+    [
+        {
+            "Fonction": f["function"],
+            "Appels": f["calls"],
+            "Allers-retours": f["round_trips"],
+            "Taux de cache": f"{f['cache_hit_ratio']:.0%}",
+            "Erreurs": f["errors"],
+            "Total (ms)": round(f["total_ms"], 1),
+            "Moyenne (ms)": round(f["mean_ms"], 1),
+            "Max (ms)": round(f["max_ms"], 1),
+            "Réponse moyenne (Ko)": kilobytes(f["mean_bytes"]),
+        }
+        for f in summarize_functions(records)
+    ],
+    use_container_width=True,
+    hide_index=True
+)
+
+# Requêtes les plus lentes
+st.subheader("🐢 Requêtes les plus lentes")
+slowest = sorted((r for r in records if not r["cache_hit"]), key=lambda r: r["duration_ms"], reverse=True)[:20]
+st.dataframe(
+    [
+        {
+            "Heure": r["at"][11:],
+            "Fonction": r["function"],
+            "Page": r["page"],
+            "Durée (ms)": round(r["duration_ms"], 1),
+            "Allers-retours": r["round_trips"],
+            "Lignes": r["rows"],
+            "Volume (Ko)": kilobytes(r["bytes"]),
+            "Erreur": r["error"] or "",
+        }
+        for r in slowest
+    ],
+    use_container_width=True,
+    hide_index=True
+)
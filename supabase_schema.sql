@@ -5,6 +5,9 @@
 -- Exécutez ce script dans l'éditeur SQL de Supabase
 -- (Dashboard > SQL Editor > New Query)
 
+-- Extension pour la recherche "contient" indexée sur les réservations
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
 -- Supprimer les anciennes tables si elles existent
 DROP TABLE IF EXISTS bookings CASCADE;
 DROP TABLE IF EXISTS availability CASCADE;
@@ -121,7 +124,26 @@ CREATE TABLE bookings (
     cancelled_at TIMESTAMPTZ DEFAULT NULL,
     cancel_reason TEXT DEFAULT '',
     created_at TIMESTAMPTZ DEFAULT NOW(),
-    updated_at TIMESTAMPTZ DEFAULT NOW()
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    -- Deux réservations actives ne peuvent pas se chevaucher, quel que soit leur type
+    -- d'événement : tous les types partagent le même agenda
+    CONSTRAINT bookings_no_overlap EXCLUDE USING gist (
+        tsrange(date + start_time, date + end_time) WITH &&
+    ) WHERE (status IN ('confirmed', 'pending'))
+);
+
+-- =============================================
+-- TABLE: slot_holds (créneaux bloqués pendant la saisie du formulaire)
+-- =============================================
+CREATE TABLE slot_holds (
+    id BIGSERIAL PRIMARY KEY,
+    event_type_id BIGINT NOT NULL REFERENCES event_types(id) ON DELETE CASCADE,
+    date DATE NOT NULL,
+    start_time TIME NOT NULL,
+    end_time TIME NOT NULL,
+    hold_token TEXT NOT NULL UNIQUE,
+    expires_at TIMESTAMPTZ NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT NOW()
 );
 
 -- =============================================
@@ -131,11 +153,33 @@ CREATE INDEX idx_bookings_date ON bookings(date);
 CREATE INDEX idx_bookings_status ON bookings(status);
 CREATE INDEX idx_bookings_event_type ON bookings(event_type_id);
 CREATE INDEX idx_bookings_email ON bookings(guest_email);
+CREATE INDEX idx_bookings_keyset ON bookings(date DESC, start_time DESC, id DESC);
+CREATE INDEX idx_bookings_guest_name_trgm ON bookings USING gin (guest_name gin_trgm_ops);
+CREATE INDEX idx_bookings_guest_email_trgm ON bookings USING gin (guest_email gin_trgm_ops);
+CREATE INDEX idx_bookings_guest_phone_trgm ON bookings USING gin (guest_phone gin_trgm_ops);
 CREATE INDEX idx_availability_day ON availability(day_of_week);
 CREATE INDEX idx_event_types_slug ON event_types(slug);
 CREATE INDEX idx_event_types_active ON event_types(is_active);
 CREATE INDEX idx_event_type_dates_event ON event_type_dates(event_type_id);
 CREATE INDEX idx_event_type_dates_date ON event_type_dates(date);
+CREATE INDEX idx_slot_holds_date ON slot_holds(date, expires_at);
+CREATE INDEX idx_bookings_confirmed_date ON bookings(date, id) WHERE status = 'confirmed';
+
+-- =============================================
+-- VUE: busy_slots (créneaux occupés, lus en une requête par l'application)
+-- =============================================
+-- Réservations actives et blocages non expirés ; expires_at est NULL pour une réservation.
+-- La vue s'exécute avec les droits de son propriétaire et n'expose pas hold_token.
+CREATE OR REPLACE VIEW busy_slots AS
+    SELECT date, start_time, end_time, event_type_id, NULL::TIMESTAMPTZ AS expires_at
+    FROM bookings
+    WHERE status IN ('confirmed', 'pending')
+    UNION ALL
+    SELECT date, start_time, end_time, event_type_id, expires_at
+    FROM slot_holds
+    WHERE expires_at > NOW();
+
+GRANT SELECT ON busy_slots TO anon, authenticated;
 
 -- =============================================
 -- ROW LEVEL SECURITY
@@ -146,6 +190,7 @@ ALTER TABLE availability ENABLE ROW LEVEL SECURITY;
 ALTER TABLE date_overrides ENABLE ROW LEVEL SECURITY;
 ALTER TABLE event_type_dates ENABLE ROW LEVEL SECURITY;
 ALTER TABLE bookings ENABLE ROW LEVEL SECURITY;
+ALTER TABLE slot_holds ENABLE ROW LEVEL SECURITY;
 
 -- Politiques de lecture publique
 CREATE POLICY "Public read settings" ON settings FOR SELECT USING (true);
@@ -154,6 +199,11 @@ CREATE POLICY "Public read availability" ON availability FOR SELECT USING (true)
 CREATE POLICY "Public read date_overrides" ON date_overrides FOR SELECT USING (true);
 CREATE POLICY "Public read event_type_dates" ON event_type_dates FOR SELECT USING (true);
 CREATE POLICY "Public read bookings" ON bookings FOR SELECT USING (true);
+CREATE POLICY "Public read slot_holds" ON slot_holds FOR SELECT USING (true);
+-- Les jetons ne sont pas lisibles : seul leur détenteur peut libérer son blocage
+REVOKE SELECT ON slot_holds FROM anon, authenticated;
+GRANT SELECT (id, event_type_id, date, start_time, end_time, expires_at) ON slot_holds TO anon, authenticated;
+-- slot_holds n'a pas de policy d'écriture : il ne change que par hold_slot/release_hold
 
 -- Politiques d'insertion publique
 CREATE POLICY "Public insert bookings" ON bookings FOR INSERT WITH CHECK (true);
@@ -216,3 +266,211 @@ CREATE TRIGGER update_bookings_updated_at
     BEFORE UPDATE ON bookings
     FOR EACH ROW
     EXECUTE FUNCTION update_updated_at();
+
+-- =============================================
+-- FONCTIONS: Blocage temporaire des créneaux (RPC)
+-- =============================================
+-- Conflit d'un créneau avec les réservations actives et les blocages du jour, tous types
+-- d'événements confondus et buffers compris (même règle que AvailabilitySnapshot).
+CREATE OR REPLACE FUNCTION slot_conflict(
+    p_event_type_id BIGINT, p_date DATE, p_start_time TIME, p_end_time TIME, p_hold_token TEXT
+)
+RETURNS TEXT
+LANGUAGE sql
+STABLE
+SET search_path = public
+AS $$
+    WITH slot AS (
+        SELECT p_date + p_start_time AS s,
+               p_date + p_end_time AS e,
+               make_interval(mins => COALESCE(buffer_before, 0)) AS b,
+               make_interval(mins => COALESCE(buffer_after, 0)) AS a
+        FROM event_types WHERE id = p_event_type_id
+    ),
+    busy AS (
+        SELECT 'slot_taken' AS reason, date + start_time AS s, date + end_time AS e, event_type_id
+        FROM bookings
+        WHERE date = p_date AND status IN ('confirmed', 'pending')
+        UNION ALL
+        SELECT 'slot_held', date + start_time, date + end_time, event_type_id
+        FROM slot_holds
+        WHERE date = p_date AND expires_at > NOW() AND hold_token <> COALESCE(p_hold_token, '')
+    )
+    SELECT busy.reason
+    FROM slot, busy
+    JOIN event_types et ON et.id = busy.event_type_id
+    WHERE (busy.s < slot.e + slot.a AND busy.e > slot.s - slot.b)
+       OR (busy.s - make_interval(mins => COALESCE(et.buffer_before, 0)) < slot.e
+           AND busy.e + make_interval(mins => COALESCE(et.buffer_after, 0)) > slot.s)
+    ORDER BY busy.reason = 'slot_taken' DESC
+    LIMIT 1;
+$$;
+
+-- Un blocage par invité (jeton de session), posé sous le même verrou du jour que book_slot.
+-- Erreurs : 23P01 (créneau réservé), AP002 (créneau bloqué).
+CREATE OR REPLACE FUNCTION hold_slot(
+    p_event_type_id BIGINT, p_date DATE, p_start_time TIME, p_end_time TIME,
+    p_hold_token TEXT, p_ttl_seconds INTEGER DEFAULT 600
+)
+RETURNS slot_holds
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_hold slot_holds;
+    v_conflict TEXT;
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('apel_day'), (p_date - DATE '2000-01-01'));
+
+    DELETE FROM slot_holds
+    WHERE hold_token = p_hold_token
+       OR (date = p_date AND expires_at <= NOW());
+
+    v_conflict := slot_conflict(p_event_type_id, p_date, p_start_time, p_end_time, p_hold_token);
+    IF v_conflict = 'slot_taken' THEN
+        RAISE EXCEPTION 'slot_taken' USING ERRCODE = '23P01';
+    ELSIF v_conflict = 'slot_held' THEN
+        RAISE EXCEPTION 'slot_held' USING ERRCODE = 'AP002';
+    END IF;
+
+    INSERT INTO slot_holds (event_type_id, date, start_time, end_time, hold_token, expires_at)
+    VALUES (
+        p_event_type_id, p_date, p_start_time, p_end_time, p_hold_token,
+        NOW() + make_interval(secs => LEAST(GREATEST(p_ttl_seconds, 30), 1800))
+    )
+    RETURNING * INTO v_hold;
+
+    RETURN v_hold;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION release_hold(p_hold_token TEXT)
+RETURNS SETOF slot_holds
+LANGUAGE sql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+    DELETE FROM slot_holds WHERE hold_token = p_hold_token RETURNING *;
+$$;
+
+-- =============================================
+-- FONCTION: Réservation atomique (RPC)
+-- =============================================
+-- Le verrou transactionnel sérialise les réservations d'un même jour, tous types
+-- d'événements confondus, ce qui rend sûrs le contrôle de max_bookings_per_day et celui
+-- des chevauchements buffers compris. Un créneau bloqué par un autre invité est refusé ;
+-- celui de l'invité est libéré.
+-- Erreurs : 23P01 (créneau déjà pris), AP001 (journée complète), AP002 (créneau bloqué).
+-- SECURITY DEFINER : le contrôle des blocages lit hold_token, non lisible par anon.
+-- extensions dans search_path : le trigger du jeton d'annulation appelle gen_random_bytes.
+CREATE OR REPLACE FUNCTION book_slot(p_booking JSONB)
+RETURNS bookings
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public, extensions
+AS $$
+DECLARE
+    v_event_type_id BIGINT := (p_booking->>'event_type_id')::BIGINT;
+    v_date DATE := (p_booking->>'date')::DATE;
+    v_start_time TIME := (p_booking->>'start_time')::TIME;
+    v_end_time TIME := (p_booking->>'end_time')::TIME;
+    v_hold_token TEXT := COALESCE(p_booking->>'hold_token', '');
+    v_max INTEGER;
+    v_count INTEGER;
+    v_booking bookings;
+    v_conflict TEXT;
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('apel_day'), (v_date - DATE '2000-01-01'));
+
+    SELECT max_bookings_per_day INTO v_max FROM event_types WHERE id = v_event_type_id;
+    IF v_max IS NOT NULL THEN
+        SELECT count(*) INTO v_count
+        FROM bookings
+        WHERE event_type_id = v_event_type_id
+          AND date = v_date
+          AND status IN ('confirmed', 'pending');
+        IF v_count >= v_max THEN
+            RAISE EXCEPTION 'day_full' USING ERRCODE = 'AP001';
+        END IF;
+    END IF;
+
+    v_conflict := slot_conflict(v_event_type_id, v_date, v_start_time, v_end_time, v_hold_token);
+    IF v_conflict = 'slot_taken' THEN
+        RAISE EXCEPTION 'slot_taken' USING ERRCODE = '23P01';
+    ELSIF v_conflict = 'slot_held' THEN
+        RAISE EXCEPTION 'slot_held' USING ERRCODE = 'AP002';
+    END IF;
+
+    INSERT INTO bookings (
+        event_type_id, date, start_time, end_time,
+        guest_name, guest_email, guest_phone, guest_notes, status
+    ) VALUES (
+        v_event_type_id,
+        v_date,
+        v_start_time,
+        v_end_time,
+        p_booking->>'guest_name',
+        p_booking->>'guest_email',
+        COALESCE(p_booking->>'guest_phone', ''),
+        COALESCE(p_booking->>'guest_notes', ''),
+        COALESCE(p_booking->>'status', 'confirmed')
+    )
+    RETURNING * INTO v_booking;
+
+    PERFORM release_hold(v_hold_token);
+
+    RETURN v_booking;
+END;
+$$;
+
+-- =============================================
+-- FONCTION: Statistiques du dashboard en une requête (RPC)
+-- =============================================
+-- p_today est la date du jour côté application (le fuseau de la base peut différer).
+CREATE OR REPLACE FUNCTION get_booking_stats(p_today DATE)
+RETURNS JSON
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT json_build_object(
+        'total', count(*),
+        'confirmed', count(*) FILTER (WHERE status = 'confirmed'),
+        'upcoming', count(*) FILTER (WHERE status = 'confirmed' AND date >= p_today),
+        'cancelled', count(*) FILTER (WHERE status = 'cancelled'),
+        'event_types', (SELECT count(*) FROM event_types WHERE is_active)
+    )
+    FROM bookings;
+$$;
+
+-- =============================================
+-- FONCTION: Clôture des réservations passées (RPC)
+-- =============================================
+-- Passe un lot de réservations confirmées terminées en 'completed' ; retourne le nombre
+-- de lignes modifiées, ou NULL si un autre réplica détient déjà le verrou. Le verrou
+-- est libéré à la fin de la transaction, donc après chaque lot et non après tout le passage.
+CREATE OR REPLACE FUNCTION complete_past_bookings(p_today DATE, p_now TIME, p_batch_size INTEGER DEFAULT 500)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_count INTEGER;
+BEGIN
+    IF NOT pg_try_advisory_xact_lock(hashtext('complete_past_bookings')) THEN
+        RETURN NULL;
+    END IF;
+
+    UPDATE bookings SET status = 'completed'
+    WHERE id IN (
+        SELECT id FROM bookings
+        WHERE status = 'confirmed'
+          AND (date < p_today OR (date = p_today AND end_time <= p_now))
+        ORDER BY date, id
+        LIMIT p_batch_size
+        FOR UPDATE SKIP LOCKED
+    );
+    GET DIAGNOSTICS v_count = ROW_COUNT;
+
+    RETURN v_count;
+END;
+$$;
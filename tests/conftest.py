@@ -0,0 +1,14 @@
+import pytest
+
+@pytest.fixture
+def local_db(monkeypatch):
+    """Client SQLite en mémoire tout neuf (APEL_BACKEND=local), cache local vidé"""
+    monkeypatch.setenv("APEL_BACKEND", "local")
+    monkeypatch.delenv("APEL_LOCAL_DB", raising=False)
+    monkeypatch.setenv("APEL_SWEEPER", "0")
+    from utils import database
+    database.get_supabase.clear()
+    database._cache.invalidate()
+    yield database
+    database.get_supabase.clear()
+    database._cache.invalidate()
@@ -0,0 +1,54 @@
+from datetime import date, timedelta
+
+import asyncio
+
+import pytest
+
+from utils import async_database
+from utils.async_database import QueryTimeoutError, load_snapshot_async, run_sync
+
+@pytest.fixture
+def window():
+    start = date.today() + timedelta(days=1)
+    return start, start + timedelta(days=13)
+
+def cold_load(database, event_type_id, window):
+    """(photographie, allers-retours) d'un chargement cache vide"""
+    client = database.get_supabase()
+    database._cache.invalidate()
+    before = client.round_trips
+    snapshot = run_sync(load_snapshot_async(event_type_id, *window))
+    return snapshot, client.round_trips - before
+
+def test_weekly_mode_skips_event_type_dates(local_db, window):
+    snapshot, round_trips = cold_load(local_db, 1, window)
+    # types d'événements, horaires, exceptions, créneaux occupés
+    assert round_trips == 4
+    assert snapshot.get_bookable_days() == local_db.AvailabilitySnapshot.load(1, *window).get_bookable_days()
+
+def test_specific_dates_mode_reads_its_dates(local_db, window):
+    client = local_db.get_supabase()
+    client.table("event_types").update({"use_specific_dates": True}).eq("id", 1).execute()
+    client.table("event_type_dates").insert({"event_type_id": 1, "date": window[0].isoformat()}).execute()
+
+    snapshot, round_trips = cold_load(local_db, 1, window)
+    assert round_trips == 5
+    assert snapshot.allowed_dates == {window[0].isoformat()}
+
+def test_cached_reads_skip_the_thread_pool(local_db, window, monkeypatch):
+    cold_load(local_db, 1, window)
+    loop = async_database._get_loop()
+    hops = []
+
+    def counting_run_in_executor(executor, func, *args):
+        hops.append(func)
+        return type(loop).run_in_executor(loop, executor, func, *args)
+
+    monkeypatch.setattr(loop, "run_in_executor", counting_run_in_executor)
+    run_sync(load_snapshot_async(1, *window))
+    # seuls le cache partagé et les créneaux occupés, jamais mis en cache local, passent par le pool
+    assert len(hops) == 2
+
+def test_run_sync_times_out():
+    with pytest.raises(QueryTimeoutError):
+        run_sync(asyncio.sleep(5), timeout=0.05)
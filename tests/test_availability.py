@@ -0,0 +1,121 @@
+from datetime import date, timedelta
+
+import pytest
+
+from utils.database import BookingIntervalIndex
+
+def open_day(database, event_type):
+    day = date.today() + timedelta(days=1)
+    while not database.is_date_available(day, event_type):
+        day += timedelta(days=1)
+    return day
+
+def insert(database, event_type_id, day, start, end, status):
+    database.get_supabase().table("bookings").insert({
+        "event_type_id": event_type_id,
+        "date": day.isoformat(),
+        "start_time": start,
+        "end_time": end,
+        "guest_name": "Invité",
+        "guest_email": "invite@exemple.fr",
+        "status": status,
+    }).execute()
+    database._bookings_changed([{"date": day.isoformat()}])
+
+def test_daily_cap_counts_confirmed_and_pending_like_book_slot(local_db):
+    event_type = local_db.get_event_types()[0]
+    local_db.get_supabase().table("event_types").update({"max_bookings_per_day": 2})\
+        .eq("id", event_type["id"]).execute()
+    local_db.invalidate_cache("event_types")
+    day = open_day(local_db, event_type)
+
+    insert(local_db, event_type["id"], day, "09:00", "09:30", "confirmed")
+    insert(local_db, event_type["id"], day, "10:00", "10:30", "cancelled")
+    assert local_db.get_available_slots(day, event_type["id"])
+
+    insert(local_db, event_type["id"], day, "11:00", "11:30", "pending")
+    assert local_db.get_available_slots(day, event_type["id"]) == []
+    with pytest.raises(local_db.SlotUnavailableError) as error:
+        local_db.create_booking({
+            "event_type_id": event_type["id"],
+            "date": day.isoformat(),
+            "start_time": "14:00",
+            "end_time": "14:30",
+            "guest_name": "Invité",
+            "guest_email": "invite@exemple.fr",
+        })
+    assert error.value.reason == "day_full"
+
+def next_monday():
+    today = date.today()
+    return today + timedelta(days=7 - today.weekday())
+
+def test_generate_slots_batch_covers_every_event_type_and_day(local_db):
+    client = local_db.get_supabase()
+    client.table("event_types").update({"use_specific_dates": True}).eq("id", 2).execute()
+    monday = next_monday()
+    client.table("event_type_dates").insert({"event_type_id": 2, "date": monday.isoformat()}).execute()
+    local_db.invalidate_cache()
+    event_types = local_db.get_event_types(active_only=True)
+
+    batch = local_db.generate_slots_batch(event_types, monday, monday + timedelta(days=6))
+
+    assert len(batch) == 2 * 7
+    morning_30 = list(range(9 * 60, 12 * 60, 30))
+    afternoon_30 = list(range(14 * 60, 18 * 60, 30))
+    assert batch[(1, monday)] == morning_30 + afternoon_30
+    assert batch[(2, monday)] == [540, 600, 660, 840, 900, 960, 1020]
+    assert batch[(2, monday + timedelta(days=1))] == []  # hors des dates spécifiques
+    assert batch[(1, monday + timedelta(days=5))] == []  # samedi inactif
+    # Sans réservation, identique au calcul de la photographie
+    snapshot = local_db.AvailabilitySnapshot.load(1, monday, monday + timedelta(days=6))
+    for offset in range(7):
+        day = monday + timedelta(days=offset)
+        assert batch[(1, day)] == snapshot.get_free_slot_starts(day)
+
+def test_interval_index_overlaps_are_half_open():
+    index = BookingIntervalIndex([(600, 660), (540, 555)])
+    assert index.overlaps(585, 615) and index.overlaps(630, 660) and index.overlaps(550, 560)
+    assert not index.overlaps(555, 600)  # entre les deux réservations, bornes comprises
+    assert not index.overlaps(660, 690)
+    assert not BookingIntervalIndex([]).overlaps(0, 1440)
+
+def set_event_type(database, event_type_id, **values):
+    database.get_supabase().table("event_types").update(values).eq("id", event_type_id).execute()
+    database.invalidate_cache("event_types")
+
+def morning_starts(database, event_type_id, day):
+    """Créneaux libres du matin (9 h - 12 h) calculés par la photographie"""
+    snapshot = database.AvailabilitySnapshot.load(event_type_id, day)
+    return [m for m in snapshot._compute_free_slot_starts(day) if m < 12 * 60]
+
+def test_long_booking_blocks_overlapping_slots_on_both_sides(local_db):
+    monday = next_monday()
+    insert(local_db, 1, monday, "10:15", "11:15", "confirmed")
+    # 10:00, 10:30 et 11:00 chevauchent la réservation
+    assert morning_starts(local_db, 1, monday) == [540, 570, 690]
+
+def test_buffers_are_applied_around_bookings(local_db):
+    set_event_type(local_db, 1, buffer_before=15, buffer_after=15)
+    monday = next_monday()
+    insert(local_db, 1, monday, "10:00", "10:30", "confirmed")
+    # 9:30 finirait dans le buffer avant, 10:30 commencerait dans le buffer après
+    assert morning_starts(local_db, 1, monday) == [540, 660, 690]
+
+def test_booking_of_another_event_type_blocks_the_slot(local_db):
+    set_event_type(local_db, 2, buffer_after=30)
+    monday = next_monday()
+    insert(local_db, 2, monday, "10:00", "11:00", "confirmed")
+    # la réservation de 60 min et son buffer après occupent 10:00 - 11:30
+    assert morning_starts(local_db, 1, monday) == [540, 570, 690]
+
+def test_max_bookings_per_day_closes_the_day_of_its_event_type_only(local_db):
+    set_event_type(local_db, 1, max_bookings_per_day=1)
+    monday = next_monday()
+    insert(local_db, 2, monday, "14:00", "15:00", "confirmed")
+    assert morning_starts(local_db, 1, monday)
+
+    insert(local_db, 1, monday, "09:00", "09:30", "confirmed")
+    snapshot = local_db.AvailabilitySnapshot.load(1, monday)
+    assert snapshot._compute_free_slot_starts(monday) == []
+    assert monday not in snapshot.get_bookable_days()
@@ -0,0 +1,57 @@
+from datetime import date, timedelta
+
+import pytest
+
+def add_bookings(database):
+    """27 réservations : 3 jours x 3 horaires x 3 réservations au même horaire (égalités sur date et heure)"""
+    first_day = date.today() + timedelta(days=1)
+    database.get_supabase().bulk_load("bookings", [{
+        "event_type_id": 1,
+        "date": (first_day + timedelta(days=d)).isoformat(),
+        "start_time": f"{database.minutes_to_time(540 + 60 * t)}:00",
+        "end_time": f"{database.minutes_to_time(570 + 60 * t)}:00",
+        "guest_name": "Alice" if n % 2 == 0 else "Bob",
+        "guest_email": f"invite{d}{t}{n}@exemple.fr",
+        "status": "confirmed",
+        "cancel_token": f"jeton-{d}{t}{n}",
+    } for d in range(3) for t in range(3) for n in range(3)])
+
+def read_all_pages(database, page_size, **filters):
+    ids, after, pages = [], None, 0
+    while True:
+        rows, after = database.get_bookings_page(after=after, page_size=page_size, **filters)
+        ids += [row["id"] for row in rows]
+        pages += 1
+        if after is None:
+            return ids, pages
+
+@pytest.mark.parametrize("page_size", [1, 2, 4, 9, 27, 50])
+def test_keyset_pages_have_no_duplicates_or_gaps(local_db, page_size):
+    add_bookings(local_db)
+    expected = [row["id"] for row in local_db.get_bookings()]
+    assert len(expected) == 27
+
+    ids, pages = read_all_pages(local_db, page_size)
+    assert ids == expected
+    # une page pleine suivie de rien est bien la dernière (pas de page vide en plus)
+    assert pages == max(1, -(-27 // page_size))
+
+@pytest.mark.parametrize("page_size", [2, 5, 14])
+def test_keyset_pages_combine_with_search(local_db, page_size):
+    add_bookings(local_db)
+    expected = [row["id"] for row in local_db.get_bookings(search="alice")]
+    assert len(expected) == 18
+
+    ids, _ = read_all_pages(local_db, page_size, search="alice")
+    assert ids == expected
+    assert all(row["guest_name"] == "Alice" for row in local_db.get_bookings(
+        search="alice", after=local_db.get_bookings_page(search="alice", page_size=page_size)[1]
+    ))
+
+def test_cursor_skips_the_tied_rows_already_read(local_db):
+    add_bookings(local_db)
+    first, second, third = local_db.get_bookings(limit=3)
+    assert (first["date"], first["start_time"]) == (third["date"], third["start_time"])
+
+    after = (second["date"], second["start_time"], second["id"])
+    assert [row["id"] for row in local_db.get_bookings(after=after, limit=1)] == [third["id"]]
@@ -0,0 +1,48 @@
+import csv
+import os
+import time
+from datetime import date, timedelta
+
+import pytest
+
+from utils import export
+
+@pytest.fixture
+def export_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(export, "EXPORT_DIR", str(tmp_path))
+    return tmp_path
+
+def test_purge_removes_only_old_exports(export_dir):
+    old, recent = export_dir / "old.csv", export_dir / "recent.csv"
+    old.write_text("x")
+    recent.write_text("x")
+    two_hours_ago = time.time() - 7200
+    os.utime(old, (two_hours_ago, two_hours_ago))
+
+    assert export.purge_old_exports(max_age=3600) == 1
+    assert not old.exists()
+    assert recent.exists()
+
+def test_export_filters_on_status_and_writes_in_export_dir(local_db, export_dir):
+    event_type = local_db.get_event_types()[0]
+    day = date.today() + timedelta(days=30)
+    for i, status in enumerate(["confirmed", "pending", "cancelled"]):
+        local_db.get_supabase().table("bookings").insert({
+            "event_type_id": event_type["id"],
+            "date": day.isoformat(),
+            "start_time": f"{9 + i:02d}:00",
+            "end_time": f"{9 + i:02d}:30",
+            "guest_name": f"Invité {i}",
+            "guest_email": f"invite{i}@exemple.fr",
+            "status": status,
+        }).execute()
+
+    path = export.export_bookings("csv", start_date=day, end_date=day, status="pending")
+    assert os.path.dirname(path) == str(export_dir)
+    with open(path, encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert [row["Statut"] for row in rows] == ["pending"]
+
+    parquet = export.export_bookings("parquet", start_date=day, end_date=day)
+    import pyarrow.parquet as pq
+    assert pq.read_table(parquet).num_rows == 3
@@ -0,0 +1,46 @@
+from datetime import date, timedelta
+
+import pytest
+
+from utils import instrumentation
+from utils.instrumentation import clear_query_log, get_query_log, summarize_functions
+
+@pytest.fixture
+def log(local_db):
+    local_db.get_supabase()
+    clear_query_log()
+    yield lambda: {f["function"]: f for f in summarize_functions(get_query_log())}
+    clear_query_log()
+
+def test_each_request_counts_as_a_round_trip(local_db, log):
+    rows = local_db.get_availability()
+    local_db.save_availability([dict(rows[0], start_time="08:00")], deleted_ids=[rows[1]["id"]])
+
+    assert log()["get_availability"]["round_trips"] == 1
+    assert log()["save_availability"]["round_trips"] == 2
+
+def test_sweep_batches_are_counted(local_db, log):
+    day = (date.today() - timedelta(days=3)).isoformat()
+    local_db.get_supabase().bulk_load("bookings", [{
+        "event_type_id": 1, "date": day, "start_time": f"{9 + i:02d}:00:00", "end_time": f"{9 + i:02d}:30:00",
+        "guest_name": "Invité", "guest_email": "invite@exemple.fr", "status": "confirmed",
+        "cancel_token": f"jeton-{i}",
+    } for i in range(5)])
+
+    assert local_db.complete_past_bookings(batch_size=2)["batches"] == 3
+    assert log()["complete_past_bookings"]["round_trips"] == 3
+
+def test_cache_hits_and_direct_requests(local_db, log):
+    local_db.get_settings()
+    local_db.get_settings()
+    local_db.get_supabase().table("bookings").select("id").execute()
+
+    functions = log()
+    assert functions["get_settings"]["calls"] == 2 and functions["get_settings"]["round_trips"] == 1
+    assert functions[instrumentation.OUTSIDE_FUNCTION]["round_trips"] == 1
+
+@pytest.mark.parametrize("rate, measured", [(0.0, False), (1.0, True)])
+def test_payload_size_is_sampled(local_db, log, monkeypatch, rate, measured):
+    monkeypatch.setattr(instrumentation, "SIZE_SAMPLE_RATE", rate)
+    local_db.get_bookings(limit=5)
+    assert (get_query_log()[-1]["bytes"] is not None) == measured
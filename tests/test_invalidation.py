@@ -0,0 +1,96 @@
+import os
+import threading
+import time
+
+import pytest
+
+from utils.invalidation import InProcessChannel, InvalidationBus, PostgresChannel
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+def connect(channel, count=2):
+    """`count` bus sur un même canal, comme autant de réplicas ; retourne (bus, messages reçus)"""
+    buses, received = [], []
+    for _ in range(count):
+        bus = InvalidationBus(channel)
+        inbox = []
+        bus.subscribe(inbox.append)
+        buses.append(bus)
+        received.append(inbox)
+    return buses, received
+
+def test_round_trip_between_replicas():
+    (a, b), (inbox_a, inbox_b) = connect(InProcessChannel())
+    a.publish(("availability",))
+    assert a.flush(timeout=5)
+
+    assert inbox_b == [("availability",)]
+    assert inbox_a == []  # ses propres messages sont ignorés
+    assert a.stats()["published"] == 1 and b.stats()["received"] == 1
+
+def test_pending_invalidations_are_merged():
+    class BlockingChannel(InProcessChannel):
+        release = threading.Event()
+
+        def publish(self, payload):
+            self.release.wait(5)
+            super().publish(payload)
+
+    channel = BlockingChannel()
+    (a, _), (_, inbox_b) = connect(channel)
+    a.publish(("bookings",))
+    assert wait_for(lambda: a._sending)
+    a.publish(("event_types",))
+    a.publish(("availability", "bookings"))
+
+    channel.release.set()
+    assert a.flush(timeout=5)
+    assert inbox_b == [("bookings",), ("availability", "bookings", "event_types")]
+
+def test_publish_does_not_wait_for_the_channel():
+    class SlowChannel(InProcessChannel):
+        def publish(self, payload):
+            time.sleep(0.5)
+            super().publish(payload)
+
+    (a, _), (_, inbox_b) = connect(SlowChannel())
+    started = time.monotonic()
+    a.publish(("bookings",))
+    assert time.monotonic() - started < 0.1
+    assert a.flush(timeout=5)
+    assert inbox_b == [("bookings",)]
+
+def test_failed_publish_is_counted():
+    class BrokenChannel(InProcessChannel):
+        def publish(self, payload):
+            raise ConnectionError("canal indisponible")
+
+    bus = InvalidationBus(BrokenChannel())
+    bus.publish(("bookings",))
+    assert bus.flush(timeout=5)
+    assert bus.stats()["failed"] == 1 and bus.stats()["published"] == 0
+
+DSN = os.environ.get("APEL_TEST_DATABASE_URL")
+
+@pytest.mark.skipif(not DSN, reason="APEL_TEST_DATABASE_URL non défini")
+def test_round_trip_through_postgres_notify():
+    pytest.importorskip("psycopg")
+    name = f"apel_cache_test_{os.getpid()}"
+    a, b = InvalidationBus(PostgresChannel(DSN, name)), InvalidationBus(PostgresChannel(DSN, name))
+    inbox_b = []
+    b.subscribe(inbox_b.append)
+
+    # Le LISTEN est lancé dans un thread : republier jusqu'à ce qu'il soit en place
+    def delivered():
+        a.publish(("settings",))
+        a.flush(timeout=5)
+        return wait_for(lambda: inbox_b, timeout=0.5)
+
+    assert wait_for(delivered, timeout=10)
+    assert inbox_b[0] == ("settings",)
@@ -0,0 +1,161 @@
+"""Fonctions SQL de supabase_schema.sql exécutées sur un vrai Postgres.
+
+Nécessite APEL_TEST_DATABASE_URL vers une base JETABLE : le schéma public y est recréé.
+Les rôles anon et authenticated sont créés s'ils n'existent pas, avec les droits par
+défaut d'un projet Supabase, pour appeler les fonctions comme la page publique.
+"""
+import json
+import os
+import threading
+from pathlib import Path
+
+import pytest
+
+psycopg = pytest.importorskip("psycopg")
+
+DSN = os.environ.get("APEL_TEST_DATABASE_URL")
+SCHEMA = Path(__file__).resolve().parent.parent / "supabase_schema.sql"
+
+pytestmark = pytest.mark.skipif(not DSN, reason="APEL_TEST_DATABASE_URL non défini")
+
+SUPABASE_ROLES = """
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'anon') THEN
+        CREATE ROLE anon NOLOGIN;
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'authenticated') THEN
+        CREATE ROLE authenticated NOLOGIN;
+    END IF;
+END
+$$;
+GRANT anon, authenticated TO CURRENT_USER;
+GRANT USAGE ON SCHEMA public TO anon, authenticated;
+ALTER DEFAULT PRIVILEGES IN SCHEMA public GRANT ALL ON TABLES TO anon, authenticated;
+ALTER DEFAULT PRIVILEGES IN SCHEMA public GRANT ALL ON SEQUENCES TO anon, authenticated;
+ALTER DEFAULT PRIVILEGES IN SCHEMA public GRANT ALL ON FUNCTIONS TO anon, authenticated;
+CREATE EXTENSION IF NOT EXISTS pgcrypto;
+"""
+
+@pytest.fixture
+def db():
+    """Connexion propriétaire sur un schéma fraîchement créé"""
+    with psycopg.connect(DSN, autocommit=True) as conn:
+        conn.execute("DROP SCHEMA IF EXISTS public CASCADE")
+        conn.execute("CREATE SCHEMA public")
+        conn.execute(SUPABASE_ROLES)
+        conn.execute(SCHEMA.read_text())
+        yield conn
+
+def anon_connection():
+    conn = psycopg.connect(DSN, autocommit=True)
+    conn.execute("SET ROLE anon")
+    return conn
+
+def booking(event_type_id=1, start="10:00", end="10:30", **extra):
+    return {
+        "event_type_id": event_type_id,
+        "date": "2030-01-07",
+        "start_time": start,
+        "end_time": end,
+        "guest_name": "Invité",
+        "guest_email": "invite@exemple.fr",
+        **extra,
+    }
+
+def book(conn, data):
+    return conn.execute("SELECT (book_slot(%s::jsonb)).id", (json.dumps(data),)).fetchone()[0]
+
+def hold(conn, token, event_type_id=1, start="10:00", end="10:30"):
+    conn.execute(
+        "SELECT hold_slot(%s, DATE '2030-01-07', %s::time, %s::time, %s)",
+        (event_type_id, start, end, token)
+    )
+
+def test_anon_books_through_rpc(db):
+    with anon_connection() as anon:
+        assert book(anon, booking())
+        with pytest.raises(psycopg.errors.ExclusionViolation):
+            book(anon, booking())
+
+def test_anon_cannot_read_hold_tokens(db):
+    with anon_connection() as anon:
+        hold(anon, "jeton-a")
+        assert anon.execute("SELECT count(*) FROM slot_holds").fetchone()[0] == 1
+        with pytest.raises(psycopg.errors.InsufficientPrivilege):
+            anon.execute("SELECT hold_token FROM slot_holds")
+
+def test_anon_booking_respects_holds(db):
+    with anon_connection() as anon:
+        hold(anon, "jeton-a")
+        with pytest.raises(psycopg.Error) as error:
+            book(anon, booking(hold_token="jeton-b"))
+        assert error.value.sqlstate == "AP002"
+
+        assert book(anon, booking(hold_token="jeton-a"))
+        assert anon.execute("SELECT count(*) FROM slot_holds").fetchone()[0] == 0
+
+def test_concurrent_bookings_of_any_event_type_get_one_slot(db):
+    """50 invités, deux types d'événements, un même horaire : une seule réservation passe"""
+    barrier = threading.Barrier(50)
+    outcomes = []
+
+    def attempt(i):
+        with anon_connection() as anon:
+            barrier.wait()
+            try:
+                book(anon, booking(event_type_id=1 + i % 2, start="14:00", end="15:00"))
+                outcomes.append("ok")
+            except psycopg.errors.ExclusionViolation:
+                outcomes.append("slot_taken")
+
+    threads = [threading.Thread(target=attempt, args=(i,)) for i in range(50)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert outcomes.count("ok") == 1
+    assert outcomes.count("slot_taken") == 49
+    assert db.execute("SELECT count(*) FROM bookings").fetchone()[0] == 1
+
+def test_complete_past_bookings_skips_while_another_batch_holds_the_lock(db):
+    with anon_connection() as anon:
+        for start, end in [("09:00", "09:30"), ("10:00", "10:30"), ("11:00", "11:30")]:
+            book(anon, booking(start=start, end=end))
+    complete = "SELECT complete_past_bookings(DATE '2030-01-08', TIME '00:00', 2)"
+
+    with psycopg.connect(DSN) as other:
+        other.execute("SELECT pg_advisory_xact_lock(hashtext('complete_past_bookings'))")
+        assert db.execute(complete).fetchone()[0] is None
+        other.rollback()
+
+    assert db.execute(complete).fetchone()[0] == 2
+    assert db.execute(complete).fetchone()[0] == 1
+    assert db.execute("SELECT count(*) FROM bookings WHERE status = 'completed'").fetchone()[0] == 3
+
+def test_buffers_are_enforced_across_event_types(db):
+    db.execute("UPDATE event_types SET buffer_after = 15 WHERE id = 1")
+    with anon_connection() as anon:
+        book(anon, booking(event_type_id=1, start="10:00", end="10:30"))
+        with pytest.raises(psycopg.errors.ExclusionViolation):
+            book(anon, booking(event_type_id=2, start="10:30", end="11:30"))
+        assert book(anon, booking(event_type_id=2, start="10:45", end="11:45"))
+
+def test_holds_block_other_event_types(db):
+    with anon_connection() as anon:
+        hold(anon, "jeton-a", event_type_id=1, start="09:00", end="09:30")
+        with pytest.raises(psycopg.Error) as error:
+            hold(anon, "jeton-b", event_type_id=2, start="09:00", end="10:00")
+        assert error.value.sqlstate == "AP002"
+
+def test_busy_slots_merges_bookings_and_holds_without_tokens(db):
+    with anon_connection() as anon:
+        book(anon, booking(start="10:00", end="10:30"))
+        hold(anon, "jeton-a", start="11:00", end="11:30")
+        rows = anon.execute(
+            "SELECT start_time::text, expires_at IS NULL FROM busy_slots ORDER BY start_time"
+        ).fetchall()
+        assert rows == [("10:00:00", True), ("11:00:00", False)]
+        with pytest.raises(psycopg.errors.UndefinedColumn):
+            anon.execute("SELECT hold_token FROM busy_slots")
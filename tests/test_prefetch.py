@@ -0,0 +1,67 @@
+from datetime import timedelta
+
+import pytest
+
+from streamlit.testing.v1 import AppTest
+
+from utils import async_database, prefetch
+from utils.shared_cache import AvailabilityCache, MemoryStore
+
+@pytest.fixture
+def loads(local_db, monkeypatch):
+    """Chargements faits par le préchargement et par la page "date" elle-même"""
+    calls = {"prefetch": [], "page": [], "changed_during_prefetch": []}
+    load_snapshot = async_database.load_snapshot
+
+    def prefetch_load(*args):
+        if calls["changed_during_prefetch"]:
+            # Réservation faite par une autre session pendant le préchargement
+            local_db._slots_changed([{"date": day} for day in calls["changed_during_prefetch"]])
+        calls["prefetch"].append(args)
+        return load_snapshot(*args)
+
+    def page_load(*args):
+        calls["page"].append(args)
+        return load_snapshot(*args)
+
+    monkeypatch.setattr(prefetch, "load_snapshot", prefetch_load)
+    monkeypatch.setattr(async_database, "load_snapshot", page_load)
+    return calls
+
+@pytest.fixture
+def app(local_db):
+    at = AppTest.from_file("../app.py", default_timeout=30)
+    at.run()
+    return at
+
+def book(app):
+    app.button(key="book_1").click().run()
+    assert not app.exception
+    assert app.session_state["booking_step"] == "date"
+
+def test_only_the_clicked_event_is_prefetched_and_reused(app, loads):
+    assert "availability_prefetch" not in app.session_state
+
+    book(app)
+    entry = app.session_state["availability_prefetch"]
+    assert entry["event_id"] == 1
+    assert loads["prefetch"] == [(1, *entry["window"])]
+    assert loads["page"] == []
+
+def test_prefetch_is_dropped_when_a_day_of_its_window_changes(app, loads, local_db):
+    window = prefetch.get_snapshot_window(local_db.get_event_type_by_id(1))
+    loads["changed_during_prefetch"] = [window[0].isoformat()]
+
+    book(app)
+    assert loads["page"] == [(1, *window)]
+
+def test_prefetch_survives_changes_outside_its_window(app, loads, local_db, monkeypatch):
+    cache = AvailabilityCache(MemoryStore())
+    monkeypatch.setattr(local_db, "get_availability_cache", lambda: cache)
+    monkeypatch.setattr(prefetch, "get_availability_cache", lambda: cache)
+    window = prefetch.get_snapshot_window(local_db.get_event_type_by_id(1))
+    loads["changed_during_prefetch"] = [(window[1] + timedelta(days=1)).isoformat()]
+
+    book(app)
+    assert len(loads["prefetch"]) == 1
+    assert loads["page"] == []
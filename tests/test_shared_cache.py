@@ -0,0 +1,80 @@
+from datetime import date, timedelta
+
+import pytest
+
+from utils.shared_cache import AvailabilityCache, MemoryStore, SQLiteStore
+
+@pytest.fixture(params=["memory", "sqlite"])
+def shared(request, tmp_path):
+    store = MemoryStore() if request.param == "memory" else SQLiteStore(str(tmp_path / "shared.db"))
+    return AvailabilityCache(store)
+
+def test_day_bump_hides_only_that_day(shared):
+    days = ["2030-01-07", "2030-01-08"]
+    versions = shared.versions(days)
+    for day in days:
+        shared.set(1, versions, day, [540, 570])
+    assert shared.get_many(1, shared.versions(days), days) == {d: [540, 570] for d in days}
+
+    shared.bump_days(["2030-01-07"])
+    assert shared.get_many(1, shared.versions(days), days) == {"2030-01-08": [540, 570]}
+
+def test_global_bump_hides_every_day(shared):
+    days = ["2030-01-07", "2030-01-08"]
+    versions = shared.versions(days)
+    for day in days:
+        shared.set(1, versions, day, [540])
+    assert shared.global_version() == 0
+
+    shared.bump_global()
+    assert shared.global_version() == 1
+    assert shared.get_many(1, shared.versions(days), days) == {}
+
+@pytest.fixture
+def app(local_db, monkeypatch):
+    """Base locale et cache partagé en mémoire ; retourne (database, cache, type, jour ouvert)"""
+    cache = AvailabilityCache(MemoryStore())
+    monkeypatch.setattr(local_db, "get_availability_cache", lambda: cache)
+    event_type = local_db.get_event_types()[0]
+    day = date.today() + timedelta(days=1)
+    while not local_db.is_date_available(day, event_type):
+        day += timedelta(days=1)
+    return local_db, cache, event_type["id"], day
+
+def published(cache, event_type_id, day):
+    return cache.get_many(event_type_id, cache.versions([day.isoformat()]), [day.isoformat()])
+
+def test_slots_are_published_under_current_versions(app):
+    database, cache, event_type_id, day = app
+    slots = database.get_available_slots(day, event_type_id)
+    assert published(cache, event_type_id, day)
+
+    cache.bump_days([day.isoformat()])
+    assert not published(cache, event_type_id, day)
+    assert database.get_available_slots(day, event_type_id) == slots
+    assert published(cache, event_type_id, day)
+
+def test_stale_local_config_is_not_published_under_new_global_version(app):
+    database, cache, event_type_id, day = app
+    database.get_available_slots(day, event_type_id)
+
+    # Modification d'administration faite sur un autre réplica : le cache local n'est pas invalidé
+    cache.bump_global()
+    database.get_available_slots(day, event_type_id)
+    assert not published(cache, event_type_id, day)
+
+    # Invalidation reçue (bus) : la configuration est relue sous la nouvelle version
+    database._invalidate_local("availability")
+    database.get_available_slots(day, event_type_id)
+    assert published(cache, event_type_id, day)
+
+def test_local_admin_change_bumps_global_version_and_republishes(app):
+    database, cache, event_type_id, day = app
+    database.get_available_slots(day, event_type_id)
+    version = cache.global_version()
+
+    database.invalidate_cache("availability")
+    assert cache.global_version() == version + 1
+    assert not published(cache, event_type_id, day)
+    database.get_available_slots(day, event_type_id)
+    assert published(cache, event_type_id, day)
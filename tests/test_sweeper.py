@@ -0,0 +1,46 @@
+from datetime import date, timedelta
+
+from utils import sweeper as sweeper_module
+from utils.sweeper import BookingSweeper
+
+def add_past_bookings(database, count):
+    event_type = database.get_event_types()[0]
+    day = date.today() - timedelta(days=7)
+    database.get_supabase().bulk_load("bookings", [{
+        "event_type_id": event_type["id"],
+        "date": day.isoformat(),
+        "start_time": f"{database.minutes_to_time(480 + 15 * i)}:00",
+        "end_time": f"{database.minutes_to_time(495 + 15 * i)}:00",
+        "guest_name": f"Invité {i}",
+        "guest_email": f"invite{i}@exemple.fr",
+        "status": "confirmed",
+        "cancel_token": f"jeton-{i}",
+    } for i in range(count)])
+
+def test_sweep_completes_past_bookings_in_batches(local_db):
+    add_past_bookings(local_db, 5)
+    assert local_db.complete_past_bookings(batch_size=2) == {
+        "completed": 5, "batches": 3, "locked_elsewhere": False
+    }
+    assert local_db.complete_past_bookings(batch_size=2)["completed"] == 0
+
+def test_sweeper_is_disabled_by_the_test_environment(local_db):
+    assert sweeper_module.get_sweeper() is None
+
+def test_sweep_stops_when_the_lock_is_held_elsewhere(local_db):
+    """Chemin "verrou pris" du balayeur uniquement : le verrou local est réentrant et ne peut
+    pas être disputé entre deux connexions (voir test_postgres.py pour la vraie contention)"""
+    add_past_bookings(local_db, 3)
+    client = local_db.get_supabase()
+    with client.try_advisory_lock("complete_past_bookings") as acquired:
+        assert acquired
+        assert client.rpc("complete_past_bookings", {
+            "p_today": date.today().isoformat(), "p_now": "00:00:00"
+        }).execute().data is None
+
+        sweeper = BookingSweeper(lambda: local_db.complete_past_bookings(batch_size=2))
+        run = sweeper.run_once()
+    assert run["locked_elsewhere"] and run["completed"] == 0
+    assert sweeper.stats()["skipped"] == 1
+
+    assert sweeper.run_once()["completed"] == 3
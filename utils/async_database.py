@@ -0,0 +1,144 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from datetime import date
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from utils.database import (
+    AvailabilitySnapshot, get_event_type_dates, get_event_types,
+    get_availability, get_date_overrides, get_busy_slots_between, split_busy_slots,
+    get_stats, get_bookings, get_settings
+)
+from utils.instrumentation import SCRIPT_CTX
+
+# ============================================
+# ACCÈS CONCURRENT AUX DONNÉES
+# ============================================
+# Les lectures indépendantes sont lancées ensemble avec asyncio.gather : la latence
+# d'un chargement devient celle de la plus lente requête, et non leur somme.
+# Chaque lecture réutilise la fonction synchrone de utils.database (et donc son cache) :
+# une lecture servie par le cache est résolue sur place, les autres sont exécutées dans
+# un pool de threads partagé par toutes les sessions du processus (le client Supabase,
+# httpx, est partagé entre threads). Un chargement lance 4 à 5 lectures : le pool doit
+# compter environ 5 threads par chargement simultané attendu.
+#
+#   APEL_DB_THREADS     threads du pool (64 par défaut, soit une douzaine de chargements)
+#   APEL_DB_TIMEOUT     secondes avant d'abandonner l'attente d'un chargement (30 par défaut)
+
+MAX_CONCURRENT_QUERIES = int(os.environ.get("APEL_DB_THREADS", 64))
+QUERY_TIMEOUT = float(os.environ.get("APEL_DB_TIMEOUT", 30))
+
+class QueryTimeoutError(TimeoutError):
+    """Les lectures n'ont pas répondu dans le délai APEL_DB_TIMEOUT"""
+
+_loop = None
+_loop_lock = threading.Lock()
+
+def _get_loop():
+    """Boucle asyncio du processus, qui tourne dans un thread dédié"""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            _loop.set_default_executor(
+                ThreadPoolExecutor(max_workers=MAX_CONCURRENT_QUERIES, thread_name_prefix="apel-db")
+            )
+            threading.Thread(target=_loop.run_forever, name="apel-db-loop", daemon=True).start()
+    return _loop
+
+def run_sync(coro, timeout: float = QUERY_TIMEOUT):
+    """Exécute une coroutine depuis du code synchrone (pages Streamlit) et retourne son résultat.
+
+    Lève QueryTimeoutError si elle n'a pas abouti après `timeout` secondes.
+    """
+    ctx = get_script_run_ctx()
+
+    async def with_script_ctx():
+        SCRIPT_CTX.set(ctx)
+        return await coro
+
+    future = asyncio.run_coroutine_threadsafe(with_script_ctx(), _get_loop())
+    try:
+        return future.result(timeout)
+    except FutureTimeoutError:
+        future.cancel()
+        raise QueryTimeoutError(f"La base n'a pas répondu en {timeout:g} s") from None
+
+async def _call(func, *args, **kwargs):
+    """Exécute une lecture synchrone : sur place si le cache la sert, sinon dans le pool de threads"""
+    cache_lookup = getattr(func, "cache_lookup", None)
+    if cache_lookup is not None:
+        found, value = cache_lookup(*args, **kwargs)
+        if found:
+            return value
+
+    ctx = SCRIPT_CTX.get()
+
+    def run():
+        if ctx is not None:
+            add_script_run_ctx(threading.current_thread(), ctx)
+        return func(*args, **kwargs)
+
+    return await asyncio.get_running_loop().run_in_executor(None, run)
+
+async def _no_rows():
+    """Lecture évitée : les données sont déjà dans le cache partagé"""
+    return []
+
+# ============================================
+# VERSIONS ASYNCHRONES
+# ============================================
+
+async def _event_type_rows(event_type_id: int):
+    """(types d'événements, type demandé, ses dates) ; les dates ne sont lues qu'en mode dates spécifiques"""
+    event_types = await _call(get_event_types)
+    event_type = next((e for e in event_types if e["id"] == event_type_id), None)
+    event_type_dates = []
+    if event_type and event_type.get("use_specific_dates"):
+        event_type_dates = await _call(get_event_type_dates, event_type_id)
+    return event_types, event_type, event_type_dates
+
+async def load_snapshot_async(event_type_id: int, start_date: date, end_date: date = None):
+    """Charge une AvailabilitySnapshot en lançant toutes ses lectures en parallèle.
+
+    Le type d'événement est pris dans la liste des types (lue de toute façon pour les buffers) ;
+    ses dates ne sont lues qu'en mode dates spécifiques, et les créneaux occupés que pour les
+    jours absents du cache partagé.
+    """
+    end_date = end_date or start_date
+    # Versions du cache partagé lues avant les réservations qu'elles couvrent
+    versions, shared_starts, complete = await _call(
+        AvailabilitySnapshot.shared_lookup, event_type_id, start_date, end_date
+    )
+    (event_types, event_type, event_type_dates), availability, overrides, busy = await asyncio.gather(
+        _event_type_rows(event_type_id),
+        _call(get_availability),
+        _call(get_date_overrides),
+        _call(get_busy_slots_between, start_date, end_date) if not complete else _no_rows(),
+    )
+    bookings, holds = split_busy_slots(busy)
+    return AvailabilitySnapshot.from_rows(
+        event_type, event_type_dates, availability, overrides, bookings, event_types,
+        start_date, end_date, versions, shared_starts, holds
+    )
+
+async def get_dashboard_data_async(upcoming_limit: int = 10):
+    """Statistiques, prochains rendez-vous et paramètres du dashboard, lus en parallèle"""
+    stats, upcoming, settings = await asyncio.gather(
+        _call(get_stats),
+        _call(get_bookings, status="confirmed", upcoming_only=True, limit=upcoming_limit),
+        _call(get_settings),
+    )
+    return stats, upcoming, settings
+
+# ============================================
+# FAÇADE SYNCHRONE
+# ============================================
+
+def load_snapshot(event_type_id: int, start_date: date, end_date: date = None):
+    """Version synchrone de load_snapshot_async"""
+    return run_sync(load_snapshot_async(event_type_id, start_date, end_date))
+
+def get_dashboard_data(upcoming_limit: int = 10):
+    """Version synchrone de get_dashboard_data_async"""
+    return run_sync(get_dashboard_data_async(upcoming_limit))
@@ -1,5 +1,36 @@
 import streamlit as st
-from utils.database import verify_admin_password
+import bcrypt
+from utils.database import get_settings, update_settings
+
+# ============================================
+# MOT DE PASSE ADMIN
+# ============================================
+# Réservé aux pages d'administration : la page publique n'importe pas bcrypt.
+
+def hash_password(password: str) -> str:
+    """Hache un mot de passe avec bcrypt"""
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+
+def verify_admin_password(password: str) -> bool:
+    """Vérifie le mot de passe admin (supporte bcrypt et plaintext pour migration)"""
+    settings = get_settings()
+    if not settings:
+        return False
+    stored = settings.get("admin_password", "")
+    # Si le mot de passe est déjà haché (commence par $2b$), vérifier avec bcrypt
+    if stored.startswith("$2b$"):
+        return bcrypt.checkpw(password.encode('utf-8'), stored.encode('utf-8'))
+    # Sinon, c'est un ancien mot de passe en clair : vérifier puis migrer automatiquement
+    if stored == password:
+        # Migration automatique vers bcrypt
+        hashed = hash_password(password)
+        update_settings({"admin_password": hashed})
+        return True
+    return False
+
+# ============================================
+# SESSION ADMIN
+# ============================================
 
 def init_session_state():
     """Initialise les variables de session"""
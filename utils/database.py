@@ -1,8 +1,20 @@
 import streamlit as st
 from supabase import create_client, Client
-from datetime import datetime, date, time, timedelta
-import pandas as pd
-import bcrypt
+from postgrest.exceptions import APIError
+from datetime import datetime, date, time, timedelta, timezone
+from bisect import bisect_left
+from collections import Counter, OrderedDict
+from itertools import accumulate
+from functools import wraps
+import copy
+import itertools
+import os
+import threading
+import time as time_module
+from utils.instrumentation import instrumented, record_cache_hit, count_request
+from utils.invalidation import get_invalidation_bus
+from utils.shared_cache import get_availability_cache
+from utils.sweeper import get_sweeper
 
 # ============================================
 # CONNEXION SUPABASE
@@ -10,15 +22,218 @@ import bcrypt
 
 @st.cache_resource
 def get_supabase() -> Client:
-    """Initialise et retourne le client Supabase"""
+    """Initialise et retourne le client Supabase.
+
+    Avec APEL_BACKEND=local, retourne à la place un client SQLite local de même interface
+    (base APEL_LOCAL_DB, en mémoire par défaut) pour travailler ou mesurer hors ligne.
+    """
+    _start_invalidation_listener()
+    _start_sweeper()
+
+    if os.environ.get("APEL_BACKEND") == "local":
+        from utils.local_backend import create_local_client
+        return create_local_client(os.environ.get("APEL_LOCAL_DB", ":memory:"))
+
     url = st.secrets["SUPABASE_URL"]
     key = st.secrets["SUPABASE_KEY"]
-    return create_client(url, key)
+    client = create_client(url, key)
+    # Chaque requête HTTP vers PostgREST compte un aller-retour (page Diagnostics)
+    client.postgrest.session.event_hooks["request"].append(count_request)
+    return client
+
+# ============================================
+# CACHE DES TABLES PEU MODIFIÉES
+# ============================================
+
+class TTLCache:
+    """Cache mémoire partagé par les sessions du processus.
+
+    Les entrées expirent après `ttl` secondes ; au-delà de `maxsize` entrées, la moins
+    récemment utilisée est évincée. Les clés commencent par le tuple des tables lues,
+    ce qui permet d'invalider toutes les entrées d'une table après une écriture.
+    Chaque entrée garde la version globale du cache partagé sous laquelle elle a été lue.
+    """
+
+    def __init__(self, ttl: float = 60, maxsize: int = 256):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, count_miss: bool = True):
+        """Retourne (trouvé, valeur) ; une entrée expirée compte comme un miss (sauf `count_miss` faux)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time_module.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += count_miss
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, copy.deepcopy(entry[1])
+
+    def set(self, key, value, ttl: float = None, version: int = None):
+        with self._lock:
+            expires_at = time_module.monotonic() + (self.ttl if ttl is None else ttl)
+            self._entries[key] = (expires_at, copy.deepcopy(value), version)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, *tables):
+        """Supprime les entrées des tables données (toutes si aucune n'est précisée)"""
+        with self._lock:
+            if not tables:
+                self._entries.clear()
+                return
+            for key in [k for k in self._entries if not set(k[0]).isdisjoint(tables)]:
+                del self._entries[key]
+
+    def oldest_version(self, *tables):
+        """Plus ancienne version sous laquelle les entrées des tables ont été lues
+        (-1 si l'une est inconnue, None si aucune entrée)"""
+        now = time_module.monotonic()
+        with self._lock:
+            versions = [
+                -1 if version is None else version
+                for k, (expires_at, _, version) in self._entries.items()
+                if expires_at >= now and not set(k[0]).isdisjoint(tables)
+            ]
+        return min(versions, default=None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0
+            }
+
+CACHE_TTL = float(os.environ.get("APEL_CACHE_TTL", 60))
+
+_cache = TTLCache(
+    ttl=CACHE_TTL,
+    maxsize=int(os.environ.get("APEL_CACHE_MAX_ENTRIES", 256))
+)
+
+def cached(*tables: str, ttl: float = None):
+    """Met en cache le résultat d'une lecture des `tables`, invalidé par `invalidate_cache(table)`"""
+    def decorator(func):
+        def key_of(args, kwargs):
+            return (tables, func.__name__, args, tuple(sorted(kwargs.items())))
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = key_of(args, kwargs)
+            found, value = _cache.get(key)
+            if found:
+                record_cache_hit(func.__name__)
+                return value
+            version = _shared_global_version(tables)
+            value = func(*args, **kwargs)
+            _cache.set(key, value, ttl, version)
+            return value
+
+        def cache_lookup(*args, **kwargs):
+            """(trouvé, valeur) sans lire la base ; un échec n'est pas compté (l'appel suivra)"""
+            found, value = _cache.get(key_of(args, kwargs), count_miss=False)
+            if found:
+                record_cache_hit(func.__name__)
+            return found, value
+
+        wrapper.cache_lookup = cache_lookup
+        return wrapper
+    return decorator
+
+# Tables dont dépendent les créneaux calculés (cache partagé) en dehors des réservations
+AVAILABILITY_TABLES = ("event_types", "event_type_dates", "availability", "date_overrides")
+
+def _shared_global_version(tables):
+    """Version globale du cache partagé lue avant une lecture des `tables` (None si sans objet)"""
+    shared = get_availability_cache()
+    if shared is None or set(tables).isdisjoint(AVAILABILITY_TABLES):
+        return None
+    return shared.global_version()
+
+def _config_is_current(versions) -> bool:
+    """La configuration en cache local a été lue sous la version globale `versions` ou une plus récente.
+
+    Sinon (entrée remplie avant une modification faite sur un autre réplica, et pas encore
+    invalidée ici), les créneaux calculés ne doivent pas être publiés sous cette version.
+    """
+    oldest = _cache.oldest_version(*AVAILABILITY_TABLES)
+    return oldest is not None and oldest >= versions[0]
+
+# Incrémentée à chaque réservation ou blocage modifié ici, ou sur un autre réplica (bus)
+_bookings_versions = itertools.count(1)
+_bookings_version = 0
+
+def _bump_bookings_version():
+    global _bookings_version
+    _bookings_version = next(_bookings_versions)
+
+def get_bookings_version() -> int:
+    """Version des réservations du processus : des créneaux lus sous une autre version sont périmés"""
+    return _bookings_version
+
+def _invalidate_local(*tables: str):
+    """Invalide le cache local des tables ; les tables de configuration sont invalidées ensemble,
+    pour que toutes soient relues sous la nouvelle version globale du cache partagé"""
+    if not tables or "bookings" in tables:
+        _bump_bookings_version()
+    if not set(tables).isdisjoint(AVAILABILITY_TABLES):
+        tables = tuple(set(tables) | set(AVAILABILITY_TABLES))
+    _cache.invalidate(*tables)
+
+def invalidate_cache(*tables: str):
+    """Invalide le cache des tables modifiées (tout le cache si aucune table), ici et sur les autres réplicas"""
+    _invalidate_local(*tables)
+    shared = get_availability_cache()
+    if shared is not None and (not tables or not set(tables).isdisjoint(AVAILABILITY_TABLES)):
+        shared.bump_global()
+    bus = get_invalidation_bus()
+    if bus is not None:
+        bus.publish(tables)
+
+@st.cache_resource
+def _start_invalidation_listener():
+    """Applique au cache local les invalidations publiées par les autres réplicas (une fois par processus)"""
+    bus = get_invalidation_bus()
+    if bus is not None:
+        bus.subscribe(lambda tables: _invalidate_local(*tables))
+    return bus
+
+@st.cache_resource
+def _start_sweeper():
+    """Lance la clôture automatique des réservations passées (une fois par processus)"""
+    sweeper = get_sweeper()
+    if sweeper is not None:
+        sweeper.start()
+    return sweeper
+
+def get_cache_stats():
+    """Compteurs du cache (hits, misses, évictions, taux de succès), du bus d'invalidation et du cache partagé"""
+    stats = _cache.stats()
+    bus = get_invalidation_bus()
+    stats["invalidation"] = bus.stats() if bus is not None else None
+    shared = get_availability_cache()
+    stats["shared"] = shared.stats() if shared is not None else None
+    return stats
 
 # ============================================
 # SETTINGS
 # ============================================
 
+@cached("settings")
+@instrumented
 def get_settings():
     """Récupère les paramètres globaux"""
     supabase = get_supabase()
@@ -27,36 +242,19 @@ def get_settings():
         return result.data[0]
     return None
 
+@instrumented
 def update_settings(data: dict):
     """Met à jour les paramètres"""
     supabase = get_supabase()
     supabase.table("settings").update(data).eq("id", 1).execute()
-
-def hash_password(password: str) -> str:
-    """Hache un mot de passe avec bcrypt"""
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-
-def verify_admin_password(password: str) -> bool:
-    """Vérifie le mot de passe admin (supporte bcrypt et plaintext pour migration)"""
-    settings = get_settings()
-    if not settings:
-        return False
-    stored = settings.get("admin_password", "")
-    # Si le mot de passe est déjà haché (commence par $2b$), vérifier avec bcrypt
-    if stored.startswith("$2b$"):
-        return bcrypt.checkpw(password.encode('utf-8'), stored.encode('utf-8'))
-    # Sinon, c'est un ancien mot de passe en clair : vérifier puis migrer automatiquement
-    if stored == password:
-        # Migration automatique vers bcrypt
-        hashed = hash_password(password)
-        update_settings({"admin_password": hashed})
-        return True
-    return False
+    invalidate_cache("settings")
 
 # ============================================
 # EVENT TYPES
 # ============================================
 
+@cached("event_types")
+@instrumented
 def get_event_types(active_only: bool = False):
     """Récupère tous les types d'événements"""
     supabase = get_supabase()
@@ -66,6 +264,20 @@ def get_event_types(active_only: bool = False):
     result = query.execute()
     return result.data
 
+@cached("event_types", "event_type_dates")
+@instrumented
+def get_event_types_with_dates():
+    """Récupère tous les types d'événements avec leurs dates spécifiques embarquées (une seule requête)"""
+    supabase = get_supabase()
+    result = supabase.table("event_types")\
+        .select("*, event_type_dates(id, date)")\
+        .order("created_at")\
+        .order("date", foreign_table="event_type_dates")\
+        .execute()
+    return result.data
+
+@cached("event_types")
+@instrumented
 def get_event_type_by_slug(slug: str):
     """Récupère un type d'événement par son slug"""
     supabase = get_supabase()
@@ -74,6 +286,8 @@ def get_event_type_by_slug(slug: str):
         return result.data[0]
     return None
 
+@cached("event_types")
+@instrumented
 def get_event_type_by_id(event_id: int):
     """Récupère un type d'événement par son ID"""
     supabase = get_supabase()
@@ -82,26 +296,34 @@ def get_event_type_by_id(event_id: int):
         return result.data[0]
     return None
 
+@instrumented
 def create_event_type(data: dict):
     """Crée un nouveau type d'événement"""
     supabase = get_supabase()
     result = supabase.table("event_types").insert(data).execute()
+    invalidate_cache("event_types")
     return result.data[0] if result.data else None
 
+@instrumented
 def update_event_type(event_id: int, data: dict):
     """Met à jour un type d'événement"""
     supabase = get_supabase()
     supabase.table("event_types").update(data).eq("id", event_id).execute()
+    invalidate_cache("event_types")
 
+@instrumented
 def delete_event_type(event_id: int):
     """Supprime un type d'événement"""
     supabase = get_supabase()
     supabase.table("event_types").delete().eq("id", event_id).execute()
+    invalidate_cache("event_types", "event_type_dates")
 
 # ============================================
 # EVENT TYPE DATES (dates spécifiques)
 # ============================================
 
+@cached("event_type_dates")
+@instrumented
 def get_event_type_dates(event_type_id: int):
     """Récupère les dates spécifiques d'un type d'événement"""
     supabase = get_supabase()
@@ -112,6 +334,7 @@ def get_event_type_dates(event_type_id: int):
         .execute()
     return result.data
 
+@instrumented
 def add_event_type_date(event_type_id: int, event_date: date):
     """Ajoute une date spécifique à un type d'événement"""
     supabase = get_supabase()
@@ -119,118 +342,219 @@ def add_event_type_date(event_type_id: int, event_date: date):
         "event_type_id": event_type_id,
         "date": event_date.isoformat()
     }).execute()
+    invalidate_cache("event_type_dates")
     return result.data[0] if result.data else None
 
+def generate_dates(start_date: date, end_date: date, weekdays, excluded_periods=(), excluded_dates=()):
+    """Dates entre deux bornes (incluses) tombant un des `weekdays` (0 = lundi),
+    hors périodes exclues [(début, fin), ...] et dates exclues"""
+    weekdays = set(weekdays)
+    excluded_dates = set(excluded_dates)
+    dates = []
+    current = start_date
+    while current <= end_date:
+        if current.weekday() in weekdays and current not in excluded_dates \
+                and not any(start <= current <= end for start, end in excluded_periods):
+            dates.append(current)
+        current += timedelta(days=1)
+    return dates
+
+@instrumented
+def add_event_type_dates(event_type_id: int, dates):
+    """Ajoute plusieurs dates spécifiques en une seule requête ; retourne les dates créées.
+
+    Les dates déjà présentes sont ignorées par la base (UNIQUE(event_type_id, date)).
+    """
+    rows = [{"event_type_id": event_type_id, "date": d.isoformat()} for d in sorted(set(dates))]
+    if not rows:
+        return []
+    supabase = get_supabase()
+    result = supabase.table("event_type_dates") \
+        .upsert(rows, on_conflict="event_type_id,date", ignore_duplicates=True) \
+        .execute()
+    invalidate_cache("event_type_dates")
+    return result.data
+
+@instrumented
 def delete_event_type_date(date_id: int):
     """Supprime une date spécifique"""
     supabase = get_supabase()
     supabase.table("event_type_dates").delete().eq("id", date_id).execute()
+    invalidate_cache("event_type_dates")
 
+@instrumented
 def delete_all_event_type_dates(event_type_id: int):
     """Supprime toutes les dates spécifiques d'un type d'événement"""
     supabase = get_supabase()
     supabase.table("event_type_dates").delete().eq("event_type_id", event_type_id).execute()
+    invalidate_cache("event_type_dates")
 
 # ============================================
 # AVAILABILITY
 # ============================================
 
+@cached("availability")
+@instrumented
 def get_availability():
     """Récupère toutes les disponibilités"""
     supabase = get_supabase()
     result = supabase.table("availability").select("*").order("day_of_week").execute()
     return result.data
 
-def get_availability_for_day(day_of_week: int):
-    """Récupère les disponibilités pour un jour"""
-    supabase = get_supabase()
-    result = supabase.table("availability")\
-        .select("*")\
-        .eq("day_of_week", day_of_week)\
-        .eq("is_active", True)\
-        .execute()
-    return result.data
-
-def update_availability(avail_id: int, data: dict):
-    """Met à jour une disponibilité"""
+@instrumented
+def save_availability(rows: list, deleted_ids: list = None):
+    """Enregistre en lot les plages modifiées (un upsert) et supprimées (un delete)"""
     supabase = get_supabase()
-    supabase.table("availability").update(data).eq("id", avail_id).execute()
-
+    if rows:
+        supabase.table("availability").upsert(rows).execute()
+    if deleted_ids:
+        supabase.table("availability").delete().in_("id", deleted_ids).execute()
+    if rows or deleted_ids:
+        invalidate_cache("availability")
+
+@instrumented
 def create_availability(data: dict):
     """Crée une nouvelle disponibilité"""
     supabase = get_supabase()
     result = supabase.table("availability").insert(data).execute()
+    invalidate_cache("availability")
     return result.data[0] if result.data else None
 
+@instrumented
 def delete_availability(avail_id: int):
     """Supprime une disponibilité"""
     supabase = get_supabase()
     supabase.table("availability").delete().eq("id", avail_id).execute()
+    invalidate_cache("availability")
 
 # ============================================
 # DATE OVERRIDES
 # ============================================
 
+@cached("date_overrides")
+@instrumented
 def get_date_overrides():
     """Récupère toutes les exceptions de dates"""
     supabase = get_supabase()
     result = supabase.table("date_overrides").select("*").order("date").execute()
     return result.data
 
-def get_date_override(selected_date: date):
-    """Récupère l'exception pour une date donnée"""
-    supabase = get_supabase()
-    result = supabase.table("date_overrides")\
-        .select("*")\
-        .eq("date", selected_date.isoformat())\
-        .limit(1)\
-        .execute()
-    if result.data:
-        return result.data[0]
-    return None
-
+@instrumented
 def create_date_override(data: dict):
     """Crée une exception de date"""
     supabase = get_supabase()
     result = supabase.table("date_overrides").insert(data).execute()
+    invalidate_cache("date_overrides")
     return result.data[0] if result.data else None
 
+@instrumented
 def delete_date_override(override_id: int):
     """Supprime une exception de date"""
     supabase = get_supabase()
     supabase.table("date_overrides").delete().eq("id", override_id).execute()
+    invalidate_cache("date_overrides")
 
 # ============================================
 # BOOKINGS
 # ============================================
 
-def get_bookings(status: str = None, upcoming_only: bool = False):
-    """Récupère les réservations"""
+BOOKINGS_PAGE_SIZE = 50
+
+def _quote_filter_value(value: str) -> str:
+    """Protège une valeur saisie utilisée dans un filtre or=(...) de PostgREST"""
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+@instrumented
+def get_bookings(status: str = None, upcoming_only: bool = False, past_only: bool = False,
+                 search: str = None, limit: int = None, after: tuple = None,
+                 start_date: date = None, end_date: date = None, event_type_id: int = None):
+    """Récupère les réservations, les plus récentes d'abord.
+
+    Les filtres (statut, période, intervalle de dates, type d'événement, recherche
+    nom/email/téléphone) sont appliqués côté serveur.
+    `after` est la clé (date, start_time, id) de la dernière ligne déjà lue : on ne
+    récupère que les suivantes (pagination par clé, sans OFFSET).
+    """
     supabase = get_supabase()
     query = supabase.table("bookings")\
         .select("*, event_types(name, color, duration)")\
         .order("date", desc=True)\
-        .order("start_time", desc=True)
+        .order("start_time", desc=True)\
+        .order("id", desc=True)
 
     if status:
         query = query.eq("status", status)
 
+    today = date.today().isoformat()
     if upcoming_only:
-        query = query.gte("date", date.today().isoformat())
+        query = query.gte("date", today)
+    if past_only:
+        query = query.lt("date", today)
+    if start_date:
+        query = query.gte("date", start_date.isoformat())
+    if end_date:
+        query = query.lte("date", end_date.isoformat())
+    if event_type_id:
+        query = query.eq("event_type_id", event_type_id)
+
+    conditions = []
+    if search:
+        pattern = _quote_filter_value(f"*{search}*")
+        conditions.append(
+            f"or(guest_name.ilike.{pattern},guest_email.ilike.{pattern},guest_phone.ilike.{pattern})"
+        )
+    if after:
+        after_date, after_time, after_id = after
+        after_time = _quote_filter_value(after_time)
+        query = query.lte("date", after_date)
+        conditions.append(
+            f"or(date.lt.{after_date},"
+            f"and(date.eq.{after_date},start_time.lt.{after_time}),"
+            f"and(date.eq.{after_date},start_time.eq.{after_time},id.lt.{after_id}))"
+        )
+    if conditions:
+        query = query.or_(f"and({','.join(conditions)})")
+
+    if limit:
+        query = query.limit(limit)
 
     result = query.execute()
     return result.data
 
-def get_bookings_for_date(selected_date: date):
-    """Récupère les réservations pour une date"""
+def get_bookings_page(status: str = None, upcoming_only: bool = False, past_only: bool = False,
+                      search: str = None, after: tuple = None, page_size: int = BOOKINGS_PAGE_SIZE,
+                      start_date: date = None, end_date: date = None, event_type_id: int = None):
+    """Récupère une page de réservations et la clé de la page suivante (None si c'est la dernière)"""
+    rows = get_bookings(
+        status, upcoming_only, past_only, search, limit=page_size + 1, after=after,
+        start_date=start_date, end_date=end_date, event_type_id=event_type_id
+    )
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    last = rows[-1]
+    return rows, (last["date"], last["start_time"], last["id"])
+
+@instrumented
+def get_busy_slots_between(start_date: date, end_date: date):
+    """Récupère en une requête les créneaux occupés d'une période (vue busy_slots) :
+    réservations actives et blocages non expirés, séparés par `split_busy_slots`"""
     supabase = get_supabase()
-    result = supabase.table("bookings")\
-        .select("*")\
-        .eq("date", selected_date.isoformat())\
-        .eq("status", "confirmed")\
+    result = supabase.table("busy_slots")\
+        .select("date, start_time, end_time, event_type_id, expires_at")\
+        .gte("date", start_date.isoformat())\
+        .lte("date", end_date.isoformat())\
         .execute()
     return result.data
 
+def split_busy_slots(rows):
+    """(réservations, blocages) : un blocage a une date d'expiration"""
+    bookings, holds = [], []
+    for row in rows:
+        (holds if row.get("expires_at") else bookings).append(row)
+    return bookings, holds
+
+@instrumented
 def get_booking_by_id(booking_id: int):
     """Récupère une réservation par ID"""
     supabase = get_supabase()
@@ -243,6 +567,7 @@ def get_booking_by_id(booking_id: int):
         return result.data[0]
     return None
 
+@instrumented
 def get_booking_by_token(token: str):
     """Récupère une réservation par son token d'annulation"""
     supabase = get_supabase()
@@ -255,172 +580,564 @@ def get_booking_by_token(token: str):
         return result.data[0]
     return None
 
+class SlotUnavailableError(Exception):
+    """Le créneau demandé ne peut plus être réservé.
+
+    `reason` vaut "slot_taken" si un autre invité l'a réservé entre-temps,
+    "slot_held" s'il est bloqué par un invité en train de réserver,
+    "day_full" si le type d'événement a atteint son maximum pour la journée.
+    """
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+def _slots_changed(rows):
+    """Rend périmés, dans le cache partagé et ce processus, les créneaux des jours des lignes modifiées"""
+    _bump_bookings_version()
+    shared = get_availability_cache()
+    if shared is not None:
+        shared.bump_days(str(row["date"]) for row in rows or [] if row and row.get("date"))
+
+def _bookings_changed(rows):
+    """Invalide le cache des réservations et les créneaux partagés des jours modifiés"""
+    invalidate_cache("bookings")
+    _slots_changed(rows)
+
+# Codes d'erreur levés par les fonctions SQL book_slot et hold_slot
+_BOOKING_ERRORS = {
+    "23P01": "slot_taken",  # exclusion_violation (bookings_no_overlap)
+    "AP001": "day_full",
+    "AP002": "slot_held",
+}
+
+@instrumented
 def create_booking(data: dict):
-    """Crée une nouvelle réservation"""
+    """Crée une nouvelle réservation de façon atomique (fonction SQL book_slot).
+
+    Lève SlotUnavailableError si le créneau a été pris entre-temps ou si la journée est complète.
+    """
     supabase = get_supabase()
-    result = supabase.table("bookings").insert(data).execute()
-    return result.data[0] if result.data else None
+    try:
+        result = supabase.rpc("book_slot", {"p_booking": data}).execute()
+    except APIError as e:
+        if e.code in _BOOKING_ERRORS:
+            # Les créneaux affichés pour ce jour étaient périmés : forcer leur recalcul
+            _bookings_changed([data])
+            raise SlotUnavailableError(_BOOKING_ERRORS[e.code]) from e
+        raise
+    booking = result.data
+    if isinstance(booking, list):
+        booking = booking[0] if booking else None
+    _bookings_changed([booking or data])
+    return booking
+
+# Durée pendant laquelle le créneau choisi reste réservé à l'invité qui remplit le formulaire
+HOLD_TTL_SECONDS = 600
+
+@instrumented
+def hold_slot(event_type_id: int, selected_date: date, start_time: str, end_time: str,
+              hold_token: str, ttl_seconds: int = HOLD_TTL_SECONDS):
+    """Bloque un créneau pour l'invité identifié par `hold_token` (remplace son blocage précédent).
+
+    Lève SlotUnavailableError si le créneau est déjà réservé ou bloqué par un autre invité.
+    """
+    supabase = get_supabase()
+    try:
+        result = supabase.rpc("hold_slot", {
+            "p_event_type_id": event_type_id,
+            "p_date": selected_date.isoformat(),
+            "p_start_time": start_time,
+            "p_end_time": end_time,
+            "p_hold_token": hold_token,
+            "p_ttl_seconds": ttl_seconds
+        }).execute()
+    except APIError as e:
+        if e.code in _BOOKING_ERRORS:
+            _slots_changed([{"date": selected_date.isoformat()}])
+            raise SlotUnavailableError(_BOOKING_ERRORS[e.code]) from e
+        raise
+    hold = result.data
+    if isinstance(hold, list):
+        hold = hold[0] if hold else None
+    _slots_changed([hold])
+    return hold
+
+@instrumented
+def release_hold(hold_token: str):
+    """Libère le créneau bloqué par un invité (sans effet s'il n'y en a pas)"""
+    supabase = get_supabase()
+    result = supabase.rpc("release_hold", {"p_hold_token": hold_token}).execute()
+    _slots_changed(result.data)
 
+@instrumented
 def update_booking(booking_id: int, data: dict):
     """Met à jour une réservation"""
     supabase = get_supabase()
-    supabase.table("bookings").update(data).eq("id", booking_id).execute()
+    result = supabase.table("bookings").update(data).eq("id", booking_id).execute()
+    _bookings_changed(result.data)
 
+@instrumented
 def cancel_booking(booking_id: int, reason: str = ""):
     """Annule une réservation"""
     supabase = get_supabase()
-    supabase.table("bookings").update({
+    result = supabase.table("bookings").update({
         "status": "cancelled",
         "cancelled_at": datetime.now().isoformat(),
         "cancel_reason": reason
     }).eq("id", booking_id).execute()
+    _bookings_changed(result.data)
+
+@instrumented
+def approve_bookings(booking_ids):
+    """Confirme en une requête les réservations en attente parmi `booking_ids` ; retourne les lignes modifiées"""
+    if not booking_ids:
+        return []
+    supabase = get_supabase()
+    result = supabase.table("bookings").update({"status": "confirmed"}) \
+        .in_("id", list(booking_ids)) \
+        .eq("status", "pending") \
+        .execute()
+    _bookings_changed(result.data)
+    return result.data
 
+@instrumented
+def cancel_bookings(booking_ids, reason: str = ""):
+    """Annule en une requête les réservations actives parmi `booking_ids` ; retourne les lignes modifiées"""
+    if not booking_ids:
+        return []
+    supabase = get_supabase()
+    result = supabase.table("bookings").update({
+        "status": "cancelled",
+        "cancelled_at": datetime.now().isoformat(),
+        "cancel_reason": reason
+    }).in_("id", list(booking_ids)) \
+        .in_("status", ["confirmed", "pending"]) \
+        .execute()
+    _bookings_changed(result.data)
+    return result.data
+
+@instrumented
 def cancel_booking_by_token(token: str, reason: str = ""):
     """Annule une réservation par son token"""
     supabase = get_supabase()
-    supabase.table("bookings").update({
+    result = supabase.table("bookings").update({
         "status": "cancelled",
         "cancelled_at": datetime.now().isoformat(),
         "cancel_reason": reason
     }).eq("cancel_token", token).execute()
+    _bookings_changed(result.data)
 
 # ============================================
 # STATISTIQUES
 # ============================================
 
+# Les compteurs du dashboard peuvent avoir quelques secondes de retard
+STATS_CACHE_TTL = 30
+
+@cached("bookings", "event_types", ttl=STATS_CACHE_TTL)
+@instrumented
 def get_stats():
-    """Récupère les statistiques globales"""
+    """Récupère les statistiques globales en une requête (fonction SQL get_booking_stats)"""
     supabase = get_supabase()
+    result = supabase.rpc("get_booking_stats", {"p_today": date.today().isoformat()}).execute()
+    stats = result.data or {}
 
-    # Total réservations
-    total = supabase.table("bookings").select("id", count="exact").execute()
-
-    # Confirmées
-    confirmed = supabase.table("bookings")\
-        .select("id", count="exact")\
-        .eq("status", "confirmed")\
-        .execute()
-
-    # À venir
-    upcoming = supabase.table("bookings")\
-        .select("id", count="exact")\
-        .eq("status", "confirmed")\
-        .gte("date", date.today().isoformat())\
-        .execute()
+    return {
+        "total": stats.get("total") or 0,
+        "confirmed": stats.get("confirmed") or 0,
+        "upcoming": stats.get("upcoming") or 0,
+        "cancelled": stats.get("cancelled") or 0,
+        "event_types": stats.get("event_types") or 0
+    }
 
-    # Annulées
-    cancelled = supabase.table("bookings")\
-        .select("id", count="exact")\
-        .eq("status", "cancelled")\
-        .execute()
+# ============================================
+# CLÔTURE DES RÉSERVATIONS PASSÉES
+# ============================================
 
-    # Types d'événements actifs
-    event_types = supabase.table("event_types")\
-        .select("id", count="exact")\
-        .eq("is_active", True)\
-        .execute()
+@instrumented
+def complete_past_bookings(batch_size: int = 500, max_batches: int = 200):
+    """Passe en "completed" les réservations confirmées terminées, lot par lot (fonction SQL
+    complete_past_bookings, une transaction courte par lot).
 
-    return {
-        "total": total.count or 0,
-        "confirmed": confirmed.count or 0,
-        "upcoming": upcoming.count or 0,
-        "cancelled": cancelled.count or 0,
-        "event_types": event_types.count or 0
-    }
+    S'arrête dès qu'un lot est incomplet, ou si un autre réplica détient le verrou : celui-ci
+    ne couvre qu'un lot (pg_try_advisory_xact_lock), deux passages peuvent donc alterner leurs lots.
+    """
+    supabase = get_supabase()
+    now = datetime.now()
+    params = {"p_today": now.date().isoformat(), "p_now": now.strftime("%H:%M:%S"), "p_batch_size": batch_size}
+    completed = 0
+    batches = 0
+    locked_elsewhere = False
+    while batches < max_batches:
+        count = supabase.rpc("complete_past_bookings", params).execute().data
+        if count is None:
+            locked_elsewhere = True
+            break
+        batches += 1
+        completed += count
+        if count < batch_size:
+            break
+    if completed:
+        # Jours passés : aucun créneau proposé ne change, seules les listes et statistiques
+        invalidate_cache("bookings")
+    return {"completed": completed, "batches": batches, "locked_elsewhere": locked_elsewhere}
 
 # ============================================
 # UTILITAIRES DE CRÉNEAUX
 # ============================================
 
-def generate_time_slots(start_time: str, end_time: str, duration: int = 30):
-    """Génère les créneaux horaires disponibles"""
-    slots = []
+# Les créneaux sont manipulés en minutes depuis minuit ; les libellés "HH:MM"
+# ne sont construits qu'à l'affichage, à partir d'une table précalculée.
+_MINUTE_LABELS = [f"{m // 60:02d}:{m % 60:02d}" for m in range(24 * 60 + 1)]
 
-    # Parse les heures
-    start = datetime.strptime(start_time, "%H:%M:%S" if ":" in start_time and start_time.count(":") == 2 else "%H:%M")
-    end = datetime.strptime(end_time, "%H:%M:%S" if ":" in end_time and end_time.count(":") == 2 else "%H:%M")
+def time_to_minutes(value: str) -> int:
+    """Convertit "HH:MM" ou "HH:MM:SS" en minutes depuis minuit"""
+    return int(value[0:2]) * 60 + int(value[3:5])
 
-    current = start
-    while current + timedelta(minutes=duration) <= end:
-        slot_end = current + timedelta(minutes=duration)
+def minutes_to_time(minutes: int) -> str:
+    """Convertit des minutes depuis minuit en libellé HH:MM"""
+    return _MINUTE_LABELS[minutes]
+
+def slot_starts(start_minute: int, end_minute: int, duration: int) -> range:
+    """Débuts (en minutes) des créneaux de `duration` minutes tenant dans [start_minute, end_minute]"""
+    return range(start_minute, end_minute - duration + 1, duration)
+
+def format_slots(starts, duration: int):
+    """Construit les créneaux affichables à partir de leurs débuts en minutes"""
+    slots = []
+    for start in starts:
+        start_label = _MINUTE_LABELS[start]
+        end_label = _MINUTE_LABELS[start + duration]
         slots.append({
-            "start": current.strftime("%H:%M"),
-            "end": slot_end.strftime("%H:%M"),
-            "display": f"{current.strftime('%H:%M')} - {slot_end.strftime('%H:%M')}"
+            "start": start_label,
+            "end": end_label,
+            "display": f"{start_label} - {end_label}"
         })
-        current = slot_end
-
     return slots
 
-def get_available_slots(selected_date: date, event_type_id: int):
-    """Récupère les créneaux disponibles pour une date et un type d'événement"""
-    event_type = get_event_type_by_id(event_type_id)
-    if not event_type:
-        return []
-
-    duration = event_type["duration"]
-    day_of_week = selected_date.weekday()
+def generate_time_slots(start_time: str, end_time: str, duration: int = 30):
+    """Génère les créneaux horaires disponibles"""
+    return format_slots(slot_starts(time_to_minutes(start_time), time_to_minutes(end_time), duration), duration)
+
+class BookingIntervalIndex:
+    """Index trié des intervalles occupés d'une journée, en minutes.
+
+    Les intervalles sont triés par début et on garde le maximum cumulé des fins :
+    un intervalle [start, end) chevauche une réservation si, parmi celles qui
+    commencent avant `end`, la plus tardive se termine après `start` (O(log n)).
+    """
+
+    def __init__(self, intervals):
+        intervals = sorted(intervals)
+        self._starts = [start for start, _ in intervals]
+        self._max_ends = list(accumulate((end for _, end in intervals), max))
+
+    def __len__(self):
+        return len(self._starts)
+
+    def overlaps(self, start: int, end: int) -> bool:
+        i = bisect_left(self._starts, end)
+        return i > 0 and self._max_ends[i - 1] > start
+
+def generate_slots_batch(event_types, start_date: date, end_date: date):
+    """Génère en un appel les débuts de créneaux (en minutes) de plusieurs types d'événements sur une période.
+
+    Retourne {(event_type_id, date): [minutes, ...]} sans tenir compte des réservations.
+    Les plages d'ouverture sont calculées une fois par jour et les créneaux une fois par
+    couple (plages, durée), puis partagés entre tous les types d'événements concernés.
+    """
+    snapshot = AvailabilitySnapshot.from_rows(
+        None, [], get_availability(), get_date_overrides(), [], [], start_date, end_date
+    )
+    allowed_by_event = {}
+    for event_type in event_types:
+        if event_type.get("use_specific_dates"):
+            allowed_by_event[event_type["id"]] = {d["date"] for d in get_event_type_dates(event_type["id"])}
+
+    starts_cache = {}
+    batch = {}
+    current = start_date
+    while current <= end_date:
+        windows = tuple(snapshot.open_windows(current))
+        for event_type in event_types:
+            allowed = allowed_by_event.get(event_type["id"])
+            if allowed is not None and current.isoformat() not in allowed:
+                batch[(event_type["id"], current)] = []
+                continue
+            key = (windows, event_type["duration"])
+            if key not in starts_cache:
+                starts_cache[key] = [m for start, end in windows for m in slot_starts(start, end, event_type["duration"])]
+            batch[(event_type["id"], current)] = starts_cache[key]
+        current += timedelta(days=1)
+    return batch
 
-    # Si l'événement utilise des dates spécifiques, vérifier que la date en fait partie
-    if event_type.get("use_specific_dates"):
-        specific_dates = get_event_type_dates(event_type_id)
-        allowed_dates = [d["date"] for d in specific_dates]
-        if selected_date.isoformat() not in allowed_dates:
-            return []
+# ============================================
+# SNAPSHOT DE DISPONIBILITÉ
+# ============================================
 
-    # Vérifier les exceptions de date
-    override = get_date_override(selected_date)
-    if override:
-        if not override["is_available"]:
-            return []
-        if override["start_time"] and override["end_time"]:
-            availability = [{
-                "start_time": override["start_time"],
-                "end_time": override["end_time"]
-            }]
+class AvailabilitySnapshot:
+    """Photographie des données de disponibilité d'un type d'événement sur une fenêtre de dates.
+
+    Toutes les lectures sont faites une seule fois au chargement (type d'événement avec ses
+    dates spécifiques, horaires hebdomadaires, exceptions, réservations et blocages de la
+    fenêtre), puis `is_date_available` et `get_available_slots` répondent en mémoire.
+    Tous les types d'événements partagent le même agenda : une réservation de n'importe quel
+    type (buffers compris) bloque les créneaux qu'elle chevauche, comme le contrôlent la
+    contrainte bookings_no_overlap et la fonction SQL slot_conflict sous le verrou du jour.
+    Les créneaux bloqués par des invités en train de réserver (`holds`) sont traités comme
+    des réservations, sans compter dans le maximum journalier. Celui-ci compte, comme la
+    fonction SQL book_slot, les réservations confirmées et en attente.
+
+    Avec un cache partagé (utils/shared_cache.py), `versions` sont les versions lues avant
+    les réservations et `shared_starts` les créneaux libres déjà calculés par un autre
+    processus ; les jours calculés ici y sont ajoutés, sauf si la configuration lue dans
+    le cache local est antérieure à la version globale (`_config_is_current`).
+    """
+
+    def __init__(self, event_type, start_date: date, end_date: date,
+                 weekly_availability, overrides, bookings, buffers_by_event_type=None,
+                 versions=None, shared_starts=None, holds=None):
+        self.event_type = event_type
+        self.start_date = start_date
+        self.end_date = end_date
+        self._versions = versions if event_type else None
+        self._shared_starts = dict(shared_starts or {})
+
+        self.allowed_dates = None
+        if event_type and event_type.get("use_specific_dates"):
+            self.allowed_dates = {d["date"] for d in event_type.get("event_type_dates") or []}
+
+        # Plages horaires pré-converties en minutes
+        self.availability_by_day = {}
+        for avail in weekly_availability:
+            self.availability_by_day.setdefault(avail["day_of_week"], []).append(
+                (time_to_minutes(avail["start_time"]), time_to_minutes(avail["end_time"]))
+            )
+
+        self.overrides = {o["date"]: o for o in overrides}
+
+        # Réservations et blocages par jour, en minutes ; les index sont construits à la demande
+        self.bookings_by_date = {}
+        for booking in list(bookings) + list(holds or []):
+            self.bookings_by_date.setdefault(booking["date"], []).append((
+                time_to_minutes(booking["start_time"]),
+                time_to_minutes(booking["end_time"]),
+                booking["event_type_id"]
+            ))
+        # Premier blocage à expirer par jour : le résultat partagé ne doit pas lui survivre
+        self.holds_expire_at = {}
+        for hold in holds or []:
+            expires_at = datetime.fromisoformat(hold["expires_at"]).timestamp()
+            self.holds_expire_at[hold["date"]] = min(expires_at, self.holds_expire_at.get(hold["date"], expires_at))
+        # Nombre de réservations par (jour, type d'événement), pour max_bookings_per_day : compté sur
+        # les lignes déjà lues pour les chevauchements (confirmées et en attente, comme book_slot ;
+        # les blocages ne comptent pas), plutôt que par une requête groupée supplémentaire
+        self.daily_counts = Counter((booking["date"], booking["event_type_id"]) for booking in bookings)
+        self._buffers = buffers_by_event_type or {}
+        self._day_indexes = {}
+
+    @classmethod
+    def from_rows(cls, event_type, event_type_dates, availability, overrides, bookings, event_types,
+                  start_date: date, end_date: date, versions=None, shared_starts=None, holds=None):
+        """Construit la photographie à partir de lignes déjà lues (tables complètes, filtrées ici)"""
+        start_iso, end_iso = start_date.isoformat(), end_date.isoformat()
+
+        if event_type and event_type.get("use_specific_dates"):
+            event_type = dict(event_type, event_type_dates=[
+                d for d in event_type_dates if start_iso <= d["date"] <= end_iso
+            ])
+
+        weekly = [a for a in availability if a["is_active"]]
+        overrides = [o for o in overrides if start_iso <= o["date"] <= end_iso]
+        buffers = {
+            e["id"]: (e.get("buffer_before") or 0, e.get("buffer_after") or 0)
+            for e in event_types
+        }
+
+        if versions is not None and not _config_is_current(versions):
+            versions = None
+        return cls(event_type, start_date, end_date, weekly, overrides, bookings, buffers,
+                   versions, shared_starts, holds)
+
+    @staticmethod
+    def shared_lookup(event_type_id, start_date: date, end_date: date):
+        """(versions, créneaux déjà calculés, complet) de la fenêtre dans le cache partagé.
+
+        À appeler avant de lire les réservations. `complet` indique que tous les jours sont en
+        cache et que les réservations n'ont pas besoin d'être lues ; (None, {}, False) sans cache.
+        """
+        shared = get_availability_cache()
+        if shared is None or event_type_id is None:
+            return None, {}, False
+        dates = [(start_date + timedelta(days=i)).isoformat() for i in range((end_date - start_date).days + 1)]
+        versions = shared.versions(dates)
+        if versions is None:
+            return None, {}, False
+        shared_starts = shared.get_many(event_type_id, versions, dates)
+        return versions, shared_starts, len(shared_starts) == len(dates)
+
+    @classmethod
+    def load(cls, event_type_id, start_date: date, end_date: date = None, with_slots: bool = True):
+        """Charge la fenêtre [start_date, end_date] en un lot de lectures, quel que soit le nombre de jours.
+
+        Le type d'événement, ses dates, les horaires et les exceptions viennent du cache ;
+        seuls les créneaux occupés de la fenêtre sont lus à chaque chargement (sauf si tous
+        les jours sont déjà dans le cache partagé, ou si `with_slots` est faux : la photographie
+        ne sert alors qu'à `is_date_available`).
+        """
+        end_date = end_date or start_date
+        if with_slots:
+            versions, shared_starts, complete = cls.shared_lookup(event_type_id, start_date, end_date)
         else:
-            availability = get_availability_for_day(day_of_week)
-    else:
-        availability = get_availability_for_day(day_of_week)
+            versions, shared_starts, complete = None, {}, True
+        bookings, holds = split_busy_slots([] if complete else get_busy_slots_between(start_date, end_date))
+
+        event_type = get_event_type_by_id(event_type_id) if event_type_id is not None else None
+        event_type_dates = []
+        if event_type and event_type.get("use_specific_dates"):
+            event_type_dates = get_event_type_dates(event_type_id)
+
+        return cls.from_rows(
+            event_type,
+            event_type_dates,
+            get_availability(),
+            get_date_overrides(),
+            bookings,
+            get_event_types(),
+            start_date,
+            end_date,
+            versions,
+            shared_starts,
+            holds
+        )
+
+    def _check_in_window(self, selected_date: date):
+        if not self.start_date <= selected_date <= self.end_date:
+            raise ValueError(f"{selected_date} hors de la fenêtre chargée ({self.start_date} - {self.end_date})")
+
+    def open_windows(self, selected_date: date):
+        """Plages horaires ouvertes (en minutes) pour une date, l'exception primant sur l'hebdomadaire"""
+        override = self.overrides.get(selected_date.isoformat())
+        if override:
+            if not override["is_available"]:
+                return []
+            if override["start_time"] and override["end_time"]:
+                return [(time_to_minutes(override["start_time"]), time_to_minutes(override["end_time"]))]
+        return self.availability_by_day.get(selected_date.weekday(), [])
+
+    def is_date_available(self, selected_date: date) -> bool:
+        """Vérifie si une date est disponible, en tenant compte des dates spécifiques de l'événement"""
+        self._check_in_window(selected_date)
+
+        if self.allowed_dates is not None and selected_date.isoformat() not in self.allowed_dates:
+            return False
 
-    # Générer tous les créneaux possibles
-    all_slots = []
-    for avail in availability:
-        slots = generate_time_slots(avail["start_time"], avail["end_time"], duration)
-        all_slots.extend(slots)
+        override = self.overrides.get(selected_date.isoformat())
+        if override:
+            return override["is_available"]
+
+        return len(self.availability_by_day.get(selected_date.weekday(), [])) > 0
+
+    def _booking_indexes(self, date_iso: str):
+        """Index des réservations du jour : intervalles bruts et intervalles étendus de leurs buffers"""
+        if date_iso not in self._day_indexes:
+            raw, buffered = [], []
+            for start, end, event_type_id in self.bookings_by_date.get(date_iso, []):
+                before, after = self._buffers.get(event_type_id, (0, 0))
+                raw.append((start, end))
+                buffered.append((start - before, end + after))
+            self._day_indexes[date_iso] = (BookingIntervalIndex(raw), BookingIntervalIndex(buffered))
+        return self._day_indexes[date_iso]
+
+    def get_free_slot_starts(self, selected_date: date):
+        """Débuts (en minutes) des créneaux libres pour une date de la fenêtre"""
+        self._check_in_window(selected_date)
+
+        date_iso = selected_date.isoformat()
+        starts = self._shared_starts.get(date_iso)
+        if starts is None:
+            starts = self._compute_free_slot_starts(selected_date)
+            if self._versions is not None:
+                expires_at = self.holds_expire_at.get(date_iso)
+                ttl = expires_at - time_module.time() if expires_at else None
+                get_availability_cache().set(self.event_type["id"], self._versions, date_iso, starts, ttl)
+                self._shared_starts[date_iso] = starts
+
+        # Filtrer les créneaux passés si c'est aujourd'hui
+        if selected_date == date.today():
+            now = datetime.now()
+            now_minute = now.hour * 60 + now.minute
+            starts = [m for m in starts if m > now_minute]
+
+        return starts
+
+    def _compute_free_slot_starts(self, selected_date: date):
+        """Créneaux libres d'une date, indépendamment de l'heure courante"""
+        if not self.event_type:
+            return []
 
-    # Retirer les créneaux déjà réservés
-    bookings = get_bookings_for_date(selected_date)
-    booked_times = set()
-    for booking in bookings:
-        booked_times.add(booking["start_time"][:5])  # Format HH:MM
+        if self.allowed_dates is not None and selected_date.isoformat() not in self.allowed_dates:
+            return []
 
-    available_slots = [s for s in all_slots if s["start"] not in booked_times]
+        # Jour complet pour ce type d'événement
+        max_per_day = self.event_type.get("max_bookings_per_day")
+        if max_per_day and self.daily_counts[(selected_date.isoformat(), self.event_type["id"])] >= max_per_day:
+            return []
 
-    # Filtrer les créneaux passés si c'est aujourd'hui
-    if selected_date == date.today():
-        now = datetime.now().strftime("%H:%M")
-        available_slots = [s for s in available_slots if s["start"] > now]
+        # Générer tous les créneaux possibles, sans ceux qui chevauchent une réservation :
+        # le créneau étendu de ses buffers ne doit pas toucher une réservation, et le créneau
+        # lui-même ne doit pas empiéter sur les buffers d'une réservation existante
+        duration = self.event_type["duration"]
+        before = self.event_type.get("buffer_before") or 0
+        after = self.event_type.get("buffer_after") or 0
+        raw_index, buffered_index = self._booking_indexes(selected_date.isoformat())
+        starts = [
+            m for start, end in self.open_windows(selected_date)
+            for m in slot_starts(start, end, duration)
+            if not raw_index.overlaps(m - before, m + duration + after)
+            and not buffered_index.overlaps(m, m + duration)
+        ]
+        return starts
+
+    def get_available_slots(self, selected_date: date):
+        """Créneaux disponibles pour une date de la fenêtre"""
+        return format_slots(self.get_free_slot_starts(selected_date), self.event_type["duration"] if self.event_type else 0)
+
+    def get_bookable_days(self):
+        """Nombre de créneaux libres pour chaque jour réservable de la fenêtre (jours complets exclus)"""
+        bookable = {}
+        current = self.start_date
+        while current <= self.end_date:
+            # Les jours fermés sont aussi calculés (liste vide) pour compléter le cache partagé
+            nb_slots = len(self.get_free_slot_starts(current))
+            if nb_slots and self.is_date_available(current):
+                bookable[current] = nb_slots
+            current += timedelta(days=1)
+        return bookable
+
+def get_booking_window(event_type):
+    """Retourne la fenêtre (première date, dernière date) réservable d'un type d'événement"""
+    min_notice = event_type.get("min_notice_hours", 24)
+    max_days = event_type.get("max_days_ahead", 60)
+
+    min_date = date.today() + timedelta(days=1)
+    if min_notice > 24:
+        min_date = date.today() + timedelta(hours=min_notice)
+    max_date = date.today() + timedelta(days=max_days)
+    return min_date, max_date
+
+def get_bookable_days(event_type_id: int, start_date: date, end_date: date):
+    """Calcule en un seul chargement les jours réservables et leur nombre de créneaux libres"""
+    snapshot = AvailabilitySnapshot.load(event_type_id, start_date, end_date)
+    return snapshot.get_bookable_days()
 
-    return available_slots
+def get_available_slots(selected_date: date, event_type_id: int):
+    """Récupère les créneaux disponibles pour une date et un type d'événement"""
+    snapshot = AvailabilitySnapshot.load(event_type_id, selected_date)
+    return snapshot.get_available_slots(selected_date)
 
 def is_date_available(selected_date: date, event_type=None) -> bool:
     """Vérifie si une date est disponible, en tenant compte des dates spécifiques de l'événement"""
-
-    # Si l'événement utilise des dates spécifiques, seules ces dates sont disponibles
-    if event_type and event_type.get("use_specific_dates"):
-        specific_dates = get_event_type_dates(event_type["id"])
-        allowed_dates = [d["date"] for d in specific_dates]
-        if selected_date.isoformat() not in allowed_dates:
-            return False
-
-    day_of_week = selected_date.weekday()
-
-    # Vérifier les exceptions
-    override = get_date_override(selected_date)
-    if override:
-        return override["is_available"]
-
-    # Vérifier les disponibilités normales
-    availability = get_availability_for_day(day_of_week)
-    return len(availability) > 0
+    snapshot = AvailabilitySnapshot.load(event_type["id"] if event_type else None, selected_date, with_slots=False)
+    return snapshot.is_date_available(selected_date)
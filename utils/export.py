@@ -0,0 +1,133 @@
+import csv
+import gzip
+import io
+import os
+import tempfile
+import time
+from datetime import date
+from utils.database import get_bookings_page
+
+# ============================================
+# EXPORT DES RÉSERVATIONS
+# ============================================
+# Les réservations sont lues page par page (pagination par clé) et écrites au fil
+# de l'eau : la mémoire utilisée dépend de la taille d'une page, pas du volume exporté.
+# Les fichiers sont écrits dans APEL_EXPORT_DIR ; ceux de plus de APEL_EXPORT_MAX_AGE
+# secondes (session fermée avant leur suppression) sont effacés au prochain export.
+# Streamlit garde en mémoire le fichier proposé au téléchargement : au-delà de
+# APEL_EXPORT_MAX_DOWNLOAD_MB, l'export n'est pas proposé.
+
+EXPORT_PAGE_SIZE = 1000
+EXPORT_DIR = os.environ.get("APEL_EXPORT_DIR", os.path.join(tempfile.gettempdir(), "apel-calendar", "exports"))
+EXPORT_MAX_AGE = int(os.environ.get("APEL_EXPORT_MAX_AGE", 3600))
+EXPORT_MAX_DOWNLOAD_BYTES = int(os.environ.get("APEL_EXPORT_MAX_DOWNLOAD_MB", 50)) * 1024 * 1024
+
+EXPORT_FORMATS = {
+    "csv": ("reservations.csv", "text/csv"),
+    "csv.gz": ("reservations.csv.gz", "application/gzip"),
+    "parquet": ("reservations.parquet", "application/vnd.apache.parquet"),
+}
+
+EXPORT_COLUMNS = ["Date", "Heure", "Type", "Nom", "Email", "Téléphone", "Statut", "Notes"]
+
+def _export_row(booking: dict) -> dict:
+    """Transforme une réservation en ligne d'export"""
+    event_info = booking.get("event_types") or {}
+    return {
+        "Date": booking["date"],
+        "Heure": f"{booking['start_time'][:5]} - {booking['end_time'][:5]}",
+        "Type": event_info.get("name", ""),
+        "Nom": booking["guest_name"],
+        "Email": booking["guest_email"],
+        "Téléphone": booking.get("guest_phone") or "",
+        "Statut": booking["status"],
+        "Notes": booking.get("guest_notes") or "",
+    }
+
+def iter_export_pages(start_date: date = None, end_date: date = None, event_type_id: int = None,
+                      status: str = None, page_size: int = EXPORT_PAGE_SIZE):
+    """Génère les lignes d'export page par page"""
+    after = None
+    while True:
+        bookings, after = get_bookings_page(
+            status=status, after=after, page_size=page_size,
+            start_date=start_date, end_date=end_date, event_type_id=event_type_id
+        )
+        if bookings:
+            yield [_export_row(b) for b in bookings]
+        if after is None:
+            return
+
+def iter_csv_chunks(pages):
+    """Génère le CSV (UTF-8) par morceaux d'octets, un morceau par page"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS, lineterminator="\n")
+    writer.writeheader()
+    for rows in pages:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+def _write_parquet(pages, output):
+    """Écrit les pages dans un fichier Parquet, un row group par page"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([(column, pa.string()) for column in EXPORT_COLUMNS])
+    with pq.ParquetWriter(output, schema) as writer:
+        for rows in pages:
+            writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+
+def export_bookings(fmt: str = "csv", start_date: date = None, end_date: date = None,
+                    event_type_id: int = None, status: str = None) -> str:
+    """Exporte les réservations filtrées dans un fichier de EXPORT_DIR et retourne son chemin.
+
+    `fmt` vaut "csv", "csv.gz" ou "parquet". Le fichier est à supprimer par l'appelant ;
+    à défaut, il l'est par un export ultérieur une fois EXPORT_MAX_AGE dépassé.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Format d'export inconnu : {fmt}")
+
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    purge_old_exports()
+    pages = iter_export_pages(start_date, end_date, event_type_id, status)
+    with tempfile.NamedTemporaryFile(suffix=f".{fmt}", dir=EXPORT_DIR, delete=False) as output:
+        try:
+            _write_export(fmt, pages, output)
+        except BaseException:
+            output.close()
+            os.remove(output.name)
+            raise
+    return output.name
+
+def purge_old_exports(max_age: int = EXPORT_MAX_AGE) -> int:
+    """Supprime les exports de plus de `max_age` secondes ; retourne le nombre de fichiers supprimés"""
+    removed = 0
+    limit = time.time() - max_age
+    try:
+        entries = list(os.scandir(EXPORT_DIR))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        try:
+            if entry.is_file() and entry.stat().st_mtime < limit:
+                os.remove(entry.path)
+                removed += 1
+        except FileNotFoundError:
+            pass  # supprimé entre-temps par une autre session
+    return removed
+
+def _write_export(fmt: str, pages, output):
+    """Écrit les pages dans `output` (fichier binaire) au format demandé"""
+    if fmt == "parquet":
+        _write_parquet(pages, output)
+    elif fmt == "csv.gz":
+        with gzip.GzipFile(fileobj=output, mode="wb") as compressed:
+            for chunk in iter_csv_chunks(pages):
+                compressed.write(chunk)
+    else:
+        for chunk in iter_csv_chunks(pages):
+            output.write(chunk)
@@ -0,0 +1,207 @@
+import contextvars
+import json
+import os
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from functools import wraps
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+# ============================================
+# INSTRUMENTATION DES ACCÈS AUX DONNÉES
+# ============================================
+# Chaque fonction de utils/database.py qui interroge Supabase est décorée par
+# @instrumented : durée, nombre de lignes et taille de la réponse sont journalisés,
+# avec la page, la session et le numéro de rerun en cours (voir start_rerun).
+# Les allers-retours sont comptés au niveau du client (count_request, appelé pour
+# chaque requête HTTP ou locale), une fonction pouvant en envoyer plusieurs.
+# La taille de la réponse (sérialisation JSON) n'est mesurée que pour une fraction
+# des appels (APEL_QUERY_SIZE_SAMPLE). Les lectures servies par le cache sont
+# journalisées à part (cache_hit). APEL_DIAGNOSTICS=0 désactive l'instrumentation.
+
+ENABLED = os.environ.get("APEL_DIAGNOSTICS", "1") != "0"
+QUERY_LOG_SIZE = int(os.environ.get("APEL_QUERY_LOG_SIZE", 5000))
+SIZE_SAMPLE_RATE = float(os.environ.get("APEL_QUERY_SIZE_SAMPLE", 0.1))
+MAX_TRACKED_SESSIONS = 1000
+OUTSIDE_SESSION = "(hors session)"
+OUTSIDE_FUNCTION = "(requête directe)"
+
+_lock = threading.Lock()
+_records = deque(maxlen=QUERY_LOG_SIZE)
+_reruns = OrderedDict()  # session_id -> (page, numéro de rerun)
+_scope = threading.local()  # requêtes envoyées par la fonction instrumentée en cours
+# Contexte Streamlit à utiliser hors du thread du script (boucle asyncio de utils/async_database.py)
+SCRIPT_CTX = contextvars.ContextVar("apel_script_ctx", default=None)
+
+def start_rerun(page: str):
+    """À appeler en tête de page : les requêtes suivantes sont attribuées à ce rerun"""
+    ctx = get_script_run_ctx(suppress_warning=True)
+    if ctx is None:
+        return
+    with _lock:
+        _, number = _reruns.pop(ctx.session_id, (page, 0))
+        _reruns[ctx.session_id] = (page, number + 1)
+        while len(_reruns) > MAX_TRACKED_SESSIONS:
+            _reruns.popitem(last=False)
+
+def _current_rerun():
+    """(page, session, rerun) du script appelant, y compris depuis un thread rattaché"""
+    ctx = SCRIPT_CTX.get() or get_script_run_ctx(suppress_warning=True)
+    if ctx is None:
+        return OUTSIDE_SESSION, None, None
+    with _lock:
+        page, number = _reruns.get(ctx.session_id, (OUTSIDE_SESSION, None))
+    return page, ctx.session_id, number
+
+def _payload(result):
+    """Nombre de lignes et taille JSON approximative (octets) d'un résultat ; taille None hors échantillon"""
+    if isinstance(result, tuple) and result and isinstance(result[0], list):
+        result = result[0]
+    if result is None:
+        rows = 0
+    elif isinstance(result, list):
+        rows = len(result)
+    else:
+        rows = 1
+    size = None
+    if random.random() < SIZE_SAMPLE_RATE:
+        try:
+            size = len(json.dumps(result, default=str))
+        except (TypeError, ValueError):
+            pass
+    return rows, size
+
+def count_request(*_):
+    """À appeler pour chaque requête envoyée à la base (hook du client HTTP, client local).
+
+    Attribue la requête à la fonction instrumentée en cours ; hors d'une telle fonction,
+    elle est journalisée comme requête directe.
+    """
+    requests = getattr(_scope, "requests", None)
+    if requests is not None:
+        _scope.requests = requests + 1
+    elif ENABLED:
+        record(OUTSIDE_FUNCTION, round_trips=1)
+
+def record(function: str, duration_ms: float = 0.0, rows: int = 0, size: int = None,
+           error: str = None, cache_hit: bool = False, round_trips: int = 0):
+    """Ajoute un appel au journal"""
+    page, session, rerun = _current_rerun()
+    entry = {
+        "at": datetime.now().isoformat(timespec="milliseconds"),
+        "function": function,
+        "page": page,
+        "session": session,
+        "rerun": rerun,
+        "duration_ms": duration_ms,
+        "round_trips": round_trips,
+        "rows": rows,
+        "bytes": size,
+        "cache_hit": cache_hit,
+        "error": error,
+    }
+    with _lock:
+        _records.append(entry)
+
+def instrumented(func):
+    """Journalise chaque appel de la fonction décorée, avec le nombre de requêtes qu'il a envoyées"""
+    if not ENABLED:
+        return func
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        outer = getattr(_scope, "requests", None)
+        _scope.requests = 0
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            record(func.__name__, (time.perf_counter() - start) * 1000, error=type(e).__name__,
+                   round_trips=_scope.requests)
+            raise
+        finally:
+            requests, _scope.requests = _scope.requests, outer
+        duration_ms = (time.perf_counter() - start) * 1000
+        rows, size = _payload(result)
+        record(func.__name__, duration_ms, rows, size, round_trips=requests)
+        return result
+    return wrapper
+
+def record_cache_hit(function: str):
+    """Journalise une lecture servie par le cache (aucun aller-retour)"""
+    if ENABLED:
+        record(function, cache_hit=True)
+
+# ============================================
+# LECTURE DU JOURNAL
+# ============================================
+
+def get_query_log():
+    """Copie du journal, du plus ancien au plus récent"""
+    with _lock:
+        return list(_records)
+
+def clear_query_log():
+    with _lock:
+        _records.clear()
+
+def summarize_reruns(records):
+    """Un résumé par rerun (page, session) : allers-retours, lectures en cache, durée et volume"""
+    reruns = OrderedDict()
+    for r in records:
+        if r["session"] is None:
+            continue
+        key = (r["session"], r["rerun"])
+        summary = reruns.setdefault(key, {
+            "page": r["page"],
+            "session": r["session"][:8],
+            "rerun": r["rerun"],
+            "started_at": r["at"],
+            "round_trips": 0,
+            "cache_hits": 0,
+            "duration_ms": 0.0,
+            "rows": 0,
+        })
+        if r["cache_hit"]:
+            summary["cache_hits"] += 1
+        else:
+            summary["round_trips"] += r["round_trips"]
+            summary["duration_ms"] += r["duration_ms"]
+            summary["rows"] += r["rows"]
+    return list(reruns.values())
+
+def summarize_functions(records):
+    """Un résumé par fonction : appels, allers-retours, taux de cache, durées et taille moyenne
+    des réponses (sur les appels mesurés)"""
+    functions = {}
+    for r in records:
+        summary = functions.setdefault(r["function"], {
+            "function": r["function"],
+            "calls": 0,
+            "round_trips": 0,
+            "cache_hits": 0,
+            "errors": 0,
+            "total_ms": 0.0,
+            "max_ms": 0.0,
+            "bytes": 0,
+            "sized": 0,
+        })
+        summary["calls"] += 1
+        if r["cache_hit"]:
+            summary["cache_hits"] += 1
+            continue
+        summary["round_trips"] += r["round_trips"]
+        summary["errors"] += r["error"] is not None
+        summary["total_ms"] += r["duration_ms"]
+        summary["max_ms"] = max(summary["max_ms"], r["duration_ms"])
+        if r["bytes"] is not None:
+            summary["bytes"] += r["bytes"]
+            summary["sized"] += 1
+    for summary in functions.values():
+        executed = summary["calls"] - summary["cache_hits"]
+        summary["cache_hit_ratio"] = summary["cache_hits"] / summary["calls"]
+        summary["mean_ms"] = summary["total_ms"] / executed if executed else 0.0
+        summary["mean_bytes"] = summary["bytes"] // summary["sized"] if summary["sized"] else None
+    return sorted(functions.values(), key=lambda s: s["total_ms"], reverse=True)
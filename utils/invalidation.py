@@ -0,0 +1,188 @@
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# ============================================
+# BUS D'INVALIDATION ENTRE RÉPLICAS
+# ============================================
+# Chaque réplica garde son propre cache mémoire (utils/database.py). Après une écriture,
+# invalidate_cache() publie les tables modifiées sur un canal partagé ; les autres
+# réplicas reçoivent le message et suppriment uniquement les entrées de ces tables.
+# La publication se fait dans un thread dédié : l'écriture ne l'attend pas, et les
+# invalidations en attente sont regroupées en un seul message.
+#
+#   APEL_INVALIDATION=postgres  LISTEN/NOTIFY via une connexion directe (DATABASE_URL, psycopg)
+#   (non défini)                pas de bus : chaque réplica s'appuie sur le TTL du cache
+#
+# InProcessChannel relie plusieurs bus d'un même processus, pour simuler des réplicas
+# dans les tests (un bus ignore ses propres messages : seul, il ne reçoit rien).
+
+CHANNEL_NAME = os.environ.get("APEL_INVALIDATION_CHANNEL", "apel_cache")
+RECONNECT_DELAY = 5
+
+class InProcessChannel:
+    """Canal en mémoire : plusieurs bus branchés dessus se comportent comme plusieurs réplicas (tests)"""
+
+    def __init__(self):
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def publish(self, payload: str):
+        with self._lock:
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener(payload)
+
+    def listen(self, listener, on_reconnect=None):
+        with self._lock:
+            self._listeners.append(listener)
+
+class PostgresChannel:
+    """Canal Postgres LISTEN/NOTIFY (nécessite psycopg et une connexion directe à la base)"""
+
+    def __init__(self, dsn: str, name: str = CHANNEL_NAME):
+        import psycopg
+        self._psycopg = psycopg
+        self.dsn = dsn
+        self.name = name
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def publish(self, payload: str):
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._conn is None or self._conn.closed:
+                        self._conn = self._psycopg.connect(self.dsn, autocommit=True)
+                    self._conn.execute("SELECT pg_notify(%s, %s)", (self.name, payload))
+                    return
+                except self._psycopg.OperationalError:
+                    self._conn = None
+                    if attempt:
+                        raise
+
+    def listen(self, listener, on_reconnect=None):
+        threading.Thread(
+            target=self._listen_forever, args=(listener, on_reconnect),
+            name="apel-cache-listen", daemon=True
+        ).start()
+
+    def _listen_forever(self, listener, on_reconnect):
+        """Écoute le canal ; après une coupure, `on_reconnect` signale les messages perdus"""
+        from psycopg import sql
+        connected_once = False
+        while True:
+            try:
+                with self._psycopg.connect(self.dsn, autocommit=True) as conn:
+                    conn.execute(sql.SQL("LISTEN {}").format(sql.Identifier(self.name)))
+                    if connected_once and on_reconnect:
+                        on_reconnect()
+                    connected_once = True
+                    for notify in conn.notifies():
+                        listener(notify.payload)
+            except Exception:
+                logger.warning("Écoute des invalidations interrompue, reconnexion", exc_info=True)
+                time.sleep(RECONNECT_DELAY)
+
+class InvalidationBus:
+    """Publie les tables modifiées et transmet celles modifiées par les autres réplicas"""
+
+    def __init__(self, channel):
+        self.channel = channel
+        self.origin = uuid.uuid4().hex
+        self.published = 0
+        self.received = 0
+        self.failed = 0
+        self._handlers = []
+        self._pending = []
+        self._sending = False
+        self._condition = threading.Condition()
+        channel.listen(self._on_message, self._on_reconnect)
+        threading.Thread(target=self._publish_forever, name="apel-cache-publish", daemon=True).start()
+
+    def subscribe(self, handler):
+        """`handler(tables)` est appelé pour chaque invalidation distante ; () signifie tout"""
+        self._handlers.append(handler)
+
+    def publish(self, tables):
+        """Met les tables en file pour publication, sans attendre le canal"""
+        with self._condition:
+            self._pending.append(tuple(tables))
+            self._condition.notify_all()
+
+    def flush(self, timeout: float = None) -> bool:
+        """Attend que les invalidations en file soient publiées (False si `timeout` est atteint)"""
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._pending and not self._sending, timeout)
+
+    def _publish_forever(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending)
+                batch, self._pending = self._pending, []
+                self._sending = True
+            # () invalide tout : il absorbe les autres tables du lot
+            tables = () if () in batch else sorted(set().union(*batch))
+            payload = json.dumps({"origin": self.origin, "tables": list(tables)})
+            try:
+                self.channel.publish(payload)
+                self.published += 1
+            except Exception:
+                # L'écriture a réussi : les autres réplicas se resynchroniseront au TTL
+                self.failed += 1
+                logger.warning("Publication de l'invalidation impossible (%s)", payload, exc_info=True)
+            with self._condition:
+                self._sending = False
+                self._condition.notify_all()
+
+    def _on_message(self, payload: str):
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            return
+        if message.get("origin") == self.origin:
+            return
+        self.received += 1
+        self._dispatch(tuple(message.get("tables") or ()))
+
+    def _on_reconnect(self):
+        # Des messages ont pu être perdus pendant la coupure : tout invalider
+        self._dispatch(())
+
+    def _dispatch(self, tables):
+        for handler in list(self._handlers):
+            handler(tables)
+
+    def stats(self):
+        return {
+            "channel": type(self.channel).__name__,
+            "published": self.published,
+            "received": self.received,
+            "failed": self.failed,
+            "pending": len(self._pending),
+        }
+
+def create_bus_from_env():
+    """Bus configuré par APEL_INVALIDATION, ou None"""
+    backend = os.environ.get("APEL_INVALIDATION", "")
+    if backend == "postgres":
+        return InvalidationBus(PostgresChannel(os.environ["DATABASE_URL"]))
+    return None
+
+_bus = None
+_bus_started = False
+_bus_lock = threading.Lock()
+
+def get_invalidation_bus():
+    """Bus du processus (créé et mis à l'écoute au premier appel), ou None"""
+    global _bus, _bus_started
+    with _bus_lock:
+        if not _bus_started:
+            _bus = create_bus_from_env()
+            _bus_started = True
+        return _bus
@@ -0,0 +1,758 @@
+import re
+import secrets
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime, time, timedelta, timezone
+from postgrest.exceptions import APIError
+from utils.instrumentation import count_request
+
+# ============================================
+# BACKEND LOCAL (SQLite)
+# ============================================
+# Implémentation locale du sous-ensemble du client Supabase utilisé par l'application :
+#   client.table(nom).select("*, event_types(name)", count="exact")
+#         .eq/.neq/.gt/.gte/.lt/.lte/.like/.ilike/.is_/.in_/.or_
+#         .order(col, desc=..., foreign_table=...).limit(n).execute()
+#   client.table(nom).insert/.update/.upsert/.delete(...)...execute()
+#   client.rpc(fonction, params).execute()
+# Le schéma reprend supabase_schema.sql (contraintes, valeurs par défaut, triggers) et les
+# fonctions SQL appelées en RPC sont réécrites en Python. Les erreurs sont levées en
+# APIError avec les mêmes codes que Postgres. Sert aux tests de charge et aux benchmarks
+# sans projet Supabase : APEL_BACKEND=local (base APEL_LOCAL_DB, en mémoire par défaut).
+
+_NOW = "(strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))"
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS settings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    admin_password TEXT NOT NULL DEFAULT 'admin123',
+    business_name TEXT DEFAULT 'Mon Entreprise',
+    business_email TEXT DEFAULT '',
+    business_phone TEXT DEFAULT '',
+    business_logo TEXT DEFAULT '',
+    welcome_message TEXT DEFAULT 'Bienvenue ! Choisissez un type de rendez-vous pour commencer.',
+    timezone TEXT DEFAULT 'Europe/Paris',
+    created_at TEXT DEFAULT {_NOW},
+    updated_at TEXT DEFAULT {_NOW}
+);
+
+CREATE TABLE IF NOT EXISTS event_types (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    slug TEXT NOT NULL UNIQUE,
+    description TEXT DEFAULT '',
+    duration INTEGER NOT NULL DEFAULT 30,
+    color TEXT DEFAULT '#3b82f6',
+    location TEXT DEFAULT '',
+    is_active INTEGER DEFAULT 1,
+    requires_approval INTEGER DEFAULT 0,
+    max_bookings_per_day INTEGER DEFAULT NULL,
+    buffer_before INTEGER DEFAULT 0,
+    buffer_after INTEGER DEFAULT 0,
+    min_notice_hours INTEGER DEFAULT 24,
+    max_days_ahead INTEGER DEFAULT 60,
+    use_specific_dates INTEGER DEFAULT 0,
+    created_at TEXT DEFAULT {_NOW},
+    updated_at TEXT DEFAULT {_NOW}
+);
+
+CREATE TABLE IF NOT EXISTS event_type_dates (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    event_type_id INTEGER NOT NULL REFERENCES event_types(id) ON DELETE CASCADE,
+    date TEXT NOT NULL,
+    created_at TEXT DEFAULT {_NOW},
+    UNIQUE(event_type_id, date)
+);
+
+CREATE TABLE IF NOT EXISTS availability (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    day_of_week INTEGER NOT NULL CHECK (day_of_week >= 0 AND day_of_week <= 6),
+    start_time TEXT NOT NULL,
+    end_time TEXT NOT NULL,
+    is_active INTEGER DEFAULT 1,
+    created_at TEXT DEFAULT {_NOW}
+);
+
+CREATE TABLE IF NOT EXISTS date_overrides (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    date TEXT NOT NULL UNIQUE,
+    is_available INTEGER DEFAULT 0,
+    start_time TEXT DEFAULT NULL,
+    end_time TEXT DEFAULT NULL,
+    reason TEXT DEFAULT '',
+    created_at TEXT DEFAULT {_NOW}
+);
+
+CREATE TABLE IF NOT EXISTS bookings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    event_type_id INTEGER REFERENCES event_types(id) ON DELETE CASCADE,
+    date TEXT NOT NULL,
+    start_time TEXT NOT NULL,
+    end_time TEXT NOT NULL,
+    guest_name TEXT NOT NULL,
+    guest_email TEXT NOT NULL,
+    guest_phone TEXT DEFAULT '',
+    guest_notes TEXT DEFAULT '',
+    status TEXT DEFAULT 'confirmed' CHECK (status IN ('confirmed', 'cancelled', 'pending', 'completed')),
+    cancel_token TEXT DEFAULT NULL,
+    cancelled_at TEXT DEFAULT NULL,
+    cancel_reason TEXT DEFAULT '',
+    created_at TEXT DEFAULT {_NOW},
+    updated_at TEXT DEFAULT {_NOW}
+);
+
+CREATE TABLE IF NOT EXISTS slot_holds (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    event_type_id INTEGER NOT NULL REFERENCES event_types(id) ON DELETE CASCADE,
+    date TEXT NOT NULL,
+    start_time TEXT NOT NULL,
+    end_time TEXT NOT NULL,
+    hold_token TEXT NOT NULL UNIQUE,
+    expires_at TEXT NOT NULL,
+    created_at TEXT DEFAULT {_NOW}
+);
+
+CREATE INDEX IF NOT EXISTS idx_bookings_date ON bookings(date);
+CREATE INDEX IF NOT EXISTS idx_bookings_status ON bookings(status);
+CREATE INDEX IF NOT EXISTS idx_bookings_event_type ON bookings(event_type_id);
+CREATE INDEX IF NOT EXISTS idx_bookings_email ON bookings(guest_email);
+CREATE INDEX IF NOT EXISTS idx_bookings_keyset ON bookings(date DESC, start_time DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_bookings_confirmed_date ON bookings(date, id) WHERE status = 'confirmed';
+CREATE INDEX IF NOT EXISTS idx_availability_day ON availability(day_of_week);
+CREATE INDEX IF NOT EXISTS idx_event_types_active ON event_types(is_active);
+CREATE INDEX IF NOT EXISTS idx_event_type_dates_event ON event_type_dates(event_type_id);
+CREATE INDEX IF NOT EXISTS idx_event_type_dates_date ON event_type_dates(date);
+CREATE INDEX IF NOT EXISTS idx_slot_holds_date ON slot_holds(date, expires_at);
+
+CREATE VIEW IF NOT EXISTS busy_slots AS
+    SELECT date, start_time, end_time, event_type_id, NULL AS expires_at
+    FROM bookings
+    WHERE status IN ('confirmed', 'pending')
+    UNION ALL
+    SELECT date, start_time, end_time, event_type_id, expires_at
+    FROM slot_holds
+    WHERE expires_at > strftime('%Y-%m-%dT%H:%M:%f', 'now');
+"""
+
+SEED = """
+INSERT INTO settings (admin_password, business_name) VALUES ('admin123', 'Mon Entreprise');
+
+INSERT INTO event_types (name, slug, description, duration, color) VALUES
+    ('Consultation 30 min', 'consultation-30', 'Consultation standard de 30 minutes', 30, '#3b82f6'),
+    ('Réunion 1 heure', 'reunion-1h', 'Réunion approfondie d''une heure', 60, '#10b981');
+
+INSERT INTO availability (day_of_week, start_time, end_time, is_active) VALUES
+    (0, '09:00:00', '12:00:00', 1), (0, '14:00:00', '18:00:00', 1),
+    (1, '09:00:00', '12:00:00', 1), (1, '14:00:00', '18:00:00', 1),
+    (2, '09:00:00', '12:00:00', 1), (2, '14:00:00', '18:00:00', 1),
+    (3, '09:00:00', '12:00:00', 1), (3, '14:00:00', '18:00:00', 1),
+    (4, '09:00:00', '12:00:00', 1), (4, '14:00:00', '18:00:00', 1),
+    (5, '09:00:00', '12:00:00', 0), (6, '09:00:00', '12:00:00', 0);
+"""
+
+# Colonnes typées (SQLite ne connaît ni BOOLEAN ni TIME)
+BOOLEAN_COLUMNS = {"is_active", "requires_approval", "use_specific_dates", "is_available"}
+TIME_COLUMNS = {"start_time", "end_time"}
+TABLES_WITH_UPDATED_AT = {"settings", "event_types", "bookings"}
+
+# (table, table embarquée) -> colonne de clé étrangère
+FOREIGN_KEYS = {
+    ("bookings", "event_types"): "event_type_id",
+    ("event_type_dates", "event_types"): "event_type_id",
+}
+
+ACTIVE_BOOKING_STATUSES = ("confirmed", "pending")
+
+_OPERATORS = {"eq": "=", "neq": "!=", "gt": ">", "gte": ">=", "lt": "<", "lte": "<=", "like": "LIKE", "ilike": "LIKE"}
+
+_SQLITE_ERROR_CODES = [
+    ("UNIQUE constraint failed", "23505"),
+    ("FOREIGN KEY constraint failed", "23503"),
+    ("CHECK constraint failed", "23514"),
+    ("NOT NULL constraint failed", "23502"),
+]
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+def _minutes(value: str) -> int:
+    """"HH:MM" ou "HH:MM:SS" en minutes depuis minuit"""
+    return int(value[0:2]) * 60 + int(value[3:5])
+
+def _to_db(column: str, value):
+    """Convertit une valeur Python ou une valeur de filtre texte vers le stockage SQLite"""
+    if value is None:
+        return None
+    if column in BOOLEAN_COLUMNS:
+        if isinstance(value, str):
+            return 1 if value.lower() == "true" else 0
+        return 1 if value else 0
+    if column in TIME_COLUMNS:
+        if isinstance(value, time):
+            return value.strftime("%H:%M:%S")
+        value = str(value)
+        return value + ":00" if len(value) == 5 else value
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+def _from_db(row: dict) -> dict:
+    for column in BOOLEAN_COLUMNS.intersection(row):
+        if row[column] is not None:
+            row[column] = bool(row[column])
+    return row
+
+def _api_error(code: str, message: str) -> APIError:
+    return APIError({"code": code, "message": message, "details": None, "hint": None})
+
+def _translate_integrity_error(error: sqlite3.IntegrityError) -> APIError:
+    for prefix, code in _SQLITE_ERROR_CODES:
+        if str(error).startswith(prefix):
+            return _api_error(code, str(error))
+    return _api_error("23000", str(error))
+
+def _split_top_level(text: str):
+    """Découpe sur les virgules hors parenthèses et hors guillemets"""
+    parts, depth, quoted, current = [], 0, False, []
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if quoted:
+            current.append(char)
+            if char == "\\" and i + 1 < len(text):
+                current.append(text[i + 1])
+                i += 1
+            elif char == '"':
+                quoted = False
+        elif char == '"':
+            quoted = True
+            current.append(char)
+        elif char == "(":
+            depth += 1
+            current.append(char)
+        elif char == ")":
+            depth -= 1
+            current.append(char)
+        elif char == "," and depth == 0:
+            parts.append("".join(current).strip())
+            current = []
+        else:
+            current.append(char)
+        i += 1
+    if current:
+        parts.append("".join(current).strip())
+    return [p for p in parts if p]
+
+def _unquote(value: str) -> str:
+    if len(value) >= 2 and value[0] == '"' and value[-1] == '"':
+        return re.sub(r"\\(.)", r"\1", value[1:-1])
+    return value
+
+class LocalResponse:
+    """Réponse au format de postgrest (data, count)"""
+
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+class LocalQuery:
+    """Requête sur une table, construite par chaînage comme avec le client Supabase"""
+
+    def __init__(self, client, table: str):
+        self._client = client
+        self._table = table
+        self._action = "select"
+        self._columns = "*"
+        self._count = None
+        self._payload = None
+        self._on_conflict = ""
+        self._ignore_duplicates = False
+        self._where = []
+        self._orders = []
+        self._embedded_orders = {}
+        self._limit = None
+
+    # --- actions ---
+
+    def select(self, *columns, count=None, head=None):
+        self._action = "select"
+        self._columns = ",".join(columns) or "*"
+        self._count = count
+        return self
+
+    def insert(self, json, *, count=None, returning=None, upsert=False, default_to_null=True):
+        self._action = "upsert" if upsert else "insert"
+        self._payload = json
+        return self
+
+    def upsert(self, json, *, count=None, returning=None, ignore_duplicates=False, on_conflict="", default_to_null=True):
+        self._action = "upsert"
+        self._payload = json
+        self._on_conflict = on_conflict
+        self._ignore_duplicates = ignore_duplicates
+        return self
+
+    def update(self, json, *, count=None, returning=None):
+        self._action = "update"
+        self._payload = json
+        return self
+
+    def delete(self, *, count=None, returning=None):
+        self._action = "delete"
+        return self
+
+    # --- filtres ---
+
+    def _column(self, column: str) -> str:
+        if column not in self._client.columns(self._table):
+            raise _api_error("42703", f"column {self._table}.{column} does not exist")
+        return column
+
+    def _condition(self, column: str, operator: str, value):
+        column = self._column(column)
+        if operator in ("like", "ilike"):
+            return f"{column} LIKE ?", [str(value).replace("*", "%")]
+        if operator == "is":
+            keyword = {"null": "NULL", "true": "1", "false": "0"}[str(value).lower() if value is not None else "null"]
+            return (f"{column} IS NULL", []) if keyword == "NULL" else (f"{column} = {keyword}", [])
+        if operator == "in":
+            values = list(value)
+            if not values:
+                return "0", []
+            return f"{column} IN ({','.join('?' * len(values))})", [_to_db(column, v) for v in values]
+        if operator not in _OPERATORS:
+            raise _api_error("PGRST100", f"unsupported operator {operator}")
+        return f"{column} {_OPERATORS[operator]} ?", [_to_db(column, value)]
+
+    def _add(self, column, operator, value):
+        self._where.append(self._condition(column, operator, value))
+        return self
+
+    def eq(self, column, value):
+        return self._add(column, "eq", value)
+
+    def neq(self, column, value):
+        return self._add(column, "neq", value)
+
+    def gt(self, column, value):
+        return self._add(column, "gt", value)
+
+    def gte(self, column, value):
+        return self._add(column, "gte", value)
+
+    def lt(self, column, value):
+        return self._add(column, "lt", value)
+
+    def lte(self, column, value):
+        return self._add(column, "lte", value)
+
+    def like(self, column, pattern):
+        return self._add(column, "like", pattern)
+
+    def ilike(self, column, pattern):
+        return self._add(column, "ilike", pattern)
+
+    def is_(self, column, value):
+        return self._add(column, "is", value)
+
+    def in_(self, column, values):
+        return self._add(column, "in", values)
+
+    def or_(self, filters: str, reference_table=None):
+        self._where.append(self._logic("or", filters))
+        return self
+
+    def _logic(self, operator: str, body: str):
+        """Compile un arbre logique PostgREST : a.eq.1,and(b.lt.2,or(c.ilike.*x*))"""
+        clauses, params = [], []
+        for item in _split_top_level(body):
+            match = re.match(r"^(and|or)\((.*)\)$", item, re.S)
+            if match:
+                sql, item_params = self._logic(match.group(1), match.group(2))
+            else:
+                column, op, value = item.split(".", 2)
+                if op == "in":
+                    value = [_unquote(v) for v in _split_top_level(value.strip("()"))]
+                else:
+                    value = _unquote(value)
+                sql, item_params = self._condition(column, op, value)
+            clauses.append(f"({sql})")
+            params.extend(item_params)
+        return f" {operator.upper()} ".join(clauses) or "1", params
+
+    def order(self, column, *, desc=False, nullsfirst=None, foreign_table=None):
+        if foreign_table:
+            self._embedded_orders.setdefault(foreign_table, []).append((column, desc))
+        else:
+            self._orders.append((self._column(column), desc))
+        return self
+
+    def limit(self, size: int, *, foreign_table=None):
+        self._limit = size
+        return self
+
+    # --- exécution ---
+
+    def _where_sql(self):
+        if not self._where:
+            return "", []
+        params = [p for _, clause_params in self._where for p in clause_params]
+        return " WHERE " + " AND ".join(f"({sql})" for sql, _ in self._where), params
+
+    def execute(self):
+        return self._client.run(self)
+
+    def _run_select(self, conn):
+        where, params = self._where_sql()
+        sql = f"SELECT * FROM {self._table}{where}"
+        if self._orders:
+            sql += " ORDER BY " + ", ".join(f"{c} {'DESC' if d else 'ASC'}" for c, d in self._orders)
+        if self._limit is not None:
+            sql += f" LIMIT {int(self._limit)}"
+        rows = [_from_db(dict(r)) for r in conn.execute(sql, params)]
+
+        columns, embeds = self._parse_select()
+        for relation, relation_columns in embeds:
+            self._embed(conn, rows, relation, relation_columns)
+        if columns != ["*"]:
+            keep = set(columns) | {relation for relation, _ in embeds}
+            rows = [{k: v for k, v in row.items() if k in keep} for row in rows]
+
+        count = None
+        if self._count:
+            count = conn.execute(f"SELECT COUNT(*) FROM {self._table}{where}", params).fetchone()[0]
+        return LocalResponse(rows, count)
+
+    def _parse_select(self):
+        columns, embeds = [], []
+        for item in _split_top_level(self._columns):
+            match = re.match(r"^(\w+)(?:!\w+)?\((.*)\)$", item, re.S)
+            if match:
+                embeds.append((match.group(1), [c.strip() for c in match.group(2).split(",") if c.strip()]))
+            else:
+                columns.append(self._column(item) if item != "*" else item)
+        return columns or ["*"], embeds
+
+    def _embed(self, conn, rows, relation: str, relation_columns):
+        """Ressource embarquée : objet (clé étrangère locale) ou liste (clé étrangère distante)"""
+        def project(row):
+            return row if relation_columns == ["*"] else {c: row[c] for c in relation_columns}
+
+        if (self._table, relation) in FOREIGN_KEYS:
+            fk = FOREIGN_KEYS[(self._table, relation)]
+            ids = {row[fk] for row in rows if row.get(fk) is not None}
+            related = {r["id"]: project(r) for r in self._client.fetch_in(conn, relation, "id", ids)}
+            for row in rows:
+                row[relation] = related.get(row.get(fk))
+        elif (relation, self._table) in FOREIGN_KEYS:
+            fk = FOREIGN_KEYS[(relation, self._table)]
+            children = self._client.fetch_in(conn, relation, fk, {row["id"] for row in rows})
+            for column, desc in reversed(self._embedded_orders.get(relation, [])):
+                children.sort(key=lambda r: (r[column] is None, r[column]), reverse=desc)
+            grouped = {}
+            for child in children:
+                grouped.setdefault(child[fk], []).append(project(child))
+            for row in rows:
+                row[relation] = grouped.get(row["id"], [])
+        else:
+            raise _api_error("PGRST200", f"no relationship between {self._table} and {relation}")
+
+    def _prepare_rows(self):
+        rows = self._payload if isinstance(self._payload, list) else [self._payload]
+        prepared = []
+        for row in rows:
+            row = {self._column(k): _to_db(k, v) for k, v in row.items()}
+            if self._table == "bookings" and not row.get("cancel_token"):
+                row["cancel_token"] = secrets.token_hex(16)
+            prepared.append(row)
+        return prepared
+
+    def _run_insert(self, conn):
+        inserted = []
+        for row in self._prepare_rows():
+            if self._table == "bookings":
+                self._client.check_booking_overlap(conn, row)
+            columns = list(row)
+            sql = f"INSERT INTO {self._table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+            if self._action == "upsert":
+                target = self._on_conflict or "id"
+                if self._ignore_duplicates:
+                    sql += f" ON CONFLICT({target}) DO NOTHING"
+                else:
+                    updates = ", ".join(f"{c} = excluded.{c}" for c in columns if c != "id")
+                    sql += f" ON CONFLICT({target}) DO UPDATE SET {updates}"
+            sql += " RETURNING *"
+            inserted.extend(_from_db(dict(r)) for r in conn.execute(sql, [row[c] for c in columns]).fetchall())
+        return LocalResponse(inserted)
+
+    def _run_update(self, conn):
+        values = {self._column(k): _to_db(k, v) for k, v in self._payload.items()}
+        if self._table in TABLES_WITH_UPDATED_AT:
+            values["updated_at"] = _now_iso()
+        where, params = self._where_sql()
+        if self._table == "bookings":
+            for current in conn.execute(f"SELECT * FROM bookings{where}", params).fetchall():
+                self._client.check_booking_overlap(conn, {**dict(current), **values}, exclude_id=current["id"])
+        assignments = ", ".join(f"{c} = ?" for c in values)
+        sql = f"UPDATE {self._table} SET {assignments}{where} RETURNING *"
+        rows = conn.execute(sql, list(values.values()) + params).fetchall()
+        return LocalResponse([_from_db(dict(r)) for r in rows])
+
+    def _run_delete(self, conn):
+        where, params = self._where_sql()
+        rows = conn.execute(f"DELETE FROM {self._table}{where} RETURNING *", params).fetchall()
+        return LocalResponse([_from_db(dict(r)) for r in rows])
+
+class LocalRpc:
+    def __init__(self, client, name: str, params: dict):
+        self._client = client
+        self._name = name
+        self._params = params or {}
+
+    def execute(self):
+        return self._client.run(self)
+
+class LocalClient:
+    """Client de données local, interchangeable avec le client Supabase pour l'application"""
+
+    def __init__(self, path: str = ":memory:", seed: bool = True):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        self._lock = threading.RLock()
+        self._advisory_locks = {}
+        self._columns = {}
+        self.round_trips = 0
+        with self._lock:
+            is_new = not self._conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'settings'"
+            ).fetchone()
+            self._conn.executescript(SCHEMA)
+            if is_new and seed:
+                self._conn.executescript(SEED)
+
+    def table(self, name: str) -> LocalQuery:
+        self.columns(name)
+        return LocalQuery(self, name)
+
+    def rpc(self, name: str, params: dict = None) -> LocalRpc:
+        if not hasattr(self, f"_rpc_{name}"):
+            raise _api_error("PGRST202", f"function {name} does not exist")
+        return LocalRpc(self, name, params)
+
+    def columns(self, table: str):
+        if table not in self._columns:
+            with self._lock:
+                names = {r["name"] for r in self._conn.execute(f"PRAGMA table_info({table})")}
+            if not names:
+                raise _api_error("42P01", f'relation "{table}" does not exist')
+            self._columns[table] = names
+        return self._columns[table]
+
+    @contextmanager
+    def try_advisory_lock(self, name: str):
+        """Équivalent de pg_try_advisory_xact_lock : produit False si le verrou est déjà pris.
+
+        Le verrou est propre au client (au processus) ; entre processus, BEGIN IMMEDIATE
+        sérialise déjà les transactions.
+        """
+        lock = self._advisory_locks.setdefault(name, threading.Lock())
+        acquired = lock.acquire(blocking=False)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                lock.release()
+
+    def run(self, request):
+        """Exécute une requête ou un appel RPC dans une transaction (un aller-retour)"""
+        with self._lock:
+            self.round_trips += 1
+            count_request()
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if isinstance(request, LocalRpc):
+                    result = LocalResponse(getattr(self, f"_rpc_{request._name}")(conn, **request._params))
+                else:
+                    result = getattr(request, f"_run_{'insert' if request._action == 'upsert' else request._action}")(conn)
+            except sqlite3.IntegrityError as e:
+                conn.execute("ROLLBACK")
+                raise _translate_integrity_error(e) from e
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            return result
+
+    def bulk_load(self, table: str, rows: list):
+        """Chargement de masse (jeux de données de test) : insertion directe, sans contrôle applicatif.
+
+        Toutes les lignes doivent avoir les mêmes clés.
+        """
+        if not rows:
+            return
+        columns = [c for c in rows[0] if c in self.columns(table)]
+        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(sql, ([_to_db(c, row[c]) for c in columns] for row in rows))
+            self._conn.execute("COMMIT")
+
+    def fetch_in(self, conn, table: str, column: str, values):
+        """Lignes de `table` dont `column` est dans `values` (par paquets)"""
+        values = list(values)
+        rows = []
+        for i in range(0, len(values), 900):
+            chunk = values[i:i + 900]
+            rows.extend(
+                _from_db(dict(r)) for r in conn.execute(
+                    f"SELECT * FROM {table} WHERE {column} IN ({','.join('?' * len(chunk))})", chunk
+                )
+            )
+        return rows
+
+    def check_booking_overlap(self, conn, row: dict, exclude_id=None):
+        """Équivalent de la contrainte d'exclusion bookings_no_overlap"""
+        if row.get("status", "confirmed") not in ACTIVE_BOOKING_STATUSES:
+            return
+        conflict = conn.execute(
+            """SELECT 1 FROM bookings
+               WHERE date = ? AND status IN ('confirmed', 'pending')
+                 AND start_time < ? AND end_time > ? AND id IS NOT ?
+               LIMIT 1""",
+            (row["date"], row["end_time"], row["start_time"], exclude_id)
+        ).fetchone()
+        if conflict:
+            raise _api_error(
+                "23P01", 'conflicting key value violates exclusion constraint "bookings_no_overlap"'
+            )
+
+    def slot_conflict(self, conn, event_type_id, date_iso: str, start_time: str, end_time: str,
+                      hold_token: str = ""):
+        """Équivalent de la fonction SQL slot_conflict : 'slot_taken', 'slot_held' ou None"""
+        buffers = {
+            r["id"]: (r["buffer_before"] or 0, r["buffer_after"] or 0)
+            for r in conn.execute("SELECT id, buffer_before, buffer_after FROM event_types")
+        }
+        before, after = buffers.get(int(event_type_id), (0, 0))
+        start, end = _minutes(start_time), _minutes(end_time)
+        busy = [("slot_taken", r) for r in conn.execute(
+            """SELECT event_type_id, start_time, end_time FROM bookings
+               WHERE date = ? AND status IN ('confirmed', 'pending')""",
+            (date_iso,)
+        )]
+        busy += [("slot_held", r) for r in conn.execute(
+            """SELECT event_type_id, start_time, end_time FROM slot_holds
+               WHERE date = ? AND expires_at > ? AND hold_token != ?""",
+            (date_iso, _now_iso(), hold_token or "")
+        )]
+        reasons = set()
+        for reason, r in busy:
+            busy_start, busy_end = _minutes(r["start_time"]), _minutes(r["end_time"])
+            busy_before, busy_after = buffers.get(r["event_type_id"], (0, 0))
+            if (busy_start < end + after and busy_end > start - before) \
+                    or (busy_start - busy_before < end and busy_end + busy_after > start):
+                reasons.add(reason)
+        if "slot_taken" in reasons:
+            return "slot_taken"
+        return "slot_held" if reasons else None
+
+    def raise_slot_conflict(self, conn, event_type_id, date_iso, start_time, end_time, hold_token=""):
+        conflict = self.slot_conflict(conn, event_type_id, date_iso, start_time, end_time, hold_token)
+        if conflict == "slot_taken":
+            raise _api_error("23P01", "slot_taken")
+        if conflict == "slot_held":
+            raise _api_error("AP002", "slot_held")
+
+    # --- fonctions SQL (RPC) ---
+
+    def _rpc_hold_slot(self, conn, p_event_type_id, p_date, p_start_time, p_end_time,
+                       p_hold_token: str, p_ttl_seconds: int = 600):
+        start_time, end_time = _to_db("start_time", p_start_time), _to_db("end_time", p_end_time)
+        now = datetime.now(timezone.utc)
+        conn.execute(
+            "DELETE FROM slot_holds WHERE hold_token = ? OR (date = ? AND expires_at <= ?)",
+            (p_hold_token, p_date, now.isoformat())
+        )
+        self.raise_slot_conflict(conn, p_event_type_id, p_date, start_time, end_time, p_hold_token)
+        expires_at = now + timedelta(seconds=min(max(p_ttl_seconds, 30), 1800))
+        cursor = conn.execute(
+            """INSERT INTO slot_holds (event_type_id, date, start_time, end_time, hold_token, expires_at)
+               VALUES (?, ?, ?, ?, ?, ?) RETURNING *""",
+            (p_event_type_id, p_date, start_time, end_time, p_hold_token, expires_at.isoformat())
+        )
+        return _from_db(dict(cursor.fetchone()))
+
+    def _rpc_release_hold(self, conn, p_hold_token: str):
+        cursor = conn.execute("DELETE FROM slot_holds WHERE hold_token = ? RETURNING *", (p_hold_token,))
+        return [_from_db(dict(r)) for r in cursor.fetchall()]
+
+    def _rpc_book_slot(self, conn, p_booking: dict):
+        row = {k: _to_db(k, v) for k, v in p_booking.items()}
+        hold_token = row.get("hold_token") or ""
+        max_per_day = conn.execute(
+            "SELECT max_bookings_per_day FROM event_types WHERE id = ?", (row["event_type_id"],)
+        ).fetchone()
+        if max_per_day and max_per_day[0] is not None:
+            count = conn.execute(
+                """SELECT COUNT(*) FROM bookings
+                   WHERE event_type_id = ? AND date = ? AND status IN ('confirmed', 'pending')""",
+                (row["event_type_id"], row["date"])
+            ).fetchone()[0]
+            if count >= max_per_day[0]:
+                raise _api_error("AP001", "day_full")
+        self.raise_slot_conflict(conn, row["event_type_id"], row["date"], row["start_time"], row["end_time"], hold_token)
+        query = LocalQuery(self, "bookings").insert({
+            "event_type_id": row["event_type_id"],
+            "date": row["date"],
+            "start_time": row["start_time"],
+            "end_time": row["end_time"],
+            "guest_name": row.get("guest_name"),
+            "guest_email": row.get("guest_email"),
+            "guest_phone": row.get("guest_phone") or "",
+            "guest_notes": row.get("guest_notes") or "",
+            "status": row.get("status") or "confirmed",
+        })
+        booking = query._run_insert(conn).data[0]
+        self._rpc_release_hold(conn, hold_token)
+        return booking
+
+    def _rpc_complete_past_bookings(self, conn, p_today: str, p_now: str, p_batch_size: int = 500):
+        # Verrou tenu le temps du lot, comme pg_try_advisory_xact_lock : NULL s'il est pris
+        with self.try_advisory_lock("complete_past_bookings") as acquired:
+            if not acquired:
+                return None
+            return conn.execute(
+                """UPDATE bookings SET status = 'completed', updated_at = ?
+                   WHERE id IN (
+                       SELECT id FROM bookings
+                       WHERE status = 'confirmed' AND (date < ? OR (date = ? AND end_time <= ?))
+                       ORDER BY date, id
+                       LIMIT ?
+                   )""",
+                (_now_iso(), p_today, p_today, _to_db("end_time", p_now), p_batch_size)
+            ).rowcount
+
+    def _rpc_get_booking_stats(self, conn, p_today: str):
+        total, confirmed, upcoming, cancelled = conn.execute(
+            """SELECT COUNT(*),
+                      COALESCE(SUM(status = 'confirmed'), 0),
+                      COALESCE(SUM(status = 'confirmed' AND date >= ?), 0),
+                      COALESCE(SUM(status = 'cancelled'), 0)
+               FROM bookings""",
+            (p_today,)
+        ).fetchone()
+        event_types = conn.execute("SELECT COUNT(*) FROM event_types WHERE is_active = 1").fetchone()[0]
+        return {
+            "total": total,
+            "confirmed": confirmed,
+            "upcoming": upcoming,
+            "cancelled": cancelled,
+            "event_types": event_types,
+        }
+
+def create_local_client(path: str = ":memory:", seed: bool = True) -> LocalClient:
+    """Crée un client local sur une base SQLite (fichier ou ":memory:"), avec les données par défaut"""
+    return LocalClient(path, seed)
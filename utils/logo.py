@@ -1,16 +1,92 @@
+import os
+import tempfile
+import threading
+import time
 from functools import lru_cache
 
 APEL_LOGO_URL = "https://www.saintlouisdagneux.fr/wp-content/uploads/2021/09/apel-logo-300x205.jpg"
+FALLBACK_LOGO = "📅"
 
-@lru_cache(maxsize=1)
-def get_logo():
-    """Charge le logo APEL depuis l'URL et le met en cache. Retourne un emoji en fallback."""
+# Copie locale du logo distant
+LOGO_CACHE_PATH = os.environ.get(
+    "APEL_LOGO_CACHE", os.path.join(tempfile.gettempdir(), "apel-calendar", "apel-logo.jpg")
+)
+LOGO_MAX_AGE = 7 * 24 * 3600  # au-delà, la copie locale est rafraîchie en arrière-plan
+LOGO_FETCH_TIMEOUT = 5
+LOGO_RETRY_DELAY = 300  # délai minimal entre deux tentatives de téléchargement
+
+_refresh_lock = threading.Lock()
+_refreshing = False
+_last_attempt = None
+
+@lru_cache(maxsize=4)
+def _open_image(path: str, mtime: float):
+    """Charge une image en mémoire (une seule fois par version du fichier)"""
+    from PIL import Image
+    with Image.open(path) as image:
+        image.load()
+        return image.copy()
+
+def _fetch_logo():
+    """Télécharge le logo et remplace la copie locale de façon atomique"""
+    global _refreshing
     try:
         from PIL import Image
         from io import BytesIO
         import urllib.request
         req = urllib.request.Request(APEL_LOGO_URL, headers={"User-Agent": "Mozilla/5.0"})
-        response = urllib.request.urlopen(req, timeout=5)
-        return Image.open(BytesIO(response.read()))
+        with urllib.request.urlopen(req, timeout=LOGO_FETCH_TIMEOUT) as response:
+            content = response.read()
+        Image.open(BytesIO(content)).verify()
+
+        directory = os.path.dirname(LOGO_CACHE_PATH)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, LOGO_CACHE_PATH)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
     except Exception:
-        return "📅"
+        # Hôte injoignable ou image invalide : on garde la copie locale (ou le fallback)
+        pass
+    finally:
+        with _refresh_lock:
+            _refreshing = False
+
+def refresh_logo_in_background():
+    """Lance le téléchargement du logo dans un thread (au plus un à la fois, espacés de LOGO_RETRY_DELAY)"""
+    global _refreshing, _last_attempt
+    with _refresh_lock:
+        now = time.monotonic()
+        if _refreshing or (_last_attempt is not None and now - _last_attempt < LOGO_RETRY_DELAY):
+            return
+        _refreshing = True
+        _last_attempt = now
+    threading.Thread(target=_fetch_logo, name="apel-logo-refresh", daemon=True).start()
+
+def _mtime(path: str):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+def get_logo():
+    """Retourne le logo APEL sans jamais attendre le réseau.
+
+    Retourne la copie locale du logo distant, ou l'emoji tant qu'elle n'existe pas.
+    Si la copie locale est absente ou ancienne, elle est rafraîchie en arrière-plan
+    et utilisée aux affichages suivants.
+    """
+    cache_mtime = _mtime(LOGO_CACHE_PATH)
+    if cache_mtime is None or time.time() - cache_mtime > LOGO_MAX_AGE:
+        refresh_logo_in_background()
+
+    if cache_mtime is not None:
+        try:
+            return _open_image(LOGO_CACHE_PATH, cache_mtime)
+        except Exception:
+            pass
+    return FALLBACK_LOGO
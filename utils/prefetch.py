@@ -0,0 +1,88 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from utils.database import get_booking_window, get_event_type_dates, get_bookings_version
+from utils.async_database import load_snapshot
+from utils.shared_cache import get_availability_cache
+
+# ============================================
+# PRÉCHARGEMENT DES DISPONIBILITÉS
+# ============================================
+# Dès que l'invité clique sur "Réserver", la disponibilité de la fenêtre de réservation
+# du type choisi est chargée en arrière-plan, pendant que la page "date" se construit.
+# Celle-ci réutilise le résultat s'il porte sur la même fenêtre, s'il est récent et si
+# aucun jour de la fenêtre n'a changé depuis son lancement (versions du cache partagé ;
+# sans cache partagé, version des réservations de ce processus).
+
+PREFETCH_MAX_AGE = 30  # secondes
+PREFETCH_WORKERS = 4
+
+_executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="apel-prefetch")
+
+def get_snapshot_window(event):
+    """Fenêtre de dates affichée à l'étape "date" pour un type d'événement (None si aucune date)"""
+    if event.get("use_specific_dates"):
+        today = date.today()
+        future_dates = sorted(
+            parsed for parsed in (date.fromisoformat(d["date"]) for d in get_event_type_dates(event["id"]))
+            if parsed > today
+        )
+        return (future_dates[0], future_dates[-1]) if future_dates else None
+    return get_booking_window(event)
+
+def _window_versions(window):
+    """Versions des jours de la fenêtre (et globale) dans le cache partagé, à défaut celle de ce processus"""
+    shared = get_availability_cache()
+    if shared is not None:
+        start, end = window
+        versions = shared.versions((start + timedelta(days=i)).isoformat() for i in range((end - start).days + 1))
+        if versions is not None:
+            return versions
+    return get_bookings_version()
+
+def _load(event_id, window, ctx):
+    if ctx is not None:
+        add_script_run_ctx(threading.current_thread(), ctx)
+    return load_snapshot(event_id, *window)
+
+def _is_fresh(entry) -> bool:
+    return time.monotonic() - entry["started_at"] <= PREFETCH_MAX_AGE \
+        and entry["versions"] == _window_versions(entry["window"])
+
+def prefetch_availability(event):
+    """Lance en arrière-plan le chargement de la disponibilité du type d'événement choisi.
+
+    À appeler au clic sur "Réserver" : le chargement avance pendant que la page suivante s'affiche.
+    """
+    window = get_snapshot_window(event)
+    if window is None:
+        st.session_state.pop("availability_prefetch", None)
+        return
+    st.session_state.availability_prefetch = {
+        "event_id": event["id"],
+        "window": window,
+        "started_at": time.monotonic(),
+        # Lues avant les réservations qu'elles couvrent
+        "versions": _window_versions(window),
+        "future": _executor.submit(_load, event["id"], window, get_script_run_ctx()),
+    }
+
+def get_prefetched_snapshot(event_id: int, start_date: date, end_date: date):
+    """Retourne la disponibilité préchargée si elle porte sur ce type et cette fenêtre et est à jour.
+
+    Attend la fin du chargement s'il est encore en cours ; None sinon (l'appelant charge lui-même).
+    Un préchargement inutilisable est abandonné.
+    """
+    entry = st.session_state.pop("availability_prefetch", None)
+    if not entry or entry["event_id"] != event_id or entry["window"] != (start_date, end_date) \
+            or not _is_fresh(entry):
+        return None
+    try:
+        snapshot = entry["future"].result()
+    except Exception:
+        return None
+    st.session_state.availability_prefetch = entry
+    return snapshot
@@ -0,0 +1,218 @@
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# ============================================
+# CACHE PARTAGÉ DES DISPONIBILITÉS
+# ============================================
+# Les créneaux libres calculés pour un (type d'événement, jour) sont partagés entre les
+# processus d'un même nœud (fichier SQLite) ou de tout le déploiement (Redis).
+# Les clés embarquent deux versions :
+#   - la version du jour, incrémentée par chaque écriture de réservation (ou de blocage) sur ce jour ;
+#   - la version globale, incrémentée par chaque modification d'administration
+#     (types d'événements, dates, horaires, exceptions).
+# Une écriture rend donc inaccessibles exactement les entrées concernées, sans les supprimer ;
+# les entrées orphelines expirent au bout de APEL_SHARED_CACHE_TTL secondes.
+# Un processus ne publie des créneaux sous la version globale courante que si sa configuration
+# en cache local a été lue sous cette version (voir utils/database.py, _config_is_current).
+#
+#   APEL_SHARED_CACHE=sqlite   fichier APEL_SHARED_CACHE_PATH (répertoire temporaire par défaut)
+#   APEL_SHARED_CACHE=redis    serveur APEL_REDIS_URL (paquet redis, ou tout client compatible)
+#   APEL_SHARED_CACHE=memory   équivalent en mémoire du processus (tests)
+#   (non défini)               pas de cache partagé
+
+SHARED_CACHE_TTL = int(os.environ.get("APEL_SHARED_CACHE_TTL", 300))
+GLOBAL_VERSION_KEY = "apel:v:global"
+
+class MemoryStore:
+    """Équivalent en mémoire du sous-ensemble Redis utilisé (mget, set, incr)"""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def mget(self, keys):
+        now = time.monotonic()
+        with self._lock:
+            values = []
+            for key in keys:
+                value, expires_at = self._data.get(key, (None, None))
+                values.append(None if expires_at is not None and expires_at < now else value)
+            return values
+
+    def set(self, key, value, ex=None):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ex if ex else None)
+
+    def incr(self, key):
+        with self._lock:
+            value = int(self._data.get(key, (0, None))[0] or 0) + 1
+            self._data[key] = (str(value), None)
+            return value
+
+class SQLiteStore:
+    """Magasin clé-valeur dans un fichier SQLite, partagé par les processus du nœud"""
+
+    PURGE_EVERY = 500
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        self._writes = 0
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode = WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT, expires_at REAL)"
+            )
+
+    def mget(self, keys):
+        keys = list(keys)
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), 900):
+                chunk = keys[i:i + 900]
+                found.update(self._conn.execute(
+                    f"SELECT key, value FROM kv WHERE key IN ({','.join('?' * len(chunk))})"
+                    " AND (expires_at IS NULL OR expires_at >= ?)",
+                    (*chunk, time.time())
+                ).fetchall())
+        return [found.get(key) for key in keys]
+
+    def set(self, key, value, ex=None):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, time.time() + ex if ex else None)
+            )
+            self._writes += 1
+            if self._writes % self.PURGE_EVERY == 0:
+                self._conn.execute("DELETE FROM kv WHERE expires_at < ?", (time.time(),))
+
+    def incr(self, key):
+        with self._lock:
+            return self._conn.execute(
+                """INSERT INTO kv (key, value) VALUES (?, '1')
+                   ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1
+                   RETURNING CAST(value AS INTEGER)""",
+                (key,)
+            ).fetchone()[0]
+
+class AvailabilityCache:
+    """Créneaux libres (minutes) par (type d'événement, jour), versionnés"""
+
+    def __init__(self, store, ttl: int = SHARED_CACHE_TTL):
+        self.store = store
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _day_key(date_iso: str) -> str:
+        return f"apel:v:day:{date_iso}"
+
+    @staticmethod
+    def _entry_key(event_type_id, date_iso: str, versions) -> str:
+        global_version, day_versions = versions
+        return f"apel:slots:{event_type_id}:{date_iso}:{global_version}.{day_versions.get(date_iso, 0)}"
+
+    @staticmethod
+    def _decode(value):
+        return value.decode() if isinstance(value, bytes) else value
+
+    def versions(self, dates):
+        """(version globale, {jour: version}) à lire AVANT les réservations qu'elles couvrent"""
+        dates = list(dates)
+        try:
+            values = self.store.mget([GLOBAL_VERSION_KEY] + [self._day_key(d) for d in dates])
+        except Exception:
+            logger.warning("Cache partagé indisponible (lecture des versions)", exc_info=True)
+            return None
+        values = [int(self._decode(v) or 0) for v in values]
+        return values[0], dict(zip(dates, values[1:]))
+
+    def global_version(self):
+        """Version globale courante, enregistrée avec chaque lecture de configuration (None si indisponible)"""
+        versions = self.versions(())
+        return versions[0] if versions is not None else None
+
+    def get_many(self, event_type_id, versions, dates):
+        """{jour: débuts libres} pour les jours présents dans le cache"""
+        dates = list(dates)
+        try:
+            values = self.store.mget([self._entry_key(event_type_id, d, versions) for d in dates])
+        except Exception:
+            logger.warning("Cache partagé indisponible (lecture)", exc_info=True)
+            return {}
+        found = {d: json.loads(self._decode(v)) for d, v in zip(dates, values) if v is not None}
+        self.hits += len(found)
+        self.misses += len(dates) - len(found)
+        return found
+
+    def set(self, event_type_id, versions, date_iso: str, starts, ttl: int = None):
+        """Enregistre les créneaux d'un jour ; `ttl` plus court si le résultat expire plus tôt (blocages)"""
+        ttl = self.ttl if ttl is None else max(1, min(self.ttl, int(ttl)))
+        try:
+            self.store.set(self._entry_key(event_type_id, date_iso, versions), json.dumps(starts), ex=ttl)
+        except Exception:
+            logger.warning("Cache partagé indisponible (écriture)", exc_info=True)
+
+    def bump_days(self, dates):
+        """Une réservation ou un blocage a changé sur ces jours : leurs entrées ne seront plus lues"""
+        for date_iso in set(dates):
+            try:
+                self.store.incr(self._day_key(date_iso))
+            except Exception:
+                logger.warning("Cache partagé indisponible (version du %s)", date_iso, exc_info=True)
+
+    def bump_global(self):
+        """Une donnée d'administration a changé : toutes les entrées sont périmées"""
+        try:
+            self.store.incr(GLOBAL_VERSION_KEY)
+        except Exception:
+            logger.warning("Cache partagé indisponible (version globale)", exc_info=True)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "store": type(self.store).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+def create_cache_from_env():
+    """Cache partagé configuré par APEL_SHARED_CACHE, ou None"""
+    backend = os.environ.get("APEL_SHARED_CACHE", "")
+    if backend == "sqlite":
+        path = os.environ.get(
+            "APEL_SHARED_CACHE_PATH", os.path.join(tempfile.gettempdir(), "apel-calendar", "availability.db")
+        )
+        return AvailabilityCache(SQLiteStore(path))
+    if backend == "redis":
+        import redis
+        return AvailabilityCache(redis.Redis.from_url(os.environ["APEL_REDIS_URL"]))
+    if backend == "memory":
+        return AvailabilityCache(MemoryStore())
+    return None
+
+_availability_cache = None
+_availability_cache_started = False
+_availability_cache_lock = threading.Lock()
+
+def get_availability_cache():
+    """Cache partagé du processus (créé au premier appel), ou None"""
+    global _availability_cache, _availability_cache_started
+    with _availability_cache_lock:
+        if not _availability_cache_started:
+            _availability_cache = create_cache_from_env()
+            _availability_cache_started = True
+        return _availability_cache
@@ -0,0 +1,119 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# ============================================
+# CLÔTURE AUTOMATIQUE DES RÉSERVATIONS PASSÉES
+# ============================================
+# Un thread par processus passe régulièrement en "completed" les réservations confirmées
+# dont l'horaire est terminé, par lots (fonction SQL complete_past_bookings).
+# Chaque lot est une transaction qui prend un verrou consultatif Postgres
+# (pg_try_advisory_xact_lock) : le verrou ne couvre qu'un lot, pas tout le passage.
+# Deux réplicas ne traitent jamais un lot en même temps, mais leurs passages peuvent
+# alterner leurs lots ; c'est sans conséquence, chaque lot ne reprend que les réservations
+# encore confirmées. Un réplica qui trouve le verrou pris arrête son passage
+# ("locked_elsewhere") et reprend au suivant.
+# Les appels RPC passent par PostgREST et son pool de connexions : un verrou de session,
+# qui couvrirait tout le passage, n'y survivrait pas d'un appel à l'autre.
+#
+#   APEL_SWEEPER=0             désactive la clôture automatique
+#   APEL_SWEEP_INTERVAL        secondes entre deux passages (900 par défaut)
+#   APEL_SWEEP_BATCH_SIZE      réservations par lot (500 par défaut)
+
+SWEEP_INTERVAL = int(os.environ.get("APEL_SWEEP_INTERVAL", 900))
+SWEEP_BATCH_SIZE = int(os.environ.get("APEL_SWEEP_BATCH_SIZE", 500))
+# Premier passage différé : ne pas concurrencer le premier affichage des pages
+SWEEP_INITIAL_DELAY = 30
+HISTORY_SIZE = 50
+
+class BookingSweeper:
+    """Exécute `sweep()` périodiquement et conserve les métriques de chaque passage"""
+
+    def __init__(self, sweep, interval: int = SWEEP_INTERVAL):
+        self.sweep = sweep
+        self.interval = interval
+        self.runs = 0
+        self.skipped = 0
+        self.errors = 0
+        self.total_completed = 0
+        self.history = deque(maxlen=HISTORY_SIZE)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self, initial_delay: int = SWEEP_INITIAL_DELAY):
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run_forever, args=(initial_delay,), name="apel-sweeper", daemon=True
+            )
+            self._thread.start()
+
+    def _run_forever(self, initial_delay):
+        time.sleep(initial_delay)
+        while True:
+            self.run_once()
+            time.sleep(self.interval)
+
+    def run_once(self):
+        """Un passage ; retourne son compte rendu (ou None si un passage est déjà en cours ici)"""
+        if not self._lock.acquire(blocking=False):
+            return None
+        try:
+            started_at = datetime.now()
+            start = time.perf_counter()
+            error = None
+            try:
+                result = self.sweep()
+            except Exception as e:
+                logger.warning("Clôture des réservations passées impossible", exc_info=True)
+                result = {"completed": 0, "batches": 0, "locked_elsewhere": False}
+                error = type(e).__name__
+            run = {
+                "at": started_at.isoformat(timespec="seconds"),
+                "duration_ms": (time.perf_counter() - start) * 1000,
+                "error": error,
+                **result,
+            }
+            self.runs += 1
+            self.total_completed += run["completed"]
+            if error:
+                self.errors += 1
+            elif run["locked_elsewhere"]:
+                self.skipped += 1
+            self.history.append(run)
+            return run
+        finally:
+            self._lock.release()
+
+    def stats(self):
+        return {
+            "interval": self.interval,
+            "runs": self.runs,
+            "skipped": self.skipped,
+            "errors": self.errors,
+            "total_completed": self.total_completed,
+            "last_run": self.history[-1] if self.history else None,
+            "history": list(self.history),
+        }
+
+_sweeper = None
+_sweeper_lock = threading.Lock()
+
+def is_enabled() -> bool:
+    """APEL_SWEEPER est lu à chaque appel : le désactiver après l'import (tests) est pris en compte"""
+    return os.environ.get("APEL_SWEEPER", "1") != "0"
+
+def get_sweeper():
+    """Clôture automatique du processus (créée au premier appel), ou None si désactivée"""
+    global _sweeper
+    if not is_enabled():
+        return None
+    with _sweeper_lock:
+        if _sweeper is None:
+            from utils.database import complete_past_bookings
+            _sweeper = BookingSweeper(lambda: complete_past_bookings(SWEEP_BATCH_SIZE))
+        return _sweeper